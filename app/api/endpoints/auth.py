@@ -1,26 +1,48 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from app.core.security import verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.security import (
+    create_access_token,
+    password_hasher,
+    PasswordHasherBusy,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+)
 from app.db.session import get_db
 from app.crud import users as users_crud
+from app.services.assignment import lead_assignment
 from app.schemas import Token, UserCreate, User
 
 router = APIRouter()
 
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = users_crud.get_user_by_email(db, form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await run_in_threadpool(users_crud.get_user_by_email, db, form_data.username)
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = await password_hasher.verify(form_data.password, user.hashed_password)
+        except PasswordHasherBusy:
+            raise _hasher_busy()
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        await run_in_threadpool(users_crud.update_password_hash, db, user, new_hash)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
@@ -29,7 +51,16 @@ async def login_for_access_token(
 
 @router.post("/register", response_model=User)
 async def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = users_crud.get_user_by_email(db, user.email)
+    db_user = await run_in_threadpool(users_crud.get_user_by_email, db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return users_crud.create_user(db, user.email, user.password) 
\ No newline at end of file
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+    db_user = await run_in_threadpool(
+        users_crud.create_user, db, user.email, hashed_password=hashed_password
+    )
+    # New attorneys start receiving leads right away
+    lead_assignment.invalidate()
+    return db_user
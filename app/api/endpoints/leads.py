@@ -1,22 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Optional, Dict, Any, Literal
+from datetime import date, datetime, timedelta, timezone
+import logging
 import os
+import tempfile
+from app.core.rate_limit import (
+    LEAD_DUPLICATE_WINDOW_SECONDS, LEAD_SUBMIT_EMAIL_LIMIT, rate_limiter, too_many_requests_headers
+)
 from app.core.security import get_current_active_user
 from app.db import models
-from app.db.session import get_db
+from app.db.session import SessionLocal, get_db
 from app.crud import leads as leads_crud
-from app.services.email import send_lead_notification
-from app.schemas import Lead, LeadUpdate, PaginatedLeads
-import mimetypes
-from fastapi.responses import FileResponse
+from app.crud import notifications as notifications_crud
+from app.crud import resume_jobs as resume_jobs_crud
+from app.crud import stats as stats_crud
+from app.services.assignment import UNASSIGNED_LEAD_EMAIL, lead_assignment
+from app.services.notifications import ATTORNEY_NOTIFICATION, PROSPECT_CONFIRMATION, notification_worker
+from app.services.events import LEAD_CREATED, LEAD_STATE_CHANGED, event_stream, lead_events
+from app.services.downloads import RESUME_MAX_AGE, is_not_modified, resume_response
+from app.services.resume_processing import resume_processor
+from app.services.resume_links import (
+    InvalidResumeLink, ResumeLinkExpired, ResumeLinksDisabled, sign_resume_link, verify_resume_link
+)
+from app.services.exports import EXPORT_FORMATS, serialize_rows
+from app.services.imports import IMPORT_FORMATS, read_rows
+from app.services.storage import storage
+from app.services.uploads import save_stream, save_upload, UploadTooLarge
+from app.schemas import (
+    Lead, LeadBulkUpdate, LeadBulkUpdateResult, LeadFilter, LeadImportReport, LeadStats, LeadUpdate, PaginatedLeads,
+    ResumeLink, ResumeLinkRequest, ResumeLinks
+)
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
 
 router = APIRouter()
 
-# Configure file upload directory
-UPLOAD_DIR = "uploads"
-if not os.path.exists(UPLOAD_DIR):
-    os.makedirs(UPLOAD_DIR)
+logger = logging.getLogger(__name__)
+
+MAX_IMPORT_SIZE = int(os.environ.get("MAX_IMPORT_SIZE", 512 * 1024 * 1024))
+MAX_RESUME_LINKS = int(os.environ.get("MAX_RESUME_LINKS", 1000))
+MAX_BULK_UPDATE = int(os.environ.get("MAX_BULK_UPDATE", 1000))
+MAX_STATS_DAYS = int(os.environ.get("MAX_STATS_DAYS", 3660))
 
 # Define allowed file types
 ALLOWED_RESUME_TYPES = {
@@ -26,6 +51,99 @@ ALLOWED_RESUME_TYPES = {
     'text/plain': '.txt'
 }
 
+def _resume_link(
+    request: Request, lead_id: int, info: leads_crud.ResumeInfo, expires_in: Optional[int]
+) -> ResumeLink:
+    try:
+        token, expires_at = sign_resume_link(info, expires_in)
+    except ResumeLinksDisabled as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return ResumeLink(
+        lead_id=lead_id,
+        url=str(request.url_for("download_signed_resume", token=token)),
+        expires_at=datetime.fromtimestamp(expires_at, timezone.utc)
+    )
+
+def _create_lead_and_notify(db: Session, lead_data: Dict[str, Any]) -> models.Lead:
+    attorney = lead_assignment.assign(db)
+    assigned_to_id = attorney.id if attorney else None
+    try:
+        # Queue notifications in the same transaction as the lead; the
+        # background workers deliver them after the response is returned
+        notifications_crud.enqueue_notification(
+            db, PROSPECT_CONFIRMATION, {"lead": lead_data}, commit=False
+        )
+        notifications_crud.enqueue_notification(
+            db,
+            ATTORNEY_NOTIFICATION,
+            {"lead": lead_data, "attorney_email": attorney.email if attorney else UNASSIGNED_LEAD_EMAIL},
+            commit=False
+        )
+        # Text extraction runs once per distinct file; a resume seen before
+        # already has its text, which only needs indexing for this lead
+        resume_jobs_crud.enqueue_resume_job(
+            db, lead_data["resume_path"], lead_data["resume_content_type"], commit=False
+        )
+        db_lead = leads_crud.create_lead(db, dict(lead_data, assigned_to_id=assigned_to_id))
+    except BaseException:
+        lead_assignment.release(assigned_to_id)
+        raise
+    resume_processor.index_processed_resume(db, db_lead.id, db_lead.resume_path)
+    return db_lead
+
+def _discard_unsaved_resume(db: Session, key: str) -> None:
+    # Stored for a lead that was never saved; keep it if another lead
+    # has referenced the same file in the meantime
+    db.rollback()
+    if not leads_crud.resume_is_referenced(db, key):
+        storage.delete(key)
+
+def _delete_lead(db: Session, lead_id: int) -> bool:
+    db_lead = leads_crud.get_lead(db, lead_id)
+    if db_lead is None:
+        return False
+    key, state, assigned_to_id = db_lead.resume_path, db_lead.state, db_lead.assigned_to_id
+    orphaned = leads_crud.delete_lead(db, db_lead, commit=False)
+    if orphaned:
+        resume_jobs_crud.delete_resume_job(db, key, commit=False)
+    db.commit()
+    if state == models.LeadState.PENDING:
+        lead_assignment.release(assigned_to_id)
+    # A submission of the same file may have referenced the blob again
+    # since the commit; it then stays
+    if orphaned and not leads_crud.resume_is_referenced(db, key):
+        try:
+            storage.delete(key)
+        except Exception:
+            # The lead is gone either way; an unreferenced blob only takes space
+            logger.warning("Could not delete resume %s of lead %d", key, lead_id, exc_info=True)
+    return True
+
+def _update_lead(db: Session, lead_id: int, changes: Dict[str, Any]) -> Optional[models.Lead]:
+    previous_state = None
+    if changes.get("state") is not None:
+        db_lead = leads_crud.get_lead(db, lead_id)
+        previous_state = db_lead.state if db_lead else None
+    db_lead = leads_crud.update_lead(db, lead_id, changes)
+    if db_lead is not None and previous_state is not None:
+        lead_assignment.state_changed(db_lead.assigned_to_id, previous_state, db_lead.state)
+    return db_lead
+
+def _resolve_assignee(filters: Optional[LeadFilter], current_user: models.User) -> Optional[LeadFilter]:
+    if filters is None or filters.assigned_to is None:
+        return filters
+    if filters.assigned_to == "me":
+        return filters.model_copy(update={"assigned_to": str(current_user.id)})
+    if not filters.assigned_to.isdigit():
+        raise HTTPException(status_code=400, detail="assigned_to must be 'me' or a user id")
+    return filters
+
+def _publish_state_change(lead_id: int, state: models.LeadState, updated_at: datetime) -> None:
+    lead_events.publish(
+        LEAD_STATE_CHANGED,
+        {"id": lead_id, "state": state.value, "updated_at": updated_at.isoformat()}
+    )
+
 @router.post("/", response_model=Lead)
 async def create_lead(
     first_name: str = Form(...),
@@ -42,32 +160,131 @@ async def create_lead(
             detail=f"Invalid file type. Allowed types are: {', '.join(ALLOWED_RESUME_TYPES.values())}"
         )
 
-    # Save resume file
-    file_location = os.path.join(UPLOAD_DIR, f"{email}_{resume.filename}")
-    with open(file_location, "wb+") as file_object:
-        file_object.write(await resume.read())
-
-    # Create lead
-    lead_data = {
-        "first_name": first_name,
-        "last_name": last_name,
-        "email": email,
-        "resume_path": file_location
-    }
-    db_lead = leads_crud.create_lead(db, lead_data)
+    submitter = email.strip().lower()
+    retry_after = await rate_limiter.hit("email", submitter, LEAD_SUBMIT_EMAIL_LIMIT)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many submissions for this email, try again later",
+            headers=too_many_requests_headers(retry_after)
+        )
+
+    # Stream the resume into staging, then file it under its content hash;
+    # identical resumes end up stored once
+    try:
+        stored = await save_upload(resume, storage.staging_path())
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-    # Send notifications
+    # A resubmission of the same resume is dropped before it is stored
+    submission = f"{submitter}:{stored.sha256}"
+    if not await rate_limiter.first_seen("duplicate", submission, LEAD_DUPLICATE_WINDOW_SECONDS):
+        await run_in_threadpool(os.remove, stored.path)
+        raise HTTPException(
+            status_code=429,
+            detail="This resume was already submitted for this email",
+            headers=too_many_requests_headers(LEAD_DUPLICATE_WINDOW_SECONDS)
+        )
+    stored_new = False
     try:
-        await send_lead_notification(lead_data, "attorney@company.com")
-    except Exception as e:
-        print(f"[WARN] Email notification failed: {e}")
+        stored_new = await run_in_threadpool(storage.put, stored.path, stored.sha256)
+
+        # Create lead
+        lead_data = {
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": email,
+            "resume_path": stored.sha256,
+            "resume_sha256": stored.sha256,
+            "resume_size": stored.size,
+            "resume_filename": os.path.basename(resume.filename or "") or "resume" + ALLOWED_RESUME_TYPES[content_type],
+            "resume_content_type": content_type
+        }
+        db_lead = await run_in_threadpool(_create_lead_and_notify, db, lead_data)
+    except BaseException:
+        # Let the submitter retry a submission that was never saved
+        await rate_limiter.forget("duplicate", submission)
+        if stored_new:
+            try:
+                await run_in_threadpool(_discard_unsaved_resume, db, stored.sha256)
+            except Exception:
+                logger.warning("Could not discard resume %s of an unsaved lead", stored.sha256, exc_info=True)
+        raise
+    notification_worker.wake()
+    resume_processor.wake()
+    lead_events.publish(LEAD_CREATED, Lead.model_validate(db_lead).model_dump(mode="json"))
 
     return db_lead
 
-@router.get("/", response_model=PaginatedLeads)
+@router.post("/bulk", response_model=LeadImportReport)
+async def import_leads(
+    request: Request,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = IMPORT_FORMATS.get(media_type)
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported content type. Use one of: {', '.join(IMPORT_FORMATS)}"
+        )
+
+    # Spool the body to disk as it arrives, then parse and insert it in
+    # batches so memory stays flat however many rows are sent
+    fd, import_path = tempfile.mkstemp(suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        try:
+            await save_stream(request.stream(), import_path, MAX_IMPORT_SIZE)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        return await run_in_threadpool(
+            lambda: leads_crud.import_leads(db, read_rows(import_path, fmt))
+        )
+    finally:
+        if os.path.exists(import_path):
+            os.remove(import_path)
+
+def _export_rows(bind, columns):
+    # The request's session is closed when its dependency exits, which
+    # happens before the body streams; the export reads through its own
+    export_db = SessionLocal(bind=bind)
+    try:
+        yield from leads_crud.iter_lead_rows(export_db, columns)
+    finally:
+        export_db.close()
+
+@router.get("/export")
+async def export_leads(
+    format: str = "ndjson",
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    columns = leads_crud.EXPORT_COLUMNS
+    bind = db.get_bind()
+    db.close()
+    # A sync iterator is consumed on the threadpool, so the keyset queries
+    # never run on the event loop
+    chunks = serialize_rows(format, columns, _export_rows(bind, columns))
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="leads.{format}"'}
+    )
+
+@router.get("/", response_model=PaginatedLeads, response_class=ORJSONResponse)
 async def list_leads(
     page_size: int = 10,
     after_id: Optional[int] = None,
+    include_total: bool = True,
+    sort: Literal["id", "-id", "created_at", "-created_at"] = "id",
+    filters: LeadFilter = Depends(),
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -76,31 +293,223 @@ async def list_leads(
     if page_size > 100:
         page_size = 100
     
-    return leads_crud.get_leads(db, page_size, after_id)
+    filters = _resolve_assignee(filters, current_user)
+    # Returned as a response so the page skips response_model validation;
+    # get_leads_page already yields exactly the PaginatedLeads shape
+    page = await run_in_threadpool(
+        leads_crud.get_leads_page, db, page_size, after_id, include_total, filters, sort
+    )
+    return ORJSONResponse(page)
+
+@router.get("/stats", response_model=LeadStats)
+async def get_lead_stats(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    interval: Literal["day", "week"] = "day",
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    # Days are UTC, like the timestamps they're derived from
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days >= MAX_STATS_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STATS_DAYS} days can be requested")
+    return await run_in_threadpool(stats_crud.get_lead_stats, db, start, end, interval)
+
+@router.get("/stream")
+async def stream_leads(
+    request: Request,
+    last_event_id: Optional[int] = None,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Server-sent events for created leads and lead state changes.
+
+    Reconnecting clients resume after the id in their Last-Event-ID header
+    (or `last_event_id`); a `reset` event means events were missed and the
+    list should be reloaded.
+    """
+    # The stream can stay open for hours; don't hold a pooled connection
+    db.close()
+    header = request.headers.get("last-event-id")
+    if header:
+        try:
+            last_event_id = int(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    subscription = lead_events.subscribe(last_event_id)
+    return StreamingResponse(
+        event_stream(lead_events, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/resume-links", response_model=ResumeLinks)
+async def create_resume_links(
+    link_request: ResumeLinkRequest,
+    request: Request,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    if len(link_request.lead_ids) > MAX_RESUME_LINKS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_RESUME_LINKS} links can be issued per request"
+        )
+    infos = await run_in_threadpool(leads_crud.get_resume_infos, db, link_request.lead_ids)
+    return ResumeLinks(
+        items=[
+            _resume_link(request, lead_id, info, link_request.expires_in)
+            for lead_id, info in infos.items()
+        ],
+        missing=[lead_id for lead_id in dict.fromkeys(link_request.lead_ids) if lead_id not in infos]
+    )
+
+@router.get("/signed-resumes/{token}", name="download_signed_resume")
+async def download_signed_resume(token: str, request: Request):
+    # No bearer token or database here: the signed link is the authorization
+    try:
+        info, expires_at = verify_resume_link(token)
+    except ResumeLinkExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidResumeLink as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ResumeLinksDisabled as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    # Browsers must not reuse the file past the link's lifetime
+    max_age = max(0, int(expires_at - datetime.now(timezone.utc).timestamp()))
+    try:
+        return await resume_response(request.headers, storage, info, min(max_age, RESUME_MAX_AGE))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Resume file not found")
+
+@router.get("/{lead_id}/resume/link", response_model=ResumeLink)
+async def create_resume_link(
+    lead_id: int,
+    request: Request,
+    expires_in: Optional[int] = None,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    info = await run_in_threadpool(leads_crud.get_resume_info, db, lead_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Resume file not found")
+    return _resume_link(request, lead_id, info, expires_in)
+
+@router.patch("/", response_model=LeadBulkUpdateResult)
+async def bulk_update_leads(
+    bulk_update: LeadBulkUpdate,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    if (bulk_update.leads is None) == (bulk_update.filter is None):
+        raise HTTPException(status_code=400, detail="Provide either leads or filter")
+    if bulk_update.leads is not None and len(bulk_update.leads) > MAX_BULK_UPDATE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BULK_UPDATE} leads can be updated per request"
+        )
+    if bulk_update.filter is not None and not bulk_update.filter.model_dump(exclude_none=True):
+        raise HTTPException(status_code=400, detail="filter must set at least one field")
+    filters = _resolve_assignee(bulk_update.filter, current_user)
+    changes = bulk_update.update.model_dump(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="update must set at least one field")
+
+    leads = None
+    if bulk_update.leads is not None:
+        leads = [(lead.id, lead.updated_at) for lead in bulk_update.leads]
+    try:
+        results = await run_in_threadpool(
+            leads_crud.bulk_update_leads, db, changes, leads, filters, MAX_BULK_UPDATE
+        )
+    except leads_crud.TooManyLeads as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if "state" in changes:
+        # Which leads actually left or re-entered PENDING isn't known here,
+        # so the attorneys' loads are recounted before the next assignment
+        lead_assignment.invalidate()
+        for result in results:
+            if result["status"] == "updated":
+                _publish_state_change(result["id"], changes["state"], result["updated_at"])
+    return LeadBulkUpdateResult(
+        updated=sum(1 for result in results if result["status"] == "updated"),
+        results=results
+    )
 
 @router.get("/{lead_id}/resume")
 async def get_resume(
     lead_id: int,
+    request: Request,
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    lead = leads_crud.get_lead(db, lead_id)
-    if lead is None:
-        raise HTTPException(status_code=404, detail="Lead not found")
-    
-    if not os.path.exists(lead.resume_path):
+    info = await run_in_threadpool(leads_crud.get_resume_info, db, lead_id)
+    if info is None:
+        lead = await run_in_threadpool(leads_crud.get_lead, db, lead_id)
+        if lead is None:
+            raise HTTPException(status_code=404, detail="Lead not found")
         raise HTTPException(status_code=404, detail="Resume file not found")
-    
-    filename = os.path.basename(lead.resume_path)
-    content_type, _ = mimetypes.guess_type(filename)
-    if content_type is None:
-        content_type = 'application/octet-stream'
-    
-    return FileResponse(
-        path=lead.resume_path,
-        filename=filename,
-        media_type=content_type
-    )
+
+    try:
+        return await resume_response(request.headers, storage, info)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Resume file not found")
+
+@router.get("/{lead_id}/preview")
+async def get_resume_preview(
+    lead_id: int,
+    request: Request,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    info = await run_in_threadpool(leads_crud.get_resume_info, db, lead_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Resume file not found")
+
+    job = await run_in_threadpool(resume_jobs_crud.get_resume_job, db, info.key)
+    if job is None:
+        # Resumes stored before the pipeline existed are processed on first request
+        await run_in_threadpool(
+            resume_jobs_crud.enqueue_resume_job, db, info.key, info.content_type
+        )
+        resume_processor.wake()
+        status_value = models.ResumeJobStatus.PENDING
+    else:
+        status_value = job.status
+    if status_value in (models.ResumeJobStatus.PENDING, models.ResumeJobStatus.RUNNING):
+        return JSONResponse(
+            status_code=202,
+            content={"status": status_value.value},
+            headers={"Retry-After": "5"}
+        )
+    if status_value == models.ResumeJobStatus.FAILED:
+        raise HTTPException(status_code=422, detail="Preview could not be generated for this resume")
+
+    headers = {
+        "ETag": f'"{info.key}-preview"',
+        "Cache-Control": f"private, max-age={RESUME_MAX_AGE}",
+    }
+    if is_not_modified(request.headers, headers["ETag"], job.finished_at):
+        return Response(status_code=304, headers=headers)
+    preview = await run_in_threadpool(storage.read_derived, info.key, "preview")
+    if preview is None:
+        raise HTTPException(status_code=404, detail="Preview not found")
+    return Response(content=preview, media_type=job.preview_content_type, headers=headers)
+
+@router.delete("/{lead_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_lead(
+    lead_id: int,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    if not await run_in_threadpool(_delete_lead, db, lead_id):
+        raise HTTPException(status_code=404, detail="Lead not found")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.patch("/{lead_id}", response_model=Lead)
 async def update_lead(
@@ -109,7 +518,11 @@ async def update_lead(
     current_user: models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    db_lead = leads_crud.update_lead(db, lead_id, lead_update.model_dump(exclude_unset=True))
+    db_lead = await run_in_threadpool(
+        _update_lead, db, lead_id, lead_update.model_dump(exclude_unset=True)
+    )
     if db_lead is None:
         raise HTTPException(status_code=404, detail="Lead not found")
-    return db_lead 
\ No newline at end of file
+    if lead_update.state is not None:
+        _publish_state_change(db_lead.id, db_lead.state, db_lead.updated_at)
+    return db_lead
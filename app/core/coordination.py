@@ -0,0 +1,332 @@
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+
+from app.core.cache import TTLCache
+from app.core.metrics import merge_snapshots
+
+logger = logging.getLogger(__name__)
+
+# Set by the multi-worker launcher (app.server) in its workers' environment;
+# unset when the app runs as a single process
+WORKER_COORDINATOR_SOCKET = os.environ.get("WORKER_COORDINATOR_SOCKET", "")
+# How long a worker waits on the coordinator before failing the call
+COORDINATOR_TIMEOUT_SECONDS = float(os.environ.get("COORDINATOR_TIMEOUT_SECONDS", 1.0))
+
+# Longest message line the coordinator reads (metric snapshots are the largest)
+_LINE_LIMIT = 16 * 1024 * 1024
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, separators=(",", ":"), default=str).encode() + b"\n"
+
+
+@dataclass(eq=False)
+class _Connection:
+    writer: asyncio.StreamWriter
+    pid: Optional[int] = None
+    tasks: Set[asyncio.Task] = field(default_factory=set)
+
+    def send(self, message: Dict[str, Any]) -> None:
+        if not self.writer.is_closing():
+            self.writer.write(_encode(message))
+
+
+class Coordinator:
+    """
+    Hub the launcher runs for its workers on a Unix socket, speaking
+    newline-delimited JSON.
+
+    Broadcasts from one worker are relayed to every worker, itself
+    included, stamped with a sequence number that only increases; it starts
+    from the clock in milliseconds, like lead event ids. Requests are
+    served from state kept here, so all workers see the same: the rate
+    limit buckets of `rate_limits`, and the metrics of every worker plus
+    the totals of workers that have exited.
+    """
+
+    def __init__(self, path: str, rate_limits, collect_timeout: float = COORDINATOR_TIMEOUT_SECONDS):
+        self.path = path
+        self.rate_limits = rate_limits
+        self.collect_timeout = collect_timeout
+        self._connections: Set[_Connection] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._seq = 0
+        self._requests = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._retired: Dict[str, Any] = {}
+        self._ready: Dict[int, asyncio.Event] = {}
+        self._handlers: Dict[str, Callable] = {
+            "take": lambda m: self.rate_limits.take(m["key"], m["capacity"], m["rate"]),
+            "claim": lambda m: self.rate_limits.claim(m["key"], m["ttl"]),
+            "release": lambda m: self.rate_limits.release(m["key"]),
+            "collect": lambda m: self._collect(),
+            "retire": lambda m: self._retire(m["snapshot"]),
+        }
+
+    @property
+    def worker_pids(self) -> List[int]:
+        return sorted(conn.pid for conn in self._connections if conn.pid is not None)
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path, limit=_LINE_LIMIT)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        for conn in list(self._connections):
+            conn.writer.close()
+        if self._server is not None:
+            await self._server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _ready_event(self, pid: int) -> asyncio.Event:
+        return self._ready.setdefault(pid, asyncio.Event())
+
+    def is_ready(self, pid: int) -> bool:
+        """Whether worker `pid` has reported that it is serving."""
+        return pid in self._ready and self._ready[pid].is_set()
+
+    async def wait_ready(self, pid: int, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._ready_event(pid).wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def broadcast(self, channel: str, data: Any) -> int:
+        self._seq = max(self._seq + 1, int(time.time() * 1000))
+        message = {"op": "message", "channel": channel, "data": data, "seq": self._seq}
+        for conn in list(self._connections):
+            conn.send(message)
+        return self._seq
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        conn = _Connection(writer)
+        self._connections.add(conn)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if "reply" in message:
+                    future = self._pending.pop(message["reply"], None)
+                    if future is not None and not future.done():
+                        future.set_result(message.get("result"))
+                elif message["op"] == "broadcast":
+                    self.broadcast(message["channel"], message["data"])
+                elif message["op"] == "ready":
+                    conn.pid = message["pid"]
+                    self._ready_event(conn.pid).set()
+                else:
+                    # Served concurrently: a collect waits on replies that
+                    # arrive over this same connection
+                    task = asyncio.create_task(self._serve(conn, message))
+                    conn.tasks.add(task)
+                    task.add_done_callback(conn.tasks.discard)
+        except (ConnectionError, ValueError) as e:
+            logger.warning("Dropping worker connection: %s", e)
+        finally:
+            self._connections.discard(conn)
+            writer.close()
+
+    async def _serve(self, conn: _Connection, message: Dict[str, Any]) -> None:
+        try:
+            handler = self._handlers.get(message["op"])
+            if handler is None:
+                raise ValueError(f"Unknown operation {message['op']!r}")
+            reply = {"reply": message["id"], "result": await handler(message)}
+        except Exception as e:
+            logger.exception("Worker request %s failed", message.get("op"))
+            reply = {"reply": message.get("id"), "error": str(e)}
+        conn.send(reply)
+
+    async def _collect(self) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        requests = {}
+        for conn in list(self._connections):
+            request_id = next(self._requests)
+            requests[request_id] = self._pending[request_id] = loop.create_future()
+            conn.send({"op": "snapshot", "id": request_id})
+        if requests:
+            await asyncio.wait(requests.values(), timeout=self.collect_timeout)
+        snapshots = []
+        for request_id, future in requests.items():
+            self._pending.pop(request_id, None)
+            if future.done() and future.result() is not None:
+                snapshots.append(future.result())
+        if self._retired:
+            snapshots.append(self._retired)
+        return snapshots
+
+    async def _retire(self, snapshot: Dict[str, Any]) -> None:
+        # Counters of exited workers keep counting towards the totals, so
+        # they never go backwards across restarts
+        self._retired = merge_snapshots([self._retired, snapshot])
+
+
+class CoordinatorClient:
+    """
+    A worker's connection to the launcher's Coordinator, opened on first use.
+
+    `call` blocks the calling thread and `acall` awaits. Broadcasts from
+    other workers, and requests from the coordinator, are handled on a
+    reader thread, so subscribers and handlers must be thread-safe. When
+    the coordinator can't be reached calls raise ConnectionError and
+    broadcasts return False; the next use reconnects.
+    """
+
+    def __init__(self, path: str, timeout: float = COORDINATOR_TIMEOUT_SECONDS):
+        self.path = path
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        self._requests = itertools.count(1)
+        self._pending: Dict[int, concurrent.futures.Future] = {}
+        self._subscribers: Dict[str, List[Callable[[Any, int], None]]] = {}
+        self._handlers: Dict[str, Callable[[], Any]] = {}
+
+    def _connect(self) -> socket.socket:
+        # Called with the lock held
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+            threading.Thread(target=self._read, args=(sock,), name="coordinator-reader", daemon=True).start()
+        return self._sock
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        data = _encode(message)
+        with self._lock:
+            try:
+                self._connect().sendall(data)
+            except OSError as e:
+                if self._sock is not None:
+                    self._sock.close()
+                    self._sock = None
+                raise ConnectionError(f"Worker coordinator unavailable: {e}") from e
+
+    def _read(self, sock: socket.socket) -> None:
+        try:
+            for line in sock.makefile("rb"):
+                self._dispatch(json.loads(line))
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                if self._sock is sock:
+                    self._sock = None
+            sock.close()
+            for request_id in list(self._pending):
+                future = self._pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_exception(ConnectionError("Worker coordinator connection closed"))
+
+    def _dispatch(self, message: Dict[str, Any]) -> None:
+        if "reply" in message:
+            future = self._pending.pop(message["reply"], None)
+            if future is None or future.done():
+                return
+            if "error" in message:
+                future.set_exception(RuntimeError(message["error"]))
+            else:
+                future.set_result(message.get("result"))
+        elif message["op"] == "message":
+            for callback in self._subscribers.get(message["channel"], ()):
+                try:
+                    callback(message["data"], message["seq"])
+                except Exception:
+                    logger.exception("Subscriber of %s failed", message["channel"])
+        elif message["op"] in self._handlers:
+            try:
+                result = self._handlers[message["op"]]()
+            except Exception:
+                logger.exception("Handler of %s failed", message["op"])
+                result = None
+            self._send({"reply": message["id"], "result": result})
+
+    def subscribe(self, channel: str, callback: Callable[[Any, int], None]) -> None:
+        """Call `callback(data, seq)` for every broadcast on `channel`, this worker's own included."""
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    def handle(self, op: str, handler: Callable[[], Any]) -> None:
+        """Answer the coordinator's `op` requests with `handler()`."""
+        self._handlers[op] = handler
+
+    def broadcast(self, channel: str, data: Any) -> bool:
+        try:
+            self._send({"op": "broadcast", "channel": channel, "data": data})
+        except ConnectionError:
+            logger.warning("Dropped %s broadcast, worker coordinator unavailable", channel)
+            return False
+        return True
+
+    def request(self, op: str, **fields: Any) -> concurrent.futures.Future:
+        request_id = next(self._requests)
+        future = self._pending[request_id] = concurrent.futures.Future()
+        try:
+            self._send({"op": op, "id": request_id, **fields})
+        except ConnectionError:
+            self._pending.pop(request_id, None)
+            raise
+        future.request_id = request_id
+        return future
+
+    def call(self, op: str, timeout: Optional[float] = None, **fields: Any) -> Any:
+        future = self.request(op, **fields)
+        try:
+            return future.result(timeout or self.timeout)
+        finally:
+            self._pending.pop(future.request_id, None)
+
+    async def acall(self, op: str, timeout: Optional[float] = None, **fields: Any) -> Any:
+        future = self.request(op, **fields)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        finally:
+            self._pending.pop(future.request_id, None)
+
+    def ready(self) -> None:
+        """Tell the launcher this worker is serving; also opens the connection broadcasts arrive on."""
+        self._send({"op": "ready", "pid": os.getpid()})
+
+    def close(self) -> None:
+        with self._lock:
+            if self._sock is not None:
+                try:
+                    self._sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                self._sock.close()
+                self._sock = None
+
+
+def share_cache(client: CoordinatorClient, name: str, cache: TTLCache) -> None:
+    """Pass `cache` invalidations on to the same cache in every other worker."""
+    channel = f"cache:{name}"
+
+    def discard(key: Hashable, seq: int) -> None:
+        # JSON turns tuple keys into lists
+        cache.discard(tuple(key) if isinstance(key, list) else key)
+
+    cache.on_invalidate = lambda key: client.broadcast(channel, key)
+    client.subscribe(channel, discard)
+
+
+coordinator: Optional[CoordinatorClient] = (
+    CoordinatorClient(WORKER_COORDINATOR_SOCKET) if WORKER_COORDINATOR_SOCKET else None
+)
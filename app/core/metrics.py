@@ -0,0 +1,402 @@
+import logging
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 500))
+# A SELECT repeated this many times within one request is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", 10))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+THROUGHPUT_BUCKETS = (1e5, 1e6, 1e7, 5e7, 1e8, 5e8, 1e9)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def snapshot(self) -> Dict[str, Any]:
+        """The current values as JSON-compatible data, for merging across processes."""
+        ...
+
+    @abstractmethod
+    def samples(self, snapshot: Optional[Dict[str, Any]] = None) -> List[str]:
+        ...
+
+    def render(self, snapshot: Optional[Dict[str, Any]] = None) -> str:
+        """Render this metric, with the values of `snapshot` instead of its own if given."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples(snapshot))
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"type": self.type, "values": [[list(key), value] for key, value in self._values.items()]}
+
+    def samples(self, snapshot: Optional[Dict[str, Any]] = None) -> List[str]:
+        snapshot = snapshot or self.snapshot()
+        items = sorted((tuple(key), value) for key, value in snapshot["values"])
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Per label set: a count per bucket (not cumulative), the sum and the count
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * len(self.buckets), [0.0, 0])
+            entry[0][index] += 1
+            entry[1][0] += value
+            entry[1][1] += 1
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[1][1] if entry else 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "type": self.type,
+                "values": [
+                    [list(key), list(counts), total, count] for key, (counts, (total, count)) in self._values.items()
+                ],
+            }
+
+    def samples(self, snapshot: Optional[Dict[str, Any]] = None) -> List[str]:
+        snapshot = snapshot or self.snapshot()
+        items = sorted((tuple(key), counts, total, count) for key, counts, total, count in snapshot["values"])
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {int(count)}")
+        return lines
+
+
+class Gauge(Metric):
+    """Gauge whose value is read from a callback when metrics are scraped."""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, function: Callable[[], float]):
+        super().__init__(name, help)
+        self.function = function
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"type": self.type, "value": self.function()}
+
+    def samples(self, snapshot: Optional[Dict[str, Any]] = None) -> List[str]:
+        snapshot = snapshot or self.snapshot()
+        return [f"{self.name} {_format_value(snapshot['value'])}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, function: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, help, function))
+
+    def snapshot(self, gauges: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Every metric's values by name; see merge_snapshots."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics if gauges or metric.type != "gauge"}
+
+    def render(self, snapshot: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+        """
+        All metrics in the Prometheus text exposition format, with the
+        values of `snapshot` (e.g. merged from several processes) if given.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        if snapshot is None:
+            return "\n".join(metric.render() for metric in metrics) + "\n"
+        empty = {"type": "", "values": [], "value": 0}
+        return "\n".join(metric.render(snapshot.get(metric.name, empty)) for metric in metrics) + "\n"
+
+
+def _merge_metric(into: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, Any]:
+    if into["type"] == "gauge":
+        return {"type": "gauge", "value": into["value"] + other["value"]}
+    values = {tuple(key): rest for key, *rest in into["values"]}
+    for key, *rest in other["values"]:
+        key = tuple(key)
+        if key not in values:
+            values[key] = rest
+        elif into["type"] == "counter":
+            values[key] = [values[key][0] + rest[0]]
+        else:
+            counts, total, count = values[key]
+            values[key] = [[a + b for a, b in zip(counts, rest[0])], total + rest[1], count + rest[2]]
+    return {"type": into["type"], "values": [[list(key), *rest] for key, rest in values.items()]}
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Add up Registry snapshots taken in several processes: counters and
+    histogram buckets are summed per label set, gauges summed outright.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            merged[name] = _merge_metric(merged[name], metric) if name in merged else metric
+    return merged
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+HTTP_REQUEST_SQL_STATEMENTS = registry.histogram(
+    "http_request_sql_statements", "SQL statements executed per request", ("method", "route"), COUNT_BUCKETS
+)
+HTTP_REQUEST_SQL_DURATION = registry.histogram(
+    "http_request_sql_duration_seconds", "Time spent in SQL per request", ("method", "route")
+)
+SLOW_REQUESTS = registry.counter(
+    "http_slow_requests_total", "Requests slower than SLOW_REQUEST_MS", ("method", "route")
+)
+N_PLUS_ONE = registry.counter(
+    "http_n_plus_one_total", "Requests that repeated one SELECT N_PLUS_ONE_THRESHOLD times or more", ("method", "route")
+)
+DB_STATEMENTS = registry.counter("db_statements_total", "SQL statements executed")
+DB_STATEMENT_DURATION = registry.histogram("db_statement_duration_seconds", "SQL statement latency")
+UPLOAD_BYTES = registry.counter("upload_bytes_total", "Bytes received in streamed uploads")
+UPLOAD_THROUGHPUT = registry.histogram(
+    "upload_throughput_bytes_per_second", "Throughput of each streamed upload", buckets=THROUGHPUT_BUCKETS
+)
+EMAIL_SEND_LATENCY = registry.histogram(
+    "email_send_latency_seconds", "Time from queueing an email to the server accepting it"
+)
+EMAIL_SEND_FAILURES = registry.counter("email_send_failures_total", "Emails the SMTP server did not accept")
+
+
+@dataclass
+class RequestStats:
+    sql_count: int = 0
+    sql_time: float = 0.0
+    statements: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.sql_count += 1
+        self.sql_time += elapsed
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+
+# Stats of the request being served; threadpool calls inherit the context,
+# so queries run off the event loop are attributed to their request too
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+# Expanded IN lists make the same query render with a different number of placeholders
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def _normalize(statement: str) -> str:
+    return _PLACEHOLDER_LIST.sub("(?)", " ".join(statement.split()))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    DB_STATEMENTS.inc()
+    DB_STATEMENT_DURATION.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.record(_normalize(statement), elapsed)
+
+
+def instrument_engine(engine: Engine) -> Engine:
+    """Count and time every statement run on `engine`, globally and per request."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, status and SQL usage per route.
+
+    Routes are labelled by their path template, so /api/leads/1 and
+    /api/leads/2 share one series. Slow requests and repeated SELECTs are
+    logged as warnings.
+    """
+
+    def __init__(
+        self,
+        app,
+        slow_request_ms: Optional[float] = None,
+        n_plus_one_threshold: Optional[int] = None,
+    ):
+        self.app = app
+        self.slow_request_ms = SLOW_REQUEST_MS if slow_request_ms is None else slow_request_ms
+        self.n_plus_one_threshold = (
+            N_PLUS_ONE_THRESHOLD if n_plus_one_threshold is None else n_plus_one_threshold
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+        streaming = False
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                streaming = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", ())
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            self._record(scope, status_code, time.perf_counter() - started, stats, streaming)
+
+    def _record(
+        self, scope, status_code: int, duration: float, stats: RequestStats, streaming: bool = False
+    ) -> None:
+        route = scope.get("route")
+        route_path = getattr(route, "path", None) or "unmatched"
+        method = scope["method"]
+
+        HTTP_REQUESTS.inc(method=method, route=route_path, status=str(status_code))
+        HTTP_REQUEST_DURATION.observe(duration, method=method, route=route_path)
+        HTTP_REQUEST_SQL_STATEMENTS.observe(stats.sql_count, method=method, route=route_path)
+        HTTP_REQUEST_SQL_DURATION.observe(stats.sql_time, method=method, route=route_path)
+
+        # Event streams are long-lived by design
+        if duration * 1000 >= self.slow_request_ms and not streaming:
+            SLOW_REQUESTS.inc(method=method, route=route_path)
+            logger.warning(
+                "Slow request %s %s: %.0f ms, %d SQL statements (%.0f ms)",
+                method, route_path, duration * 1000, stats.sql_count, stats.sql_time * 1000,
+            )
+        repeated = [
+            (statement, count) for statement, count in stats.statements.items()
+            if count >= self.n_plus_one_threshold and statement.lstrip().upper().startswith("SELECT")
+        ]
+        if repeated:
+            N_PLUS_ONE.inc(method=method, route=route_path)
+            for statement, count in repeated:
+                logger.warning(
+                    "Possible N+1 in %s %s: statement ran %d times: %s",
+                    method, route_path, count, statement[:200],
+                )
@@ -0,0 +1,294 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.core.cache import TTLCache
+from app.core.coordination import CoordinatorClient, coordinator
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+# Most keys tracked by the in-memory backend; the least recently used go first
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", 100_000))
+
+RATE_LIMITED = registry.counter("rate_limited_total", "Requests rejected by a rate limit", ("scope",))
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """`limit` requests per `window` seconds, allowed in bursts of up to `limit`."""
+    limit: int
+    window: float
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.window
+
+
+LEAD_SUBMIT_IP_LIMIT = RateLimit(
+    int(os.environ.get("LEAD_SUBMIT_IP_LIMIT", 20)),
+    float(os.environ.get("LEAD_SUBMIT_IP_WINDOW_SECONDS", 60)),
+)
+LEAD_SUBMIT_EMAIL_LIMIT = RateLimit(
+    int(os.environ.get("LEAD_SUBMIT_EMAIL_LIMIT", 5)),
+    float(os.environ.get("LEAD_SUBMIT_EMAIL_WINDOW_SECONDS", 3600)),
+)
+# The same resume from the same email within this many seconds is rejected
+LEAD_DUPLICATE_WINDOW_SECONDS = float(os.environ.get("LEAD_DUPLICATE_WINDOW_SECONDS", 3600))
+
+
+class RateLimitBackend(ABC):
+    """Storage for token buckets and one-time claims."""
+
+    @abstractmethod
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        """
+        Take a token from the bucket at `key`. Returns 0 when one was
+        available, otherwise the seconds until the next token.
+        """
+        ...
+
+    @abstractmethod
+    async def claim(self, key: str, ttl: float) -> bool:
+        """Set `key` for `ttl` seconds unless it is already set. Returns True if it was set."""
+        ...
+
+    @abstractmethod
+    async def release(self, key: str) -> None:
+        ...
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    Buckets held in this process, in an LRU bounded to `max_keys` entries.
+
+    A bucket is only stored while it is below capacity and expires once it
+    would have refilled, so idle clients cost nothing and each active one
+    costs a single (tokens, timestamp) entry.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._buckets = TTLCache(maxsize=max_keys, ttl=0)
+        self._claims = TTLCache(maxsize=max_keys, ttl=0)
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        now = self.clock()
+        with self._lock:
+            state: Optional[Tuple[float, float]] = self._buckets.get(key)
+            tokens = capacity if state is None else min(capacity, state[0] + (now - state[1]) * rate)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets.set(key, (tokens, now), ttl=(capacity - tokens) / rate)
+        return retry_after
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        with self._lock:
+            if self._claims.get(key) is not None:
+                return False
+            self._claims.set(key, True, ttl=ttl)
+            return True
+
+    async def release(self, key: str) -> None:
+        self._claims.invalidate(key)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self._claims.clear()
+
+
+# Refill, take and store in one round trip, atomically across app processes.
+# The result is returned as a string because Redis truncates Lua numbers.
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + math.max(0, now - tonumber(state[2])) * rate)
+end
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Buckets shared by every process through Redis or any server speaking
+    its protocol with Lua scripting (Valkey, KeyDB, ...).
+
+    Requires redis-py. Keys expire once their bucket has refilled, so the
+    server holds one small hash per active client.
+    """
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL, client=None):
+        if client is None:
+            try:
+                import redis.asyncio
+            except ImportError:
+                raise RuntimeError("The redis rate limit backend requires redis-py (pip install redis)")
+            client = redis.asyncio.from_url(url)
+        self.client = client
+        self._take = client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        result = await self._take(keys=[key], args=[capacity, rate, time.time()])
+        return float(result)
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        return bool(await self.client.set(key, 1, nx=True, px=max(1, int(ttl * 1000))))
+
+    async def release(self, key: str) -> None:
+        await self.client.delete(key)
+
+
+class CoordinatorRateLimitBackend(RateLimitBackend):
+    """
+    In-memory buckets held by the multi-worker launcher, which serves them
+    to all of its workers over the coordinator socket.
+    """
+
+    def __init__(self, client: CoordinatorClient):
+        self.client = client
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        return await self.client.acall("take", key=key, capacity=capacity, rate=rate)
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        return await self.client.acall("claim", key=key, ttl=ttl)
+
+    async def release(self, key: str) -> None:
+        await self.client.acall("release", key=key)
+
+
+def create_rate_limit_backend(backend: str = RATE_LIMIT_BACKEND) -> RateLimitBackend:
+    if backend == "memory":
+        # Workers started by the launcher share its buckets rather than
+        # each allowing the full rate
+        if coordinator is not None:
+            return CoordinatorRateLimitBackend(coordinator)
+        return MemoryRateLimitBackend()
+    if backend == "redis":
+        return RedisRateLimitBackend()
+    raise ValueError(f"Unknown rate limit backend {backend!r}, expected 'memory' or 'redis'")
+
+
+def _digest(value: str) -> str:
+    # Keys have a fixed size and no email addresses are kept in the backend
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:32]
+
+
+class RateLimiter:
+    """
+    Token-bucket limits and duplicate suppression over a backend.
+
+    Backend errors are logged and the request let through, so an outage of
+    a shared backend doesn't stop lead intake.
+    """
+
+    def __init__(self, backend: RateLimitBackend, prefix: str = "ratelimit:"):
+        self.backend = backend
+        self.prefix = prefix
+
+    def _key(self, scope: str, value: str) -> str:
+        return f"{self.prefix}{scope}:{_digest(value)}"
+
+    async def hit(self, scope: str, value: str, limit: RateLimit) -> float:
+        """Count a request by `value`. Returns 0 if it is allowed, else the seconds to wait."""
+        if limit.limit <= 0:
+            return 0.0
+        try:
+            retry_after = await self.backend.take(self._key(scope, value), limit.limit, limit.rate)
+        except Exception:
+            logger.warning("Rate limit backend failed, allowing request", exc_info=True)
+            return 0.0
+        if retry_after:
+            RATE_LIMITED.inc(scope=scope)
+        return retry_after
+
+    async def first_seen(self, scope: str, value: str, window: float) -> bool:
+        """True unless `value` was already seen in the last `window` seconds."""
+        if window <= 0:
+            return True
+        try:
+            seen = not await self.backend.claim(self._key(scope, value), window)
+        except Exception:
+            logger.warning("Rate limit backend failed, allowing request", exc_info=True)
+            return True
+        if seen:
+            RATE_LIMITED.inc(scope=scope)
+        return not seen
+
+    async def forget(self, scope: str, value: str) -> None:
+        """Drop a `first_seen` record, e.g. when the request it admitted failed."""
+        try:
+            await self.backend.release(self._key(scope, value))
+        except Exception:
+            logger.warning("Rate limit backend failed to release a claim", exc_info=True)
+
+
+def too_many_requests_headers(retry_after: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, int(retry_after + 0.999)))}
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware limiting selected routes per client address.
+
+    Runs before the request body is read, so a rejected upload costs no
+    disk or database work. `rules` maps (method, path) to a RateLimit;
+    trailing slashes are ignored. Behind a proxy, run uvicorn with
+    --forwarded-allow-ips so the client address is the real one.
+    """
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None, rules: Optional[Dict[Tuple[str, str], RateLimit]] = None):
+        self.app = app
+        self.limiter = limiter
+        self.rules = {
+            (method, path.rstrip("/")): limit
+            for (method, path), limit in (rules or {}).items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            limit = self.rules.get((scope["method"], scope["path"].rstrip("/")))
+            if limit is not None:
+                client = scope.get("client")
+                address = client[0] if client else "unknown"
+                limiter = self.limiter or rate_limiter
+                retry_after = await limiter.hit("ip", address, limit)
+                if retry_after:
+                    response = JSONResponse(
+                        {"detail": "Too many requests, try again later"},
+                        status_code=429,
+                        headers=too_many_requests_headers(retry_after),
+                    )
+                    await response(scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
+
+
+rate_limiter = RateLimiter(create_rate_limit_backend())
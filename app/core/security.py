@@ -1,19 +1,51 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+from typing import Any, Dict, Optional, Tuple
+from jose import JWTError, jwk, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
 from app.db import models
 from app.db.session import get_db
 
-# to be moved to environment variables
-SECRET_KEY = "your-secret-key-here"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Published in .env.example, so never good enough to sign anything that matters
+DEFAULT_SECRET_KEY = "your-secret-key-here"
+SECRET_KEY = os.environ.get("SECRET_KEY", DEFAULT_SECRET_KEY)
+ALGORITHM = os.environ.get("ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Signing keys by key id, as a JSON object ({"2024-06": "secret", ...}). New
+# tokens are signed with JWT_ACTIVE_KID and name it in their `kid` header;
+# the other keys keep verifying tokens issued before a rotation. Without
+# JWT_KEYS, SECRET_KEY is the only key. For RS*/ES* algorithms the values
+# are PEM private keys.
+JWT_KEYS = json.loads(os.environ["JWT_KEYS"]) if os.environ.get("JWT_KEYS") else {"default": SECRET_KEY}
+JWT_ACTIVE_KID = os.environ.get("JWT_ACTIVE_KID") or next(iter(JWT_KEYS))
+
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 4096))
+TOKEN_CACHE_TTL_SECONDS = float(os.environ.get("TOKEN_CACHE_TTL_SECONDS", 300))
+
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 1024))
+USER_CACHE_TTL_SECONDS = float(os.environ.get("USER_CACHE_TTL_SECONDS", 60))
+
+# Active users keyed by token subject, so authenticated requests skip the users lookup
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get("PASSWORD_HASH_QUEUE_LIMIT", 32))
+REHASH_PASSWORDS_ON_LOGIN = os.environ.get("REHASH_PASSWORDS_ON_LOGIN", "0") not in ("0", "false", "False")
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -22,15 +54,140 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+class PasswordHasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded thread pool so it never blocks the event loop.
+
+    At most `workers` hashes run at once and `queue_limit` more may wait;
+    beyond that PasswordHasherBusy is raised instead of queueing without
+    bound. bcrypt releases the GIL, so the workers hash in parallel.
+    """
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        queue_limit: int = PASSWORD_HASH_QUEUE_LIMIT,
+        rehash_on_login: bool = REHASH_PASSWORDS_ON_LOGIN
+    ):
+        self.rehash_on_login = rehash_on_login
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+
+    async def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # A cancelled request doesn't stop the hash already running, so the
+        # slot is held until the job itself finishes
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check a password. When rehashing on login is enabled, also return a
+        new hash if the stored one was made with outdated settings.
+        """
+        if not self.rehash_on_login:
+            return await self._run(verify_password, plain_password, hashed_password), None
+        return await self._run(verify_and_update_password, plain_password, hashed_password)
+
+password_hasher = PasswordHasher()
+
+class AccessTokens:
+    """
+    Issues and verifies access tokens against a set of keys named by `kid`.
+
+    Verified claims are cached by token digest until the earlier of the
+    token's expiry and `cache_ttl`, so repeat requests with the same token
+    skip signature checks and claim parsing. Cache entries survive adding
+    a key; a token whose key has been removed is rejected even if cached.
+    """
+
+    def __init__(
+        self,
+        keys: Dict[str, str] = JWT_KEYS,
+        active_kid: str = JWT_ACTIVE_KID,
+        algorithm: str = ALGORITHM,
+        cache_size: int = TOKEN_CACHE_SIZE,
+        cache_ttl: float = TOKEN_CACHE_TTL_SECONDS
+    ):
+        self.algorithm = algorithm
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.set_keys(keys, active_kid)
+
+    def set_keys(self, keys: Dict[str, str], active_kid: str) -> None:
+        """Replace the key set, e.g. to rotate in a new signing key."""
+        if active_kid not in keys:
+            raise ValueError(f"Active key id {active_kid!r} is not one of the configured keys")
+        # Built once; for asymmetric algorithms only the public half verifies
+        verifying_keys = {}
+        for kid, material in keys.items():
+            key = jwk.construct(material, self.algorithm)
+            verifying_keys[kid] = key if self.algorithm.startswith("HS") else key.public_key()
+        self._signing_keys = dict(keys)
+        self._verifying_keys = verifying_keys
+        self.active_kid = active_kid
+
+    def issue(self, data: dict, expires_delta: timedelta) -> str:
+        to_encode = data.copy()
+        to_encode["exp"] = datetime.utcnow() + expires_delta
+        return jwt.encode(
+            to_encode,
+            self._signing_keys[self.active_kid],
+            algorithm=self.algorithm,
+            headers={"kid": self.active_kid},
+        )
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Return the claims of a valid token. Raises JWTError otherwise."""
+        digest = hashlib.sha256(token.encode()).digest()
+        cached = self.cache.get(digest)
+        if cached is not None:
+            kid, claims = cached
+            if kid in self._verifying_keys:
+                return claims
+            self.cache.invalidate(digest)
+            raise JWTError("Signing key has been retired")
+
+        # Tokens issued before key ids were introduced carry no kid
+        kid = jwt.get_unverified_header(token).get("kid", "default")
+        key = self._verifying_keys.get(kid)
+        if key is None:
+            raise JWTError("Unknown signing key")
+        claims = jwt.decode(token, key, algorithms=[self.algorithm])
+
+        lifetime = claims["exp"] - time.time() if isinstance(claims.get("exp"), (int, float)) else self.cache.ttl
+        if lifetime > 0:
+            self.cache.set(digest, (kid, claims), ttl=min(lifetime, self.cache.ttl))
+        return claims
+
+access_tokens = AccessTokens()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return access_tokens.issue(data, expires_delta or timedelta(minutes=15))
+
+def _cacheable_user(user: models.User) -> models.User:
+    # A transient copy is never expired or refreshed by the session that
+    # loaded it, so it stays safe to share between requests
+    return models.User(
+        id=user.id,
+        email=user.email,
+        is_active=user.is_active,
+        created_at=user.created_at,
+    )
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
@@ -42,16 +199,24 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = access_tokens.verify(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+
+    user = await run_in_threadpool(
+        lambda: db.query(models.User).filter(models.User.email == email).first()
+    )
     if user is None:
         raise credentials_exception
+    if user.is_active:
+        user_cache.set(email, _cacheable_user(user))
     return user
 
 async def get_current_active_user(
@@ -1,32 +1,363 @@
+import mimetypes
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from pydantic import ValidationError
+from sqlalchemy import case, column, func, insert, or_, select, table, text, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Sequence, Tuple
+from app.core.cache import TTLCache
 from app.db import models
-from app.schemas import PaginatedLeads
+from app.schemas import Lead as LeadSchema, LeadCreate, LeadFilter, LeadImportReport, PaginatedLeads
+
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_ERRORS = 1000
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_COLUMNS = (
+    "id", "first_name", "last_name", "email", "resume_path", "state", "created_at", "updated_at"
+)
+
+# Columns of a listed lead, in the order the Lead schema serializes them
+LIST_COLUMNS = tuple(LeadSchema.model_fields)
+
+LEAD_COUNTER = "leads"
+
+LEAD_SORTS = ("id", "-id", "created_at", "-created_at")
+
+_leads_fts = table("leads_fts", column("rowid"))
+
+RESUME_CACHE_SIZE = int(os.environ.get("RESUME_CACHE_SIZE", 4096))
+RESUME_CACHE_TTL_SECONDS = float(os.environ.get("RESUME_CACHE_TTL_SECONDS", 300))
+
+@dataclass(frozen=True)
+class ResumeInfo:
+    key: str
+    filename: str
+    content_type: str
+    size: Optional[int]
+    last_modified: datetime
+
+class TooManyLeads(Exception):
+    def __init__(self, count: int, limit: int):
+        super().__init__(f"The filter matches {count} leads; at most {limit} can be updated per request")
+        self.count = count
+        self.limit = limit
+
+# Resume metadata keyed by lead id, so repeat downloads skip the leads lookup
+resume_cache = TTLCache(maxsize=RESUME_CACHE_SIZE, ttl=RESUME_CACHE_TTL_SECONDS)
+
+def _increment_lead_count(db: Session, delta: int) -> None:
+    updated = (
+        db.query(models.Counter)
+        .filter(models.Counter.name == LEAD_COUNTER)
+        .update({models.Counter.value: models.Counter.value + delta}, synchronize_session=False)
+    )
+    if not updated:
+        # First write since the counter was introduced: seed it from the table,
+        # which already includes the rows flushed in this transaction
+        db.flush()
+        db.add(models.Counter(name=LEAD_COUNTER, value=db.query(models.Lead).count()))
+
+def get_lead_count(db: Session) -> int:
+    value = db.query(models.Counter.value).filter(models.Counter.name == LEAD_COUNTER).scalar()
+    if value is None:
+        value = db.query(models.Lead).count()
+        db.add(models.Counter(name=LEAD_COUNTER, value=value))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Seeded concurrently by another request
+            db.rollback()
+    return value
+
+def _add_resume_ref(db: Session, key: str, size: int) -> None:
+    db.execute(
+        sqlite_insert(models.ResumeBlob)
+        .values(key=key, size=size, ref_count=1)
+        .on_conflict_do_update(
+            index_elements=[models.ResumeBlob.key],
+            set_={"ref_count": models.ResumeBlob.ref_count + 1},
+        )
+    )
+
+def release_resume(db: Session, key: str, commit: bool = True) -> bool:
+    """
+    Drop one reference to a stored resume. Returns True when it was the
+    last one, meaning the blob can be deleted from storage.
+    """
+    blob = db.query(models.ResumeBlob).filter(models.ResumeBlob.key == key).first()
+    if blob is None:
+        return False
+    blob.ref_count -= 1
+    orphaned = blob.ref_count <= 0
+    if orphaned:
+        db.delete(blob)
+    if commit:
+        db.commit()
+    return orphaned
+
+def resume_is_referenced(db: Session, key: str) -> bool:
+    return db.query(models.ResumeBlob.key).filter(models.ResumeBlob.key == key).first() is not None
 
 def create_lead(db: Session, lead_data: Dict[str, Any]) -> models.Lead:
     db_lead = models.Lead(**lead_data)
     db.add(db_lead)
+    if db_lead.resume_path:
+        _add_resume_ref(db, db_lead.resume_path, db_lead.resume_size or 0)
+    _increment_lead_count(db, 1)
     db.commit()
     db.refresh(db_lead)
     return db_lead
 
-def get_leads(
+_RESUME_COLUMNS = (
+    models.Lead.id,
+    models.Lead.resume_path,
+    models.Lead.resume_filename,
+    models.Lead.resume_content_type,
+    models.Lead.resume_size,
+    models.Lead.created_at,
+)
+
+def _cache_resume_info(row) -> ResumeInfo:
+    # Leads saved before the original name was recorded have it in their path
+    filename = row.resume_filename or os.path.basename(row.resume_path)
+    content_type = (
+        row.resume_content_type
+        or mimetypes.guess_type(filename)[0]
+        or "application/octet-stream"
+    )
+    info = ResumeInfo(
+        key=row.resume_path,
+        filename=filename,
+        content_type=content_type,
+        size=row.resume_size,
+        last_modified=row.created_at,
+    )
+    resume_cache.set(row.id, info)
+    return info
+
+def get_resume_info(db: Session, lead_id: int) -> Optional[ResumeInfo]:
+    """Storage key and download metadata of a lead's resume, or None if it has none."""
+    info = resume_cache.get(lead_id)
+    if info is not None:
+        return info
+    row = db.query(*_RESUME_COLUMNS).filter(models.Lead.id == lead_id).first()
+    if row is None or not row.resume_path:
+        return None
+    return _cache_resume_info(row)
+
+def get_resume_infos(db: Session, lead_ids: Iterable[int]) -> Dict[int, ResumeInfo]:
+    """Resume metadata for many leads with at most one query; leads without a resume are left out."""
+    found: Dict[int, ResumeInfo] = {}
+    missing = []
+    for lead_id in dict.fromkeys(lead_ids):
+        info = resume_cache.get(lead_id)
+        if info is None:
+            missing.append(lead_id)
+        else:
+            found[lead_id] = info
+    if missing:
+        rows = (
+            db.query(*_RESUME_COLUMNS)
+            .filter(models.Lead.id.in_(missing), models.Lead.resume_path.isnot(None))
+        )
+        for row in rows:
+            if row.resume_path:
+                found[row.id] = _cache_resume_info(row)
+    return found
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()
+    )
+
+def import_leads(
     db: Session,
-    page_size: int = 10,
+    rows: Iterable[Tuple[int, Any]],
+    batch_size: int = IMPORT_BATCH_SIZE
+) -> LeadImportReport:
+    """
+    Validate and insert leads from an iterable of (row number, data) pairs.
+
+    Rows are consumed lazily and inserted with one executemany INSERT per
+    batch, each batch committed together with the lead counter. `data` is a
+    mapping, or an exception describing why the row could not be parsed.
+    Only the first MAX_IMPORT_ERRORS failures are reported individually.
+    """
+    inserted = failed = 0
+    errors = []
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        nonlocal inserted
+        if batch:
+            db.execute(insert(models.Lead), batch)
+            _increment_lead_count(db, len(batch))
+            db.commit()
+            inserted += len(batch)
+            batch.clear()
+
+    for row_number, data in rows:
+        try:
+            if isinstance(data, Exception):
+                raise data
+            if not isinstance(data, dict):
+                raise ValueError("row must be an object")
+            lead = LeadCreate.model_validate(data)
+        except ValidationError as e:
+            message = _format_validation_error(e)
+        except ValueError as e:
+            message = str(e)
+        else:
+            batch.append(lead.model_dump())
+            if len(batch) >= batch_size:
+                flush()
+            continue
+
+        failed += 1
+        if len(errors) < MAX_IMPORT_ERRORS:
+            errors.append({"row": row_number, "error": message})
+    flush()
+
+    return LeadImportReport(
+        inserted=inserted,
+        failed=failed,
+        errors=errors,
+        errors_truncated=failed > len(errors)
+    )
+
+def get_open_lead_counts(db: Session) -> Dict[int, int]:
+    """PENDING leads per assigned attorney, counted on the (state, assigned_to_id) index."""
+    rows = (
+        db.query(models.Lead.assigned_to_id, func.count())
+        .filter(models.Lead.state == models.LeadState.PENDING, models.Lead.assigned_to_id.isnot(None))
+        .group_by(models.Lead.assigned_to_id)
+    )
+    return {assigned_to_id: count for assigned_to_id, count in rows}
+
+def _prefix_range(col, prefix: str):
+    # A range on a NOCASE index rather than LIKE, which SQLite can't always
+    # turn into an index search
+    col = col.collate("NOCASE")
+    return (col >= prefix) & (col < prefix + chr(0x10FFFF))
+
+def _fts_query(q: str) -> str:
+    # Quote every word so user input can't inject FTS5 syntax, and match it
+    # as a prefix so partial words still find results
+    return " ".join(f'"{term}"*' for term in re.findall(r"\w+", q))
+
+def lead_filter_conditions(filters: Optional[LeadFilter]) -> List[Any]:
+    conditions = []
+    if filters is None:
+        return conditions
+    if filters.state is not None:
+        conditions.append(models.Lead.state == filters.state)
+    if filters.created_after is not None:
+        conditions.append(models.Lead.created_at >= filters.created_after)
+    if filters.created_before is not None:
+        conditions.append(models.Lead.created_at < filters.created_before)
+    if filters.name_prefix:
+        conditions.append(or_(
+            _prefix_range(models.Lead.first_name, filters.name_prefix),
+            _prefix_range(models.Lead.last_name, filters.name_prefix),
+        ))
+    if filters.email_prefix:
+        conditions.append(_prefix_range(models.Lead.email, filters.email_prefix))
+    if filters.assigned_to is not None:
+        # "me" has been resolved to the caller's id by the endpoint
+        conditions.append(models.Lead.assigned_to_id == int(filters.assigned_to))
+    if filters.q is not None:
+        match = _fts_query(filters.q)
+        if not match:
+            # Nothing searchable in the query, so nothing can match
+            conditions.append(text("0"))
+        else:
+            conditions.append(models.Lead.id.in_(
+                select(_leads_fts.c.rowid).where(text("leads_fts MATCH :fts_query").bindparams(fts_query=match))
+            ))
+    return conditions
+
+def build_leads_query(
+    db: Session,
+    filters: Optional[LeadFilter] = None,
+    sort: str = "id",
     after_id: Optional[int] = None
-) -> PaginatedLeads:
-    query = db.query(models.Lead)
-    total = query.count()
-
-    if after_id:
-        query = query.filter(models.Lead.id > after_id)
-    
-    items = query.order_by(models.Lead.id).limit(page_size + 1).all()
-    
+):
+    """
+    Filtered query over leads in `sort` order, starting after lead `after_id`.
+
+    Sorting by created_at pages on the (created_at, id) pair, so the cursor
+    stays stable when several leads share a timestamp.
+    """
+    if sort not in LEAD_SORTS:
+        raise ValueError(f"sort must be one of {LEAD_SORTS}")
+    descending = sort.startswith("-")
+    key = sort.lstrip("-")
+
+    query = db.query(models.Lead).filter(*lead_filter_conditions(filters))
+    if key == "id":
+        if after_id is not None:
+            cursor_id = models.Lead.id
+            if filters is not None and (filters.name_prefix or filters.email_prefix or filters.q is not None):
+                # Prefix and text matches are far more selective than an id
+                # range; "+ 0" stops SQLite from picking the primary key instead
+                cursor_id = models.Lead.id + 0
+            query = query.filter(cursor_id < after_id if descending else cursor_id > after_id)
+        order = [models.Lead.id.desc() if descending else models.Lead.id]
+    else:
+        if after_id is not None:
+            cursor_created_at = (
+                select(models.Lead.created_at).where(models.Lead.id == after_id).scalar_subquery()
+            )
+            position = tuple_(models.Lead.created_at, models.Lead.id)
+            cursor = tuple_(cursor_created_at, after_id)
+            query = query.filter(position < cursor if descending else position > cursor)
+        if descending:
+            order = [models.Lead.created_at.desc(), models.Lead.id.desc()]
+        else:
+            order = [models.Lead.created_at, models.Lead.id]
+    return query.order_by(*order)
+
+def _leads_page(
+    db: Session,
+    page_size: int,
+    after_id: Optional[int],
+    include_total: bool,
+    filters: Optional[LeadFilter],
+    sort: str,
+    entities: Sequence[Any] = ()
+) -> Tuple[list, Optional[int], bool]:
+    total = None
+    if include_total:
+        conditions = lead_filter_conditions(filters)
+        if conditions:
+            total = db.query(models.Lead.id).filter(*conditions).count()
+        else:
+            total = get_lead_count(db)
+
+    query = build_leads_query(db, filters, sort, after_id)
+    if entities:
+        query = query.with_entities(*entities)
+    items = query.limit(page_size + 1).all()
+
     has_more = len(items) > page_size
     if has_more:
         items = items[:-1]
+    return items, total, has_more
 
+def get_leads(
+    db: Session,
+    page_size: int = 10,
+    after_id: Optional[int] = None,
+    include_total: bool = True,
+    filters: Optional[LeadFilter] = None,
+    sort: str = "id"
+) -> PaginatedLeads:
+    items, total, has_more = _leads_page(db, page_size, after_id, include_total, filters, sort)
     last_id = items[-1].id if items else None
 
     return PaginatedLeads(
@@ -36,9 +367,174 @@ def get_leads(
         last_id=last_id
     )
 
+def get_leads_page(
+    db: Session,
+    page_size: int = 10,
+    after_id: Optional[int] = None,
+    include_total: bool = True,
+    filters: Optional[LeadFilter] = None,
+    sort: str = "id"
+) -> Dict[str, Any]:
+    """
+    The page `get_leads` returns, as plain dicts ready for JSON encoding.
+
+    Only the columns of the Lead schema are selected, as tuples, so rows are
+    neither loaded into ORM objects nor validated by Pydantic. Keys follow
+    the schema's field order, so the encoded output matches `get_leads`.
+    """
+    entities = [getattr(models.Lead, name) for name in LIST_COLUMNS]
+    rows, total, has_more = _leads_page(
+        db, page_size, after_id, include_total, filters, sort, entities
+    )
+    return {
+        "items": [dict(zip(LIST_COLUMNS, row)) for row in rows],
+        "total": total,
+        "has_more": has_more,
+        "last_id": rows[-1].id if rows else None,
+    }
+
+def bulk_update_leads(
+    db: Session,
+    changes: Dict[str, Any],
+    leads: Optional[Sequence[Tuple[int, Optional[datetime]]]] = None,
+    filters: Optional[LeadFilter] = None,
+    max_rows: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Apply `changes` to many leads with a single UPDATE ... RETURNING.
+
+    Leads are chosen either as (id, updated_at) pairs or by `filters`. When
+    an updated_at is given the lead is only changed if it still has that
+    value, so edits made since the caller loaded it are never overwritten;
+    such leads are reported as conflicts. Returns one outcome per requested
+    id, or one per updated lead when selecting by filter. Raises
+    TooManyLeads, changing nothing, when the filter matches more than
+    `max_rows` leads.
+    """
+    table = models.Lead.__table__
+    if leads is not None:
+        if not leads:
+            return []
+        unversioned = [lead_id for lead_id, updated_at in leads if updated_at is None]
+        versioned = [(lead_id, updated_at) for lead_id, updated_at in leads if updated_at is not None]
+        selectors = []
+        if unversioned:
+            selectors.append(table.c.id.in_(unversioned))
+        if versioned:
+            selectors.append(tuple_(table.c.id, table.c.updated_at).in_(versioned))
+        conditions = [or_(*selectors)]
+    else:
+        conditions = lead_filter_conditions(filters)
+        if max_rows is not None:
+            count = db.scalar(select(func.count()).select_from(table).where(*conditions))
+            if count > max_rows:
+                raise TooManyLeads(count, max_rows)
+
+    now = datetime.utcnow()
+    values = dict(changes, updated_at=now)
+    if changes.get("state") is not None:
+        # Leads already in the target state keep their reach-out time
+        reached_out_at = now if changes["state"] == models.LeadState.REACHED_OUT else None
+        values["reached_out_at"] = case(
+            (table.c.state == changes["state"], table.c.reached_out_at), else_=reached_out_at
+        )
+    statement = (
+        update(table)
+        .where(*conditions)
+        .values(**values)
+        .returning(table.c.id, table.c.updated_at)
+    )
+    updated = {row.id: row.updated_at for row in db.execute(statement)}
+    db.commit()
+    for lead_id in updated:
+        resume_cache.invalidate(lead_id)
+
+    if leads is None:
+        return [
+            {"id": lead_id, "status": "updated", "updated_at": updated_at}
+            for lead_id, updated_at in sorted(updated.items())
+        ]
+
+    requested = list(dict.fromkeys(lead_id for lead_id, _ in leads))
+    missed = [lead_id for lead_id in requested if lead_id not in updated]
+    existing = set()
+    if missed:
+        # Anything not updated either no longer matched its version or doesn't exist
+        existing = set(db.scalars(select(table.c.id).where(table.c.id.in_(missed))))
+    outcomes = []
+    for lead_id in requested:
+        if lead_id in updated:
+            outcomes.append({"id": lead_id, "status": "updated", "updated_at": updated[lead_id]})
+        else:
+            outcomes.append({"id": lead_id, "status": "conflict" if lead_id in existing else "not_found"})
+    return outcomes
+
+def set_resume_text(db: Session, lead_id: int, resume_text: str) -> None:
+    """Store extracted resume text in the full-text index for a lead."""
+    db.execute(
+        text("UPDATE leads_fts SET resume_text = :resume_text WHERE rowid = :lead_id"),
+        {"resume_text": resume_text, "lead_id": lead_id}
+    )
+    db.commit()
+
+def set_resume_text_for_key(db: Session, key: str, resume_text: str, commit: bool = True) -> None:
+    """Index extracted text for every lead that shares the stored resume `key`."""
+    db.execute(
+        text(
+            "UPDATE leads_fts SET resume_text = :resume_text "
+            "WHERE rowid IN (SELECT id FROM leads WHERE resume_path = :key)"
+        ),
+        {"resume_text": resume_text, "key": key}
+    )
+    if commit:
+        db.commit()
+
+def iter_lead_rows(
+    db: Session,
+    columns: Sequence[str] = EXPORT_COLUMNS,
+    chunk_size: Optional[int] = None
+) -> Iterator[Sequence[tuple]]:
+    """
+    Walk the whole leads table by id, yielding lists of raw row tuples.
+
+    Each chunk is a separate keyset query on the primary key and no ORM
+    objects are built, so memory stays flat however many leads there are.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    table = models.Lead.__table__
+    selected = [table.c[name] for name in columns]
+    after_id = 0
+    while True:
+        rows = db.execute(
+            select(*selected)
+            .where(table.c.id > after_id)
+            .order_by(table.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][columns.index("id")]
+        if len(rows) < chunk_size:
+            return
+
 def get_lead(db: Session, lead_id: int) -> Optional[models.Lead]:
     return db.query(models.Lead).filter(models.Lead.id == lead_id).first()
 
+def delete_lead(db: Session, db_lead: models.Lead, commit: bool = True) -> bool:
+    """
+    Delete a lead and release its resume. Returns True when no other lead
+    references the resume, meaning the blob can be deleted from storage.
+    """
+    lead_id, key = db_lead.id, db_lead.resume_path
+    db.delete(db_lead)
+    _increment_lead_count(db, -1)
+    orphaned = bool(key) and release_resume(db, key, commit=False)
+    if commit:
+        db.commit()
+    resume_cache.invalidate(lead_id)
+    return orphaned
+
 def update_lead(
     db: Session,
     lead_id: int,
@@ -46,8 +542,12 @@ def update_lead(
 ) -> Optional[models.Lead]:
     db_lead = get_lead(db, lead_id)
     if db_lead:
+        state = lead_data.get("state")
+        if state is not None and state != db_lead.state:
+            db_lead.reached_out_at = datetime.utcnow() if state == models.LeadState.REACHED_OUT else None
         for field, value in lead_data.items():
             setattr(db_lead, field, value)
         db.commit()
         db.refresh(db_lead)
+        resume_cache.invalidate(lead_id)
     return db_lead 
\ No newline at end of file
@@ -0,0 +1,122 @@
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any
+from app.db import models
+
+def enqueue_notification(
+    db: Session,
+    kind: str,
+    payload: Dict[str, Any],
+    commit: bool = True
+) -> models.Notification:
+    db_notification = models.Notification(kind=kind, payload=payload)
+    db.add(db_notification)
+    if commit:
+        db.commit()
+        db.refresh(db_notification)
+    return db_notification
+
+def claim_due_notifications(
+    db: Session,
+    limit: int = 1,
+    lease_seconds: int = 60
+) -> List[models.Notification]:
+    """
+    Claim up to `limit` due notifications for delivery.
+
+    Each row is taken with a conditional UPDATE so that concurrent workers
+    never claim the same notification twice.
+    """
+    now = datetime.utcnow()
+    candidates = (
+        db.query(models.Notification.id, models.Notification.next_attempt_at)
+        .filter(
+            models.Notification.status.in_(
+                [models.NotificationStatus.PENDING, models.NotificationStatus.SENDING]
+            ),
+            models.Notification.next_attempt_at <= now,
+        )
+        .order_by(models.Notification.next_attempt_at, models.Notification.id)
+        .limit(limit)
+        .all()
+    )
+
+    claimed_ids = []
+    lease_until = now + timedelta(seconds=lease_seconds)
+    for notification_id, next_attempt_at in candidates:
+        updated = (
+            db.query(models.Notification)
+            .filter(
+                models.Notification.id == notification_id,
+                models.Notification.next_attempt_at == next_attempt_at,
+                or_(
+                    models.Notification.status == models.NotificationStatus.PENDING,
+                    models.Notification.status == models.NotificationStatus.SENDING,
+                ),
+            )
+            .update(
+                {
+                    models.Notification.status: models.NotificationStatus.SENDING,
+                    models.Notification.next_attempt_at: lease_until,
+                    models.Notification.attempts: models.Notification.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        if updated:
+            claimed_ids.append(notification_id)
+    db.commit()
+
+    if not claimed_ids:
+        return []
+    return (
+        db.query(models.Notification)
+        .filter(models.Notification.id.in_(claimed_ids))
+        .order_by(models.Notification.id)
+        .all()
+    )
+
+def _leased(db: Session, notification_id: int, lease: datetime):
+    # A worker whose lease ran out may have been overtaken by another that
+    # claimed the row since; only the current holder records an outcome
+    return db.query(models.Notification).filter(
+        models.Notification.id == notification_id,
+        models.Notification.status == models.NotificationStatus.SENDING,
+        models.Notification.next_attempt_at == lease,
+    )
+
+def mark_notification_sent(db: Session, notification_id: int, lease: datetime) -> bool:
+    """Record a delivery. Returns False if the lease `claim_due_notifications` set has been lost."""
+    updated = _leased(db, notification_id, lease).update(
+        {
+            models.Notification.status: models.NotificationStatus.SENT,
+            models.Notification.sent_at: datetime.utcnow(),
+            models.Notification.last_error: None,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return bool(updated)
+
+def mark_notification_failed(
+    db: Session,
+    notification_id: int,
+    lease: datetime,
+    error: str,
+    retry_at: Optional[datetime] = None
+) -> bool:
+    """
+    Record a failed delivery. The notification is retried at `retry_at`,
+    or given up on for good when no retry time is passed. Returns False
+    if the lease has been lost.
+    """
+    values = {models.Notification.last_error: error[:1000]}
+    if retry_at is None:
+        values[models.Notification.status] = models.NotificationStatus.FAILED
+    else:
+        values[models.Notification.status] = models.NotificationStatus.PENDING
+        values[models.Notification.next_attempt_at] = retry_at
+    updated = _leased(db, notification_id, lease).update(values, synchronize_session=False)
+    db.commit()
+    return bool(updated)
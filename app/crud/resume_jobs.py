@@ -0,0 +1,120 @@
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Optional, List, Tuple
+from app.db import models
+
+def enqueue_resume_job(
+    db: Session,
+    key: str,
+    content_type: Optional[str] = None,
+    commit: bool = True
+) -> None:
+    """Queue processing of a stored resume. A no-op when the blob already has a job."""
+    db.execute(
+        sqlite_insert(models.ResumeJob)
+        .values(
+            key=key,
+            content_type=content_type,
+            status=models.ResumeJobStatus.PENDING,
+            attempts=0,
+            next_attempt_at=datetime.utcnow(),
+            created_at=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=["key"])
+    )
+    if commit:
+        db.commit()
+
+def get_resume_job(db: Session, key: str) -> Optional[models.ResumeJob]:
+    return db.query(models.ResumeJob).filter(models.ResumeJob.key == key).first()
+
+def delete_resume_job(db: Session, key: str, commit: bool = True) -> None:
+    db.query(models.ResumeJob).filter(models.ResumeJob.key == key).delete(synchronize_session=False)
+    if commit:
+        db.commit()
+
+def claim_due_resume_jobs(
+    db: Session,
+    limit: int = 1,
+    lease_seconds: int = 300
+) -> List[Tuple[str, Optional[str], int]]:
+    """
+    Claim up to `limit` due jobs, returning (key, content type, attempts).
+
+    Pending jobs and running jobs whose lease has run out are both due, so
+    a job interrupted by a crash or restart is simply run again.
+    """
+    now = datetime.utcnow()
+    job = models.ResumeJob
+    candidates = (
+        db.query(job.key, job.content_type, job.attempts, job.next_attempt_at)
+        .filter(
+            job.status.in_([models.ResumeJobStatus.PENDING, models.ResumeJobStatus.RUNNING]),
+            job.next_attempt_at <= now,
+        )
+        .order_by(job.next_attempt_at, job.key)
+        .limit(limit)
+        .all()
+    )
+
+    claimed = []
+    lease_until = now + timedelta(seconds=lease_seconds)
+    for key, content_type, attempts, next_attempt_at in candidates:
+        updated = (
+            db.query(job)
+            .filter(
+                job.key == key,
+                job.next_attempt_at == next_attempt_at,
+                job.status.in_([models.ResumeJobStatus.PENDING, models.ResumeJobStatus.RUNNING]),
+            )
+            .update(
+                {
+                    job.status: models.ResumeJobStatus.RUNNING,
+                    job.next_attempt_at: lease_until,
+                    job.attempts: job.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        if updated:
+            claimed.append((key, content_type, attempts + 1))
+    db.commit()
+    return claimed
+
+def mark_resume_job_done(
+    db: Session,
+    key: str,
+    page_count: Optional[int],
+    preview_content_type: Optional[str]
+) -> None:
+    db.query(models.ResumeJob).filter(models.ResumeJob.key == key).update(
+        {
+            models.ResumeJob.status: models.ResumeJobStatus.DONE,
+            models.ResumeJob.page_count: page_count,
+            models.ResumeJob.preview_content_type: preview_content_type,
+            models.ResumeJob.finished_at: datetime.utcnow(),
+            models.ResumeJob.last_error: None,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+
+def mark_resume_job_failed(
+    db: Session,
+    key: str,
+    error: str,
+    retry_at: Optional[datetime] = None
+) -> None:
+    """Record a failed run; retried at `retry_at`, or given up on when it is None."""
+    values = {models.ResumeJob.last_error: error[:1000]}
+    if retry_at is None:
+        values[models.ResumeJob.status] = models.ResumeJobStatus.FAILED
+        values[models.ResumeJob.finished_at] = datetime.utcnow()
+    else:
+        values[models.ResumeJob.status] = models.ResumeJobStatus.PENDING
+        values[models.ResumeJob.next_attempt_at] = retry_at
+    db.query(models.ResumeJob).filter(models.ResumeJob.key == key).update(
+        values, synchronize_session=False
+    )
+    db.commit()
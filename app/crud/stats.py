@@ -0,0 +1,138 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import func, text, update
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.schemas import LeadStats, LeadStatsPeriod, ReachOutTimes
+
+STATS_INTERVALS = ("day", "week")
+
+
+def _period_start(day: date, interval: str) -> date:
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _percentile(counts: Sequence[int], q: float) -> Optional[float]:
+    """Estimate a percentile from REACH_OUT_BUCKETS counts, interpolating within a bucket."""
+    total = sum(counts)
+    if not total:
+        return None
+    target = q * total
+    lower = 0.0
+    cumulative = 0
+    for bucket, count in enumerate(counts):
+        if count and cumulative + count >= target:
+            if bucket == len(models.REACH_OUT_BUCKETS):
+                # Open-ended last bucket: all that is known is its lower bound
+                return float(lower)
+            upper = models.REACH_OUT_BUCKETS[bucket]
+            return lower + (upper - lower) * (target - cumulative) / count
+        cumulative += count
+        if bucket < len(models.REACH_OUT_BUCKETS):
+            lower = models.REACH_OUT_BUCKETS[bucket]
+    return float(lower)
+
+
+def get_lead_stats(db: Session, start: date, end: date, interval: str = "day") -> LeadStats:
+    """
+    Lead counts per day or week by state, and reach-out time percentiles,
+    for leads created from `start` to `end` inclusive.
+
+    Read from the rollup tables, so the cost grows with the number of days
+    in the range rather than the number of leads.
+    """
+    if interval not in STATS_INTERVALS:
+        raise ValueError(f"interval must be one of {STATS_INTERVALS}")
+
+    periods: Dict[date, Dict[str, int]] = {}
+    day = _period_start(start, interval)
+    step = timedelta(days=7 if interval == "week" else 1)
+    while day <= end:
+        periods[day] = {state.value: 0 for state in models.LeadState}
+        day += step
+
+    counts = (
+        db.query(models.LeadDailyCount.day, models.LeadDailyCount.state, models.LeadDailyCount.count)
+        .filter(models.LeadDailyCount.day >= start, models.LeadDailyCount.day <= end)
+        .all()
+    )
+    totals = {state.value: 0 for state in models.LeadState}
+    for day, state, count in counts:
+        periods[_period_start(day, interval)][state.value] += count
+        totals[state.value] += count
+
+    buckets: List[int] = [0] * (len(models.REACH_OUT_BUCKETS) + 1)
+    latencies = (
+        db.query(models.LeadReachOutLatency.bucket, func.sum(models.LeadReachOutLatency.count))
+        .filter(models.LeadReachOutLatency.day >= start, models.LeadReachOutLatency.day <= end)
+        .group_by(models.LeadReachOutLatency.bucket)
+        .all()
+    )
+    for bucket, count in latencies:
+        buckets[bucket] = count
+
+    return LeadStats(
+        interval=interval,
+        start=start,
+        end=end,
+        periods=[
+            LeadStatsPeriod(period=period, counts=by_state, total=sum(by_state.values()))
+            for period, by_state in periods.items()
+        ],
+        totals=totals,
+        time_to_reach_out=ReachOutTimes(
+            count=sum(buckets),
+            p50=_percentile(buckets, 0.5),
+            p90=_percentile(buckets, 0.9),
+            p99=_percentile(buckets, 0.99),
+        ),
+    )
+
+
+def rebuild_lead_stats(db: Session) -> int:
+    """
+    Recompute the rollup tables from the leads table, e.g. for a database
+    that predates them. Scans every lead once. Returns the number of leads.
+    """
+    leads = models.Lead.__table__
+    # Reach-out times were not recorded before; the last update is the best
+    # estimate. updated_at is set to itself so it isn't bumped.
+    db.execute(
+        update(leads)
+        .where(leads.c.state == models.LeadState.REACHED_OUT, leads.c.reached_out_at.is_(None))
+        .values(reached_out_at=leads.c.updated_at, updated_at=leads.c.updated_at)
+    )
+    db.query(models.LeadDailyCount).delete()
+    db.query(models.LeadReachOutLatency).delete()
+    db.execute(text(
+        "INSERT INTO lead_daily_counts (day, state, count) "
+        "SELECT date(created_at), state, count(*) FROM leads GROUP BY 1, 2"
+    ))
+    db.execute(text(
+        "INSERT INTO lead_reach_out_latency (day, bucket, count) "
+        f"SELECT date(created_at), {models.reach_out_bucket_sql('created_at', 'reached_out_at')}, count(*) "
+        "FROM leads WHERE reached_out_at IS NOT NULL GROUP BY 1, 2"
+    ))
+    db.commit()
+    return db.query(func.coalesce(func.sum(models.LeadDailyCount.count), 0)).scalar()
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Maintain the lead statistics rollups.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    load_dotenv()
+    from app.db.session import SessionLocal, engine
+
+    # Creates the rollup tables and triggers in a database that lacks them
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        print(f"Rebuilt lead statistics from {rebuild_lead_stats(db)} leads")
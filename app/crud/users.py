@@ -1,15 +1,54 @@
 from sqlalchemy.orm import Session
 from app.db import models
-from app.core.security import get_password_hash
-from typing import Optional
+from app.core.security import get_password_hash, user_cache
+from typing import List, Optional
 
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.email == email).first()
 
-def create_user(db: Session, email: str, password: str) -> models.User:
-    hashed_password = get_password_hash(password)
+def create_user(
+    db: Session,
+    email: str,
+    password: Optional[str] = None,
+    hashed_password: Optional[str] = None
+) -> models.User:
+    if hashed_password is None:
+        hashed_password = get_password_hash(password)
     db_user = models.User(email=email, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
-    return db_user 
\ No newline at end of file
+    user_cache.invalidate(email)
+    return db_user
+
+def set_user_active(db: Session, email: str, is_active: bool) -> Optional[models.User]:
+    db_user = get_user_by_email(db, email)
+    if db_user:
+        db_user.is_active = is_active
+        db.commit()
+        db.refresh(db_user)
+    user_cache.invalidate(email)
+    return db_user
+
+def update_password_hash(db: Session, db_user: models.User, hashed_password: str) -> models.User:
+    db_user.hashed_password = hashed_password
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+def set_assignment_weight(db: Session, email: str, weight: int) -> Optional[models.User]:
+    db_user = get_user_by_email(db, email)
+    if db_user:
+        db_user.assignment_weight = weight
+        db.commit()
+        db.refresh(db_user)
+    return db_user
+
+def get_assignable_users(db: Session) -> List[tuple]:
+    """(id, email, assignment_weight) of every attorney who can be assigned leads."""
+    return (
+        db.query(models.User.id, models.User.email, models.User.assignment_weight)
+        .filter(models.User.is_active.is_(True), models.User.assignment_weight > 0)
+        .order_by(models.User.id)
+        .all()
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum as SQLEnum, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Enum as SQLEnum, Date, DateTime, Boolean, JSON, ForeignKey, Index, DDL, event
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 import enum
@@ -9,17 +9,217 @@ class LeadState(str, enum.Enum):
     PENDING = "PENDING"
     REACHED_OUT = "REACHED_OUT"
 
+class NotificationStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    SENDING = "SENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+class ResumeJobStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
 class Lead(Base):
     __tablename__ = "leads"
+    __table_args__ = (
+        # Keyset pagination under each filter walks one of these in (key, id) order
+        Index("ix_leads_state_id", "state", "id"),
+        Index("ix_leads_created_at_id", "created_at", "id"),
+        Index("ix_leads_state_created_at_id", "state", "created_at", "id"),
+        # Listing an attorney's leads, and counting each attorney's open leads
+        Index("ix_leads_assigned_to_id_id", "assigned_to_id", "id"),
+        Index("ix_leads_state_assigned_to_id", "state", "assigned_to_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     email = Column(String, nullable=False, index=True)
-    resume_path = Column(String, nullable=False)
+    # Storage key of the resume; leads loaded through the bulk import have none
+    resume_path = Column(String, nullable=True, index=True)
+    resume_sha256 = Column(String(64), nullable=True)
+    resume_size = Column(Integer, nullable=True)
+    resume_filename = Column(String, nullable=True)
+    resume_content_type = Column(String, nullable=True)
     state = Column(SQLEnum(LeadState), default=LeadState.PENDING)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # When the lead last moved to REACHED_OUT; cleared if it moves back
+    reached_out_at = Column(DateTime, nullable=True)
+    # Attorney the lead was assigned to; imported leads and leads created
+    # while no attorney could take them have none
+    assigned_to_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+# Case-insensitive prefix filters compare with NOCASE, so they need NOCASE indexes
+Index("ix_leads_first_name_nocase", Lead.first_name.collate("NOCASE"))
+Index("ix_leads_last_name_nocase", Lead.last_name.collate("NOCASE"))
+Index("ix_leads_email_nocase", Lead.email.collate("NOCASE"))
+
+# Full-text index over names, emails and extracted resume text. Rows share
+# the lead's id as rowid; name and email columns are kept in sync by
+# triggers, resume text is filled in once it has been extracted.
+_FTS_STATEMENTS = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5(
+        first_name, last_name, email, resume_text, tokenize = 'unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS leads_fts_insert AFTER INSERT ON leads BEGIN
+        INSERT INTO leads_fts (rowid, first_name, last_name, email, resume_text)
+        VALUES (new.id, new.first_name, new.last_name, new.email, '');
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_fts_update AFTER UPDATE OF first_name, last_name, email ON leads BEGIN
+        UPDATE leads_fts SET first_name = new.first_name, last_name = new.last_name, email = new.email
+        WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_fts_delete AFTER DELETE ON leads BEGIN
+        DELETE FROM leads_fts WHERE rowid = old.id;
+    END""",
+)
+event.listen(
+    Lead.__table__, "before_drop", DDL("DROP TABLE IF EXISTS leads_fts").execute_if(dialect="sqlite")
+)
+
+# Upper bounds, in seconds, of the time-to-reach-out histogram buckets; the
+# last bucket holds everything slower
+REACH_OUT_BUCKETS = (
+    300, 900, 1800, 3600, 2 * 3600, 4 * 3600, 8 * 3600,
+    86400, 2 * 86400, 3 * 86400, 7 * 86400, 14 * 86400, 30 * 86400,
+)
+
+class LeadDailyCount(Base):
+    """Leads created on each (UTC) day, by their current state."""
+    __tablename__ = "lead_daily_counts"
+
+    day = Column(Date, primary_key=True)
+    state = Column(SQLEnum(LeadState), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class LeadReachOutLatency(Base):
+    """Histogram of the time from creation to reach-out, by creation day."""
+    __tablename__ = "lead_reach_out_latency"
+
+    day = Column(Date, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+def reach_out_bucket_sql(created_at: str, reached_out_at: str) -> str:
+    """SQL expression for the REACH_OUT_BUCKETS index of a lead's latency."""
+    # Rounded so julianday's float error can't push a latency across a bound
+    seconds = f"round((julianday({reached_out_at}) - julianday({created_at})) * 86400, 3)"
+    cases = " ".join(f"WHEN {seconds} <= {bound} THEN {i}" for i, bound in enumerate(REACH_OUT_BUCKETS))
+    return f"CASE {cases} ELSE {len(REACH_OUT_BUCKETS)} END"
+
+def _rollup_statements(row: str, delta: int) -> str:
+    return f"""
+        INSERT INTO lead_daily_counts (day, state, count) VALUES (date({row}.created_at), {row}.state, {delta})
+        ON CONFLICT (day, state) DO UPDATE SET count = count + {delta};
+        INSERT INTO lead_reach_out_latency (day, bucket, count)
+        SELECT date({row}.created_at), {reach_out_bucket_sql(f"{row}.created_at", f"{row}.reached_out_at")}, {delta}
+        WHERE {row}.reached_out_at IS NOT NULL
+        ON CONFLICT (day, bucket) DO UPDATE SET count = count + {delta};"""
+
+# The rollups are kept current by triggers, so every write path (single and
+# bulk updates, imports) maintains them in its own transaction
+_ROLLUP_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS lead_stats_insert AFTER INSERT ON leads BEGIN
+        {_rollup_statements("new", 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS lead_stats_update AFTER UPDATE OF state, created_at, reached_out_at ON leads
+    WHEN old.state IS NOT new.state OR old.created_at IS NOT new.created_at
+        OR old.reached_out_at IS NOT new.reached_out_at
+    BEGIN
+        {_rollup_statements("old", -1)}
+        {_rollup_statements("new", 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS lead_stats_delete AFTER DELETE ON leads BEGIN
+        {_rollup_statements("old", -1)}
+    END""",
+)
+
+# Columns added after the first release, by table
+_ADDED_COLUMNS = {
+    "leads": {
+        "resume_sha256": "VARCHAR(64)",
+        "resume_size": "INTEGER",
+        "resume_filename": "VARCHAR",
+        "resume_content_type": "VARCHAR",
+        "reached_out_at": "DATETIME",
+        "assigned_to_id": "INTEGER REFERENCES users (id)",
+    },
+    "users": {
+        "assignment_weight": "INTEGER NOT NULL DEFAULT 0",
+    },
+}
+
+@event.listens_for(Base.metadata, "after_create")
+def _upgrade_schema(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    # Databases created before these columns existed get them here, along
+    # with the indexes over them that create_all skipped for existing tables
+    for table, added in _ADDED_COLUMNS.items():
+        columns = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+        for name, ddl in added.items():
+            if name not in columns:
+                connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+    for index in Lead.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    fts_exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leads_fts'"
+    ).first() is not None
+    for statement in _FTS_STATEMENTS:
+        connection.exec_driver_sql(statement)
+    if not fts_exists:
+        # Index the leads written before the index existed; their resume
+        # text is added as their resumes are processed
+        connection.exec_driver_sql(
+            "INSERT INTO leads_fts (rowid, first_name, last_name, email, resume_text) "
+            "SELECT id, first_name, last_name, email, '' FROM leads"
+        )
+    for statement in _ROLLUP_TRIGGERS:
+        connection.exec_driver_sql(statement)
+
+class ResumeBlob(Base):
+    """Reference count of leads pointing at each stored resume."""
+    __tablename__ = "resume_blobs"
+
+    key = Column(String, primary_key=True)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ResumeJob(Base):
+    """
+    Text extraction and preview job for one stored resume.
+
+    Keyed by the content hash, so each distinct file is processed once
+    however many leads share it. As with notifications, `next_attempt_at`
+    holds the lease of a RUNNING job, so work abandoned by a crashed
+    process is picked up again.
+    """
+    __tablename__ = "resume_jobs"
+    __table_args__ = (
+        Index("ix_resume_jobs_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    key = Column(String, primary_key=True)
+    content_type = Column(String, nullable=True)
+    status = Column(SQLEnum(ResumeJobStatus), default=ResumeJobStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    page_count = Column(Integer, nullable=True)
+    preview_content_type = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+class Counter(Base):
+    """Named counters maintained in the same transaction as the rows they count."""
+    __tablename__ = "counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
 
 class User(Base):
     __tablename__ = "users"
@@ -28,4 +228,29 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    # Share of new leads under the weighted assignment strategy; 0 stops
+    # the attorney from being assigned leads under any strategy
+    assignment_weight = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class Notification(Base):
+    """
+    Outbox of notifications waiting to be delivered by the background workers.
+
+    While a row is SENDING, `next_attempt_at` holds the end of the claiming
+    worker's lease, so rows abandoned by a crashed worker become due again.
+    """
+    __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(SQLEnum(NotificationStatus), default=NotificationStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
@@ -1,11 +1,74 @@
-from sqlalchemy import create_engine
+import os
+from typing import Dict, Any
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
+from app.core.metrics import instrument_engine
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./leads.db"
+SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./leads.db")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# "production" applies the SQLite tuning below, "baseline" leaves SQLite's defaults
+DB_PROFILE = os.environ.get("DB_PROFILE", "production")
+
+# Endpoints run CRUD calls on the threadpool, so the pool should be sized for
+# the number of requests expected to hit the database at the same time
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+
+SQLITE_PRAGMAS: Dict[str, Dict[str, Any]] = {
+    "production": {
+        # Readers no longer block on the writer, and commits only wait for
+        # the WAL append instead of a full fsync of the database file
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        # Negative values are KiB rather than pages
+        "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", -64 * 1024)),
+        "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+        "temp_store": "MEMORY",
+    },
+    "baseline": {},
+}
+
+def _set_sqlite_pragmas(engine: Engine, pragmas: Dict[str, Any]) -> None:
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = DB_PROFILE, **kwargs) -> Engine:
+    """
+    Build an engine for `url` using the named tuning profile.
+
+    SQLite connections get the profile's pragmas applied as they are opened.
+    Extra keyword arguments are passed through to `create_engine`.
+    """
+    if profile not in SQLITE_PRAGMAS:
+        raise ValueError(f"Unknown database profile {profile!r}, expected one of {sorted(SQLITE_PRAGMAS)}")
+
+    engine_args: Dict[str, Any] = {"pool_pre_ping": True}
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        engine_args["connect_args"] = {"check_same_thread": False}
+    if make_url(url).database not in (None, "", ":memory:"):
+        engine_args.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    engine_args.update(kwargs)
+
+    engine = create_engine(url, **engine_args)
+    if backend == "sqlite" and SQLITE_PRAGMAS[profile]:
+        _set_sqlite_pragmas(engine, SQLITE_PRAGMAS[profile])
+    return engine
+
+engine = instrument_engine(create_db_engine())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Dependency to get DB session
@@ -14,4 +77,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
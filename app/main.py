@@ -1,19 +1,88 @@
+import logging
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+# Load environment variables before any module reads its configuration
+load_dotenv()
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.api.api import api_router
+from app.core.coordination import CoordinatorClient, coordinator, share_cache
+from app.core.metrics import MetricsMiddleware, merge_snapshots, registry as metrics_registry
+from app.core.rate_limit import LEAD_SUBMIT_IP_LIMIT, RateLimitMiddleware
+from app.core.security import user_cache
+from app.crud.leads import resume_cache
 from app.db.models import Base
 from app.db.session import engine
-from dotenv import load_dotenv
+from app.services.email import transport as email_transport
+from app.services.events import lead_events
+from app.services.notifications import notification_worker
+from app.services.resume_processing import resume_processor
+from app.services.uploads import MAX_RESUME_SIZE, MULTIPART_OVERHEAD, BodySizeLimitMiddleware
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Create all tables; the multi-worker launcher (app.server) does this once
+# before starting its workers
+if coordinator is None:
+    Base.metadata.create_all(bind=engine)
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
+def _share_state(client: CoordinatorClient) -> None:
+    """Keep this worker's in-process state consistent with the other workers'."""
+    share_cache(client, "users", user_cache)
+    share_cache(client, "resumes", resume_cache)
+    lead_events.relay = lambda type, data: client.broadcast("events", {"type": type, "data": data})
+    client.subscribe("events", lambda event, seq: lead_events.publish_relayed(seq, event["type"], event["data"]))
+    client.handle("snapshot", metrics_registry.snapshot)
 
-app = FastAPI(title="Leads API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if coordinator is not None:
+        _share_state(coordinator)
+    notification_worker.start()
+    resume_processor.start()
+    if coordinator is not None:
+        # The launcher waits for this before retiring a worker this one replaces
+        coordinator.ready()
+    yield
+    # End open event streams so they don't hold up shutdown
+    lead_events.close()
+    await resume_processor.stop()
+    await notification_worker.stop()
+    await email_transport.close()
+    if coordinator is not None:
+        try:
+            # Keep this worker's counts in the cluster-wide totals
+            await coordinator.acall("retire", snapshot=metrics_registry.snapshot(gauges=False))
+        except Exception:
+            logger.warning("Could not hand final metrics to the launcher", exc_info=True)
+        coordinator.close()
+
+app = FastAPI(title="Leads API", lifespan=lifespan)
+# Lead submission is public; its per-address limit is checked before the
+# upload is read. Added first so the metrics middleware wraps it.
+app.add_middleware(RateLimitMiddleware, rules={("POST", "/api/leads"): LEAD_SUBMIT_IP_LIMIT})
+# Oversized resumes are refused before the form parser spools them to disk
+app.add_middleware(
+    BodySizeLimitMiddleware, limits={("POST", "/api/leads"): MAX_RESUME_SIZE + MULTIPART_OVERHEAD}
+)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(api_router, prefix="/api")
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    snapshot = None
+    if coordinator is not None:
+        # Totals over every worker, whichever one serves the scrape
+        try:
+            snapshot = merge_snapshots(await coordinator.acall("collect", timeout=2 * coordinator.timeout)) or None
+        except Exception:
+            logger.warning("Could not collect metrics from other workers", exc_info=True)
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics_registry.render(snapshot), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001) 
\ No newline at end of file
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from datetime import datetime
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, field_validator
+from datetime import date, datetime
+from typing import Dict, Optional, List, Literal
 from app.db.models import LeadState
 
 class LeadBase(BaseModel):
@@ -13,10 +13,12 @@ class LeadCreate(LeadBase):
 
 class Lead(LeadBase):
     id: int
-    resume_path: str
+    resume_path: Optional[str] = None
     state: LeadState
     created_at: datetime
     updated_at: datetime
+    reached_out_at: Optional[datetime] = None
+    assigned_to_id: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -28,13 +30,53 @@ class LeadUpdate(BaseModel):
     email: Optional[EmailStr] = None
     state: Optional[LeadState] = None
 
+    @field_validator("first_name", "last_name", "email", "state")
+    @classmethod
+    def not_null(cls, value):
+        # Leave a field out to keep its value; none of them can be cleared
+        if value is None:
+            raise ValueError("must not be null")
+        return value
+
     class Config:
         from_attributes = True
         arbitrary_types_allowed = True
 
+class LeadFilter(BaseModel):
+    state: Optional[LeadState] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    # Case-insensitive prefix of the first or last name
+    name_prefix: Optional[str] = None
+    email_prefix: Optional[str] = None
+    # Full-text search over names, emails and resume text
+    q: Optional[str] = None
+    # "me" or an attorney's user id
+    assigned_to: Optional[str] = None
+
+class LeadVersion(BaseModel):
+    id: int
+    # Last updated_at the client saw; the lead is only changed if it still matches
+    updated_at: Optional[datetime] = None
+
+class LeadBulkUpdate(BaseModel):
+    # Either explicit leads or a filter selecting them
+    leads: Optional[List[LeadVersion]] = None
+    filter: Optional[LeadFilter] = None
+    update: LeadUpdate
+
+class LeadUpdateOutcome(BaseModel):
+    id: int
+    status: Literal["updated", "conflict", "not_found"]
+    updated_at: Optional[datetime] = None
+
+class LeadBulkUpdateResult(BaseModel):
+    updated: int
+    results: List[LeadUpdateOutcome]
+
 class PaginatedLeads(BaseModel):
     items: List[Lead]
-    total: int
+    total: Optional[int] = None
     has_more: bool
     last_id: Optional[int] = None
 
@@ -42,6 +84,38 @@ class PaginatedLeads(BaseModel):
         from_attributes = True
         arbitrary_types_allowed = True
 
+class LeadStatsPeriod(BaseModel):
+    # First day of the period
+    period: date
+    # Keyed by LeadState value
+    counts: Dict[str, int]
+    total: int
+
+class ReachOutTimes(BaseModel):
+    """Time from creation to reach-out, in seconds, of leads created in the range."""
+    count: int
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p99: Optional[float] = None
+
+class LeadStats(BaseModel):
+    interval: Literal["day", "week"]
+    start: date
+    end: date
+    periods: List[LeadStatsPeriod]
+    totals: Dict[str, int]
+    time_to_reach_out: ReachOutTimes
+
+class LeadImportError(BaseModel):
+    row: int
+    error: str
+
+class LeadImportReport(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[LeadImportError]
+    errors_truncated: bool = False
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -49,6 +123,20 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: Optional[str] = None
 
+class ResumeLink(BaseModel):
+    lead_id: int
+    url: str
+    expires_at: datetime
+
+class ResumeLinkRequest(BaseModel):
+    lead_ids: List[int]
+    expires_in: Optional[int] = None
+
+class ResumeLinks(BaseModel):
+    items: List[ResumeLink]
+    # Requested leads that don't exist or have no resume
+    missing: List[int]
+
 class UserBase(BaseModel):
     email: EmailStr
 
@@ -58,6 +146,7 @@ class UserCreate(UserBase):
 class User(UserBase):
     id: int
     is_active: bool
+    assignment_weight: int = 0
     created_at: datetime
 
     class Config:
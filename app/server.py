@@ -0,0 +1,251 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+from typing import List, Optional, Set
+
+from dotenv import load_dotenv
+
+# Load environment variables before any module reads its configuration
+load_dotenv()
+
+import uvicorn
+
+from app.core.coordination import Coordinator
+from app.core.rate_limit import MemoryRateLimitBackend
+
+logger = logging.getLogger("app.server")
+
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", 8001))
+# How long a stopping worker may spend finishing in-flight requests
+GRACEFUL_TIMEOUT_SECONDS = int(os.environ.get("GRACEFUL_TIMEOUT_SECONDS", 30))
+# How long a new worker may take to start before it is given up on
+WORKER_READY_TIMEOUT_SECONDS = float(os.environ.get("WORKER_READY_TIMEOUT_SECONDS", 60))
+# How long a stopping worker, no longer accepting, still waits for requests
+# on connections it accepted just before
+HANDOFF_GRACE_SECONDS = float(os.environ.get("HANDOFF_GRACE_SECONDS", 0.5))
+
+
+class _DrainingServer(uvicorn.Server):
+    def handle_exit(self, sig, frame) -> None:
+        # Event streams never finish by themselves and would hold up the
+        # drain until the timeout; ended now, their clients reconnect to
+        # another worker and resume from their last event id
+        from app.services.events import lead_events
+        lead_events.close()
+        super().handle_exit(sig, frame)
+
+    async def shutdown(self, sockets=None) -> None:
+        # uvicorn closes every connection without a request in progress,
+        # including one accepted a moment ago whose request hasn't been
+        # read yet; its client would see the connection drop. Stop
+        # accepting first, so new connections queue for the other workers,
+        # and give those requests time to arrive.
+        for server in self.servers:
+            server.close()
+        await asyncio.sleep(HANDOFF_GRACE_SECONDS)
+        await super().shutdown(sockets)
+
+
+def _exit_with_launcher() -> None:
+    # Blocks until the launcher exits; if it was killed outright, drain
+    # rather than keep serving unsupervised
+    multiprocessing.parent_process().join()
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def _run_worker(sock: socket.socket, graceful_timeout: int, log_level: str) -> None:
+    # A terminal hangup is for the launcher, which reloads on it
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    threading.Thread(target=_exit_with_launcher, name="launcher-watch", daemon=True).start()
+    config = uvicorn.Config(
+        "app.main:app",
+        timeout_graceful_shutdown=graceful_timeout,
+        log_level=log_level,
+    )
+    _DrainingServer(config).run(sockets=[sock])
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+class Launcher:
+    """
+    Runs the app in `workers` processes sharing one listening socket.
+
+    The workers are spawned fresh, so they pick up code changes on reload
+    and inherit no threads or database connections. This process runs the
+    Coordinator they share state through, and restarts any worker that
+    dies after it started serving; one that dies before stops the
+    launcher, as that points at a configuration error.
+
+    SIGHUP replaces the workers one at a time: each old worker is only
+    told to stop once its replacement is serving, and then drains its
+    in-flight requests for up to `graceful_timeout` seconds. SIGTERM and
+    SIGINT drain all of them and exit.
+    """
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        workers: int = WEB_CONCURRENCY,
+        graceful_timeout: int = GRACEFUL_TIMEOUT_SECONDS,
+        ready_timeout: float = WORKER_READY_TIMEOUT_SECONDS,
+        log_level: str = "info",
+    ):
+        self.sock = sock
+        self.workers = max(1, workers)
+        self.graceful_timeout = graceful_timeout
+        self.ready_timeout = ready_timeout
+        self.log_level = log_level
+        self.coordinator: Optional[Coordinator] = None
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[multiprocessing.Process] = []
+        self._retiring: Set[multiprocessing.Process] = set()
+        self._stopping: Optional[asyncio.Event] = None
+        self._reload_task: Optional[asyncio.Task] = None
+        self.exit_code = 0
+
+    def _spawn(self) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=_run_worker,
+            args=(self.sock, self.graceful_timeout, self.log_level),
+            name="leads-worker",
+        )
+        process.start()
+        self._processes.append(process)
+        logger.info("Started worker %d", process.pid)
+        return process
+
+    def _retire(self, process: multiprocessing.Process) -> None:
+        self._retiring.add(process)
+        if process.is_alive():
+            # uvicorn stops accepting, finishes in-flight requests, then exits
+            os.kill(process.pid, signal.SIGTERM)
+            asyncio.get_running_loop().call_later(self.graceful_timeout + 5, self._kill, process)
+
+    def _kill(self, process: multiprocessing.Process) -> None:
+        if process.is_alive():
+            logger.warning("Worker %d did not drain in time, killing it", process.pid)
+            process.kill()
+
+    def reload(self) -> None:
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.ensure_future(self._rolling_restart())
+
+    async def _rolling_restart(self) -> None:
+        logger.info("Reloading %d workers", len(self._processes))
+        for old in [p for p in self._processes if p not in self._retiring]:
+            if self._stopping.is_set():
+                return
+            new = self._spawn()
+            if not await self.coordinator.wait_ready(new.pid, self.ready_timeout):
+                logger.error("Replacement worker %d did not start, keeping worker %d", new.pid, old.pid)
+                self._retire(new)
+                return
+            self._retire(old)
+        logger.info("Reload complete")
+
+    def _reap(self) -> None:
+        for process in list(self._processes):
+            if process.is_alive():
+                continue
+            self._processes.remove(process)
+            if process in self._retiring:
+                self._retiring.discard(process)
+                logger.info("Worker %d stopped", process.pid)
+            elif self._stopping.is_set():
+                pass
+            elif not self.coordinator.is_ready(process.pid):
+                logger.error("Worker %d failed to start (exit code %s)", process.pid, process.exitcode)
+                self.exit_code = 1
+                self._stopping.set()
+            else:
+                logger.warning("Worker %d died (exit code %s), restarting it", process.pid, process.exitcode)
+                self._spawn()
+
+    async def _drain(self) -> None:
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+        for process in self._processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.graceful_timeout + 5
+        while any(p.is_alive() for p in self._processes) and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        for process in self._processes:
+            self._kill(process)
+            process.join()
+
+    async def run(self) -> int:
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        with tempfile.TemporaryDirectory(prefix="leads-") as directory:
+            self.coordinator = Coordinator(os.path.join(directory, "coordinator.sock"), MemoryRateLimitBackend())
+            await self.coordinator.start()
+            # Spawned workers inherit the environment
+            os.environ["WORKER_COORDINATOR_SOCKET"] = self.coordinator.path
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(sig, self._stopping.set)
+            loop.add_signal_handler(signal.SIGHUP, self.reload)
+            try:
+                for _ in range(self.workers):
+                    self._spawn()
+                while not self._stopping.is_set():
+                    self._reap()
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), 0.2)
+                    except asyncio.TimeoutError:
+                        pass
+                logger.info("Shutting down %d workers", len(self._processes))
+                await self._drain()
+            finally:
+                for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                    loop.remove_signal_handler(sig)
+                await self.coordinator.close()
+        return self.exit_code
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the app with several worker processes.")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY, help="worker processes (default: CPU count)")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--graceful-timeout", type=int, default=GRACEFUL_TIMEOUT_SECONDS)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s:     [launcher] %(message)s")
+
+    from app.db.models import Base
+    from app.db.session import engine
+
+    # Once here, rather than racing in every worker
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    sock = bind_socket(args.host, args.port)
+    logger.info("Listening on http://%s:%d with %d workers", args.host, args.port, args.workers)
+    launcher = Launcher(sock, args.workers, args.graceful_timeout, log_level=args.log_level)
+    try:
+        return asyncio.run(launcher.run())
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import heapq
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from app.crud import leads as leads_crud
+from app.crud import users as users_crud
+from app.db import models
+
+# round_robin, least_loaded or weighted
+LEAD_ASSIGNMENT_STRATEGY = os.environ.get("LEAD_ASSIGNMENT_STRATEGY", "round_robin")
+# How stale the in-memory attorney list and loads may get before they are
+# reloaded; changes made by other processes are picked up this late
+ASSIGNMENT_RECONCILE_SECONDS = float(os.environ.get("ASSIGNMENT_RECONCILE_SECONDS", 60))
+# Notified of new leads when no attorney can be assigned
+UNASSIGNED_LEAD_EMAIL = os.environ.get("UNASSIGNED_LEAD_EMAIL", "attorney@company.com")
+
+
+@dataclass(eq=False)
+class Attorney:
+    id: int
+    email: str
+    weight: int = 1
+    # PENDING leads assigned to them
+    open_leads: int = 0
+    # Sequence number of their latest assignment; 0 before the first
+    last_assigned: int = 0
+    # Position in the weighted rotation, advanced by 1/weight per lead
+    virtual_time: float = 0.0
+    # Bumped on every change so outdated heap entries can be recognised
+    version: int = 0
+
+
+class AssignmentStrategy(ABC):
+    """Orders attorneys by a key; the attorney with the smallest key gets the next lead."""
+
+    name = ""
+
+    @abstractmethod
+    def key(self, attorney: Attorney) -> tuple:
+        ...
+
+
+class RoundRobin(AssignmentStrategy):
+    """Each attorney in turn, starting with those never assigned a lead."""
+
+    name = "round_robin"
+
+    def key(self, attorney: Attorney) -> tuple:
+        return (attorney.last_assigned, attorney.id)
+
+
+class LeastLoaded(AssignmentStrategy):
+    """The attorney with the fewest PENDING leads, least recently assigned first on ties."""
+
+    name = "least_loaded"
+
+    def key(self, attorney: Attorney) -> tuple:
+        return (attorney.open_leads, attorney.last_assigned, attorney.id)
+
+
+class Weighted(AssignmentStrategy):
+    """
+    Leads in proportion to `assignment_weight`, interleaved rather than in
+    runs: the attorney whose next lead ends earliest in virtual time goes
+    next (stride scheduling).
+    """
+
+    name = "weighted"
+
+    def key(self, attorney: Attorney) -> tuple:
+        return (attorney.virtual_time + 1 / attorney.weight, attorney.id)
+
+
+ASSIGNMENT_STRATEGIES: Dict[str, Callable[[], AssignmentStrategy]] = {
+    strategy.name: strategy for strategy in (RoundRobin, LeastLoaded, Weighted)
+}
+
+
+def create_strategy(name: str = LEAD_ASSIGNMENT_STRATEGY) -> AssignmentStrategy:
+    if name not in ASSIGNMENT_STRATEGIES:
+        raise ValueError(
+            f"Unknown lead assignment strategy {name!r}, expected one of {', '.join(ASSIGNMENT_STRATEGIES)}"
+        )
+    return ASSIGNMENT_STRATEGIES[name]()
+
+
+class AssignmentEngine:
+    """
+    Picks the attorney for each new lead.
+
+    Active users with a positive `assignment_weight` and their PENDING lead
+    counts are loaded once and then kept in memory, in a heap ordered by
+    the strategy's key, so an assignment is O(log n) with no query. Loads
+    are adjusted as leads are assigned and change state, and reloaded from
+    the database every `reconcile_seconds`, or before the next assignment
+    once `invalidate` is called, which corrects for writes made elsewhere
+    (bulk updates, other processes, users added or deactivated).
+    """
+
+    def __init__(
+        self,
+        strategy: Union[str, AssignmentStrategy] = LEAD_ASSIGNMENT_STRATEGY,
+        reconcile_seconds: float = ASSIGNMENT_RECONCILE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.strategy = create_strategy(strategy) if isinstance(strategy, str) else strategy
+        self.reconcile_seconds = reconcile_seconds
+        self.clock = clock
+        self._attorneys: Dict[int, Attorney] = {}
+        self._heap: List[Tuple[tuple, int, int]] = []
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._reconciled_at: Optional[float] = None
+
+    def _entry(self, attorney: Attorney) -> Tuple[tuple, int, int]:
+        return (self.strategy.key(attorney), attorney.version, attorney.id)
+
+    def _push(self, attorney: Attorney) -> None:
+        attorney.version += 1
+        heapq.heappush(self._heap, self._entry(attorney))
+        # Outdated entries are only dropped when they reach the top; rebuild
+        # before they outnumber the live ones
+        if len(self._heap) > 2 * len(self._attorneys) + 64:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._heap = [self._entry(attorney) for attorney in self._attorneys.values()]
+        heapq.heapify(self._heap)
+
+    def _peek(self) -> Optional[Attorney]:
+        while self._heap:
+            _, version, attorney_id = self._heap[0]
+            attorney = self._attorneys.get(attorney_id)
+            if attorney is not None and attorney.version == version:
+                return attorney
+            heapq.heappop(self._heap)
+        return None
+
+    def _reconcile(self, db: Session) -> None:
+        open_leads = leads_crud.get_open_lead_counts(db)
+        users = users_crud.get_assignable_users(db)
+        # Newcomers join the weighted rotation level with the attorney
+        # furthest behind, rather than catching up on every lead so far
+        virtual_time = min(
+            (self._attorneys[user_id].virtual_time for user_id, _, _ in users if user_id in self._attorneys),
+            default=0.0,
+        )
+        attorneys = {}
+        for user_id, email, weight in users:
+            attorney = self._attorneys.get(user_id)
+            if attorney is None:
+                attorney = Attorney(user_id, email, virtual_time=virtual_time)
+            attorney.email = email
+            attorney.weight = weight
+            attorney.open_leads = open_leads.get(user_id, 0)
+            attorneys[user_id] = attorney
+        self._attorneys = attorneys
+        self._rebuild()
+        self._reconciled_at = self.clock()
+
+    def reconcile(self, db: Session) -> None:
+        with self._lock:
+            self._reconcile(db)
+
+    def invalidate(self) -> None:
+        """Reload attorneys and loads before the next assignment."""
+        self._reconciled_at = None
+
+    def reset(self) -> None:
+        """Forget all state, e.g. when the database is replaced."""
+        with self._lock:
+            self._attorneys = {}
+            self._heap = []
+            self._sequence = 0
+            self._reconciled_at = None
+
+    def assign(self, db: Session) -> Optional[Attorney]:
+        """
+        The attorney for a new lead, counted as one more open lead for them.
+        None when nobody can be assigned. `db` is only queried when the
+        in-memory state is due for reconciliation.
+        """
+        with self._lock:
+            if self._reconciled_at is None or self.clock() - self._reconciled_at >= self.reconcile_seconds:
+                self._reconcile(db)
+            attorney = self._peek()
+            if attorney is None:
+                return None
+            self._sequence += 1
+            attorney.last_assigned = self._sequence
+            attorney.virtual_time += 1 / attorney.weight
+            attorney.open_leads += 1
+            self._push(attorney)
+            return attorney
+
+    def _adjust(self, attorney_id: Optional[int], delta: int) -> None:
+        with self._lock:
+            attorney = self._attorneys.get(attorney_id)
+            if attorney is not None:
+                attorney.open_leads = max(0, attorney.open_leads + delta)
+                self._push(attorney)
+
+    def release(self, attorney_id: Optional[int]) -> None:
+        """Undo the load of an assignment whose lead was never saved."""
+        self._adjust(attorney_id, -1)
+
+    def state_changed(
+        self, attorney_id: Optional[int], old: models.LeadState, new: models.LeadState
+    ) -> None:
+        """Account for an assigned lead leaving or re-entering PENDING."""
+        if old == new:
+            return
+        self._adjust(attorney_id, 1 if new == models.LeadState.PENDING else -1)
+
+    def loads(self) -> Dict[int, int]:
+        """Open leads per assignable attorney, as currently tracked."""
+        with self._lock:
+            return {attorney_id: attorney.open_leads for attorney_id, attorney in self._attorneys.items()}
+
+
+lead_assignment = AssignmentEngine()
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Manage lead assignment.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    weight = subcommands.add_parser("weight", help="Set an attorney's assignment weight (0 stops assignment)")
+    weight.add_argument("email")
+    weight.add_argument("weight", type=int)
+    subcommands.add_parser("loads", help="Show each assignable attorney's open leads")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        if args.command == "weight":
+            if args.weight < 0:
+                parser.error("weight must not be negative")
+            if users_crud.set_assignment_weight(db, args.email, args.weight) is None:
+                parser.error(f"No user {args.email}")
+            print(f"{args.email} now has assignment weight {args.weight}")
+        else:
+            open_leads = leads_crud.get_open_lead_counts(db)
+            for user_id, email, weight in users_crud.get_assignable_users(db):
+                print(f"{email}\tweight {weight}\t{open_leads.get(user_id, 0)} open leads")
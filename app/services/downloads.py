@@ -0,0 +1,185 @@
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Mapping, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+from app.crud.leads import ResumeInfo
+from app.services.storage import ResumeStorage
+
+# How long browsers may reuse a downloaded resume; responses are always marked private
+RESUME_MAX_AGE = int(os.environ.get("RESUME_MAX_AGE", 3600))
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def content_disposition(filename: str) -> str:
+    # Same encoding FileResponse uses, for responses streamed from storage
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.replace(microsecond=0), usegmt=True)
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, last_modified: datetime) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when an entity tag was sent
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is not None:
+        since = _parse_http_date(if_modified_since)
+        if since is not None:
+            if last_modified.tzinfo is None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+            return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into inclusive (start, end) offsets.
+
+    Returns None for headers that should be ignored (malformed or several
+    ranges), in which case the whole file is sent. Raises
+    RangeNotSatisfiable when the range lies entirely past the end.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and start > end:
+                return None
+        else:
+            suffix = int(last)
+            if suffix == 0:
+                raise RangeNotSatisfiable()
+            start, end = max(0, size - suffix), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _if_range_allows(headers: Mapping[str, str], etag: str, last_modified: datetime) -> bool:
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # If-Range needs a strong match
+        return if_range == etag
+    return if_range == http_date(last_modified)
+
+
+async def resume_response(
+    headers: Mapping[str, str],
+    storage: ResumeStorage,
+    info: ResumeInfo,
+    max_age: Optional[int] = None,
+) -> Response:
+    """
+    Serve a stored resume with validators, conditional requests and ranges.
+
+    The content hash is the entity tag, so 304 answers are decided from the
+    metadata alone without touching storage. Raises FileNotFoundError when
+    the blob is missing from storage.
+    """
+    max_age = RESUME_MAX_AGE if max_age is None else max_age
+    etag = f'"{info.key}"'
+    response_headers: Dict[str, str] = {
+        "ETag": etag,
+        "Last-Modified": http_date(info.last_modified),
+        "Cache-Control": f"private, max-age={max_age}",
+        "Accept-Ranges": "bytes",
+    }
+    if is_not_modified(headers, etag, info.last_modified):
+        del response_headers["Accept-Ranges"]
+        return Response(status_code=304, headers=response_headers)
+
+    path = storage.local_path(info.key)
+    stat_result = None
+    size = info.size
+    if path is not None:
+        stat_result = await run_in_threadpool(os.stat, path)
+        size = stat_result.st_size
+    elif not await run_in_threadpool(storage.exists, info.key):
+        raise FileNotFoundError(info.key)
+
+    byte_range = None
+    range_header = headers.get("range")
+    if range_header and size is not None and _if_range_allows(headers, etag, info.last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=416,
+                headers={**response_headers, "Content-Range": f"bytes */{size}"},
+            )
+
+    if byte_range is not None:
+        start, end = byte_range
+        length = end - start + 1
+        response_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response_headers["Content-Length"] = str(length)
+        response_headers["Content-Disposition"] = content_disposition(info.filename)
+        return StreamingResponse(
+            storage.iter_range(info.key, start, length),
+            status_code=206,
+            media_type=info.content_type,
+            headers=response_headers,
+        )
+
+    if path is not None:
+        return FileResponse(
+            path=path,
+            filename=info.filename,
+            media_type=info.content_type,
+            headers=response_headers,
+            stat_result=stat_result,
+        )
+    if size is not None:
+        response_headers["Content-Length"] = str(size)
+    response_headers["Content-Disposition"] = content_disposition(info.filename)
+    return StreamingResponse(
+        storage.iter_chunks(info.key),
+        media_type=info.content_type,
+        headers=response_headers,
+    )
@@ -1,31 +1,282 @@
+import asyncio
+import logging
+import mimetypes
 import os
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from typing import List, Dict
+import time
+from email.message import EmailMessage
+from fastapi_mail import ConnectionConfig
+from typing import List, Dict, Optional, Tuple, Sequence, Union
 from pydantic import EmailStr, BaseModel
+import aiosmtplib
+from app.core.metrics import EMAIL_SEND_FAILURES, EMAIL_SEND_LATENCY, registry as metrics_registry
+from app.services.storage import storage
 
-# Email configuration for MailHog
+logger = logging.getLogger(__name__)
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value not in ("0", "false", "False", "")
+
+# Email configuration; the defaults point at a local MailHog
 conf = ConnectionConfig(
-    MAIL_USERNAME="",  # Not needed for MailHog
-    MAIL_PASSWORD="",  # Not needed for MailHog
-    MAIL_FROM="test@example.com",  # Can be any email for testing
-    MAIL_PORT=1025,  # MailHog SMTP port
-    MAIL_SERVER="localhost",  # MailHog server
-    MAIL_STARTTLS=False,  # MailHog doesn't use TLS
-    MAIL_SSL_TLS=False,  # MailHog doesn't use SSL
-    USE_CREDENTIALS=False,  # No auth needed for MailHog
-    VALIDATE_CERTS=False  # No cert validation needed for MailHog
+    MAIL_USERNAME=os.environ.get("MAIL_USERNAME", ""),  # Not needed for MailHog
+    MAIL_PASSWORD=os.environ.get("MAIL_PASSWORD", ""),  # Not needed for MailHog
+    MAIL_FROM=os.environ.get("MAIL_FROM", "test@example.com"),  # Can be any email for testing
+    MAIL_PORT=int(os.environ.get("MAIL_PORT", 1025)),  # MailHog SMTP port
+    MAIL_SERVER=os.environ.get("MAIL_SERVER", "localhost"),  # MailHog server
+    MAIL_STARTTLS=_env_flag("MAIL_STARTTLS", False),  # MailHog doesn't use TLS
+    MAIL_SSL_TLS=_env_flag("MAIL_SSL_TLS", False),  # MailHog doesn't use SSL
+    USE_CREDENTIALS=_env_flag("MAIL_USE_CREDENTIALS", False),  # No auth needed for MailHog
+    VALIDATE_CERTS=_env_flag("MAIL_VALIDATE_CERTS", False)  # No cert validation needed for MailHog
 )
 
+SMTP_POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", 2))
+SMTP_BATCH_SIZE = int(os.environ.get("SMTP_BATCH_SIZE", 20))
+SMTP_BATCH_INTERVAL_MS = float(os.environ.get("SMTP_BATCH_INTERVAL_MS", 50))
+SMTP_IDLE_CHECK_SECONDS = float(os.environ.get("SMTP_IDLE_CHECK_SECONDS", 30))
+
 class EmailSchema(BaseModel):
     email: List[EmailStr]
 
-async def send_lead_notification(lead_data: Dict[str, str], attorney_email: str):
-    EMAIL_SENDING_ENABLED = os.environ.get("ENABLE_EMAIL", "1") not in ("0", "false", "False")
-    if not EMAIL_SENDING_ENABLED:
-        print("[INFO] Email sending is disabled by environment variable.")
+class SMTPTransport:
+    """
+    Bounded pool of long-lived SMTP sessions.
+
+    Messages are queued and picked up by `pool_size` sender tasks, each of
+    which owns one connection. A sender collects up to `batch_size` messages,
+    or whatever arrived within `batch_interval_ms` of the first one, and
+    sends them back to back over its session, reconnecting only when the
+    server has dropped the connection.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        start_tls: bool = False,
+        validate_certs: bool = True,
+        timeout: float = 30,
+        pool_size: int = SMTP_POOL_SIZE,
+        batch_size: int = SMTP_BATCH_SIZE,
+        batch_interval_ms: float = SMTP_BATCH_INTERVAL_MS,
+        idle_check_seconds: float = SMTP_IDLE_CHECK_SECONDS,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username or None
+        self.password = password or None
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+        self.timeout = timeout
+        self.pool_size = max(1, pool_size)
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval_ms / 1000
+        self.idle_check_seconds = idle_check_seconds
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._senders: List[asyncio.Task] = []
+        self._connections: List[aiosmtplib.SMTP] = []
+        self._stats = {
+            "sent": 0,
+            "failed": 0,
+            "batches": 0,
+            "connects": 0,
+            "reconnects": 0,
+            "send_latency_seconds_sum": 0.0,
+            "send_latency_seconds_max": 0.0,
+        }
+
+    def _start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._senders = [
+            asyncio.create_task(self._sender(), name=f"smtp-sender-{i}")
+            for i in range(self.pool_size)
+        ]
+
+    async def send(self, message: EmailMessage) -> None:
+        """Queue `message` and wait until it has been accepted by the server."""
+        if self._queue is None:
+            self._start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((message, future, time.perf_counter()))
+        await future
+
+    async def close(self) -> None:
+        senders, self._senders = self._senders, []
+        for task in senders:
+            task.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
+        for smtp in self._connections:
+            await self._disconnect(smtp)
+        self._connections = []
+        self._queue = None
+
+    def metrics(self) -> Dict[str, float]:
+        sent = self._stats["sent"]
+        return {
+            **self._stats,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "connections_open": sum(1 for smtp in self._connections if smtp.is_connected),
+            "send_latency_seconds_avg": (
+                self._stats["send_latency_seconds_sum"] / sent if sent else 0.0
+            ),
+        }
+
+    def _new_connection(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            validate_certs=self.validate_certs,
+            timeout=self.timeout,
+        )
+
+    async def _disconnect(self, smtp: aiosmtplib.SMTP) -> None:
+        if not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def _ensure_connected(self, smtp: aiosmtplib.SMTP, last_used: float) -> None:
+        if smtp.is_connected and time.monotonic() - last_used > self.idle_check_seconds:
+            # The server may have timed out an idle session without us noticing
+            try:
+                await smtp.noop()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+        if not smtp.is_connected:
+            if self._stats["connects"]:
+                self._stats["reconnects"] += 1
+            self._stats["connects"] += 1
+            await smtp.connect()
+
+    async def _next_batch(self) -> List[Tuple[EmailMessage, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.batch_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _sender(self) -> None:
+        smtp = self._new_connection()
+        self._connections.append(smtp)
+        last_used = time.monotonic()
+        while True:
+            batch = await self._next_batch()
+            self._stats["batches"] += 1
+            for message, future, queued_at in batch:
+                if future.done():
+                    continue
+                try:
+                    await self._send_one(smtp, message, last_used)
+                except Exception as e:
+                    self._stats["failed"] += 1
+                    EMAIL_SEND_FAILURES.inc()
+                    future.set_exception(e)
+                else:
+                    latency = time.perf_counter() - queued_at
+                    EMAIL_SEND_LATENCY.observe(latency)
+                    self._stats["sent"] += 1
+                    self._stats["send_latency_seconds_sum"] += latency
+                    self._stats["send_latency_seconds_max"] = max(
+                        self._stats["send_latency_seconds_max"], latency
+                    )
+                    future.set_result(None)
+                last_used = time.monotonic()
+
+    async def _send_one(self, smtp: aiosmtplib.SMTP, message: EmailMessage, last_used: float) -> None:
+        await self._ensure_connected(smtp, last_used)
+        try:
+            await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # Retry once on a fresh session; the old one went away between sends
+            smtp.close()
+            await self._ensure_connected(smtp, time.monotonic())
+            await smtp.send_message(message)
+
+transport = SMTPTransport(
+    hostname=conf.MAIL_SERVER,
+    port=conf.MAIL_PORT,
+    username=conf.MAIL_USERNAME if conf.USE_CREDENTIALS else None,
+    password=conf.MAIL_PASSWORD.get_secret_value() if conf.USE_CREDENTIALS else None,
+    use_tls=conf.MAIL_SSL_TLS,
+    start_tls=conf.MAIL_STARTTLS,
+    validate_certs=conf.VALIDATE_CERTS,
+    timeout=conf.TIMEOUT,
+)
+
+metrics_registry.gauge(
+    "email_queue_depth", "Emails waiting for an SMTP session", lambda: transport.metrics()["queue_depth"]
+)
+metrics_registry.gauge(
+    "email_connections_open", "Open SMTP sessions", lambda: transport.metrics()["connections_open"]
+)
+
+def _read_attachment(path: str) -> Tuple[bytes, str, str]:
+    content_type, _ = mimetypes.guess_type(path)
+    maintype, subtype = (content_type or "application/octet-stream").split("/", 1)
+    with open(path, "rb") as f:
+        return f.read(), maintype, subtype
+
+# An attachment is either a file path or a (filename, content, content type) tuple
+Attachment = Union[str, Tuple[str, bytes, Optional[str]]]
+
+async def build_message(
+    subject: str,
+    recipients: List[str],
+    body: str,
+    attachments: Optional[Sequence[Attachment]] = None
+) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = conf.MAIL_FROM
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+    message.set_content(body)
+    for attachment in attachments or []:
+        if isinstance(attachment, str):
+            data, maintype, subtype = await asyncio.to_thread(_read_attachment, attachment)
+            filename = os.path.basename(attachment)
+        else:
+            filename, data, content_type = attachment
+            content_type = content_type or mimetypes.guess_type(filename)[0]
+            maintype, subtype = (content_type or "application/octet-stream").split("/", 1)
+        message.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
+    return message
+
+async def _resume_attachments(lead_data: Dict[str, str]) -> List[Attachment]:
+    key = lead_data.get("resume_path")
+    if not key:
+        return []
+    data = await asyncio.to_thread(storage.read, key)
+    return [(lead_data.get("resume_filename") or "resume", data, lead_data.get("resume_content_type"))]
+
+def _email_enabled() -> bool:
+    enabled = os.environ.get("ENABLE_EMAIL", "1") not in ("0", "false", "False")
+    if not enabled:
+        logger.info("Email sending is disabled by environment variable")
+    return enabled
+
+async def send_prospect_confirmation(lead_data: Dict[str, str]):
+    if not _email_enabled():
         return
-    # Send email to prospect
-    prospect_message = MessageSchema(
+    message = await build_message(
         subject="Thank you for your interest",
         recipients=[lead_data["email"]],
         body=f"""
@@ -35,12 +286,14 @@ async def send_lead_notification(lead_data: Dict[str, str], attorney_email: str)
 
         Best regards,
         The Legal Team
-        """,
-        subtype=MessageType.plain
+        """
     )
+    await transport.send(message)
 
-    # Send email to attorney
-    attorney_message = MessageSchema(
+async def send_attorney_notification(lead_data: Dict[str, str], attorney_email: str):
+    if not _email_enabled():
+        return
+    message = await build_message(
         subject="New Lead Submission",
         recipients=[attorney_email],
         body=f"""
@@ -51,10 +304,13 @@ async def send_lead_notification(lead_data: Dict[str, str], attorney_email: str)
 
         Please review the attached resume and reach out to the prospect.
         """,
-        subtype=MessageType.plain,
-        attachments=[lead_data['resume_path']]
+        attachments=await _resume_attachments(lead_data)
     )
+    await transport.send(message)
 
-    fm = FastMail(conf)
-    await fm.send_message(prospect_message)
-    await fm.send_message(attorney_message) 
\ No newline at end of file
+async def send_lead_notification(lead_data: Dict[str, str], attorney_email: str):
+    """Both emails of a new lead, as queued before each was a notification of its own."""
+    await asyncio.gather(
+        send_prospect_confirmation(lead_data),
+        send_attorney_notification(lead_data, attorney_email)
+    )
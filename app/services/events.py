@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set
+
+# Events kept for clients resuming with Last-Event-ID
+EVENT_BUFFER_SIZE = int(os.environ.get("EVENT_BUFFER_SIZE", 1000))
+# Events a subscriber may fall behind before it is dropped; it then
+# reconnects and catches up from the buffer
+EVENT_SUBSCRIBER_QUEUE_SIZE = int(os.environ.get("EVENT_SUBSCRIBER_QUEUE_SIZE", 256))
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get("EVENT_HEARTBEAT_SECONDS", 15))
+
+LEAD_CREATED = "lead.created"
+LEAD_STATE_CHANGED = "lead.state_changed"
+# Sent instead of a replay when events after the client's last id are no
+# longer buffered; the client should reload its view
+RESET = "reset"
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    type: str
+    data: Dict[str, Any]
+
+    def encode(self) -> bytes:
+        """The event in the text/event-stream wire format."""
+        payload = json.dumps(self.data, separators=(",", ":"), default=str)
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n".encode()
+
+
+@dataclass(eq=False)
+class Subscription:
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue
+    backlog: List[Event] = field(default_factory=list)
+    overflowed: bool = False
+    closed: bool = False
+
+    def _offer(self, event: Optional[Event]) -> None:
+        # Runs on the subscriber's loop. None closes the stream.
+        if self.closed:
+            return
+        if event is None:
+            self.closed = True
+        elif self.queue.full():
+            self.overflowed = self.closed = True
+        else:
+            self.queue.put_nowait(event)
+            return
+        # Wake a reader blocked on an empty queue
+        if self.queue.empty():
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """
+        The next event; None once the stream is closed. Raises
+        asyncio.TimeoutError if nothing arrives within `timeout`.
+        """
+        if self.backlog:
+            return self.backlog.pop(0)
+        if self.closed and self.queue.empty():
+            return None
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventHub:
+    """
+    In-process broadcast of lead events to streaming clients.
+
+    Every subscriber has a bounded queue; one that falls too far behind is
+    closed rather than buffered without limit, and resumes from the ring
+    buffer of recent events when it reconnects with its last event id.
+    Ids start from the clock in milliseconds so they keep increasing across
+    restarts, and an id from before a restart reads as too old to resume.
+    `publish` may be called from any thread.
+
+    With `relay` set (under the multi-worker launcher), published events
+    are handed to it instead, and come back numbered through
+    `publish_relayed` in every worker's hub, so ids mean the same whichever
+    worker a client reconnects to. If the relay fails the event is
+    published locally.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = EVENT_BUFFER_SIZE,
+        queue_size: int = EVENT_SUBSCRIBER_QUEUE_SIZE,
+    ):
+        self.queue_size = queue_size
+        self._buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._first_id = int(time.time() * 1000)
+        self._next_id = self._first_id
+        self.relay: Optional[Callable[[str, Dict[str, Any]], bool]] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, type: str, data: Dict[str, Any]) -> Optional[Event]:
+        """The published event; None when it was handed to the relay."""
+        if self.relay is not None and self.relay(type, data):
+            return None
+        return self._append(None, type, data)
+
+    def publish_relayed(self, event_id: int, type: str, data: Dict[str, Any]) -> Event:
+        """Publish an event numbered by the relay."""
+        return self._append(event_id, type, data)
+
+    def _append(self, event_id: Optional[int], type: str, data: Dict[str, Any]) -> Event:
+        with self._lock:
+            event = Event(self._next_id if event_id is None else event_id, type, data)
+            self._next_id = max(self._next_id, event.id + 1)
+            self._buffer.append(event)
+            # Streams that ended without unsubscribing (a client gone before
+            # its response started) are dropped here
+            self._subscribers = {s for s in self._subscribers if not s.closed}
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            self._deliver(subscription, event)
+        return event
+
+    def _deliver(self, subscription: Subscription, event: Optional[Event]) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is subscription.loop:
+            subscription._offer(event)
+        elif not subscription.loop.is_closed():
+            subscription.loop.call_soon_threadsafe(subscription._offer, event)
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Register a subscriber on the running loop. With `last_event_id`, the
+        buffered events after it are replayed first, or a reset event is
+        queued when some of them are no longer buffered.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            if last_event_id is not None:
+                oldest = self._buffer[0].id if self._buffer else self._next_id
+                missed = last_event_id + 1 < max(oldest, self._first_id)
+                if missed or last_event_id >= self._next_id:
+                    subscription.backlog = [Event(self._next_id - 1, RESET, {})]
+                else:
+                    subscription.backlog = [event for event in self._buffer if event.id > last_event_id]
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def close(self) -> None:
+        """End every open stream, e.g. at shutdown."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for subscription in subscribers:
+            self._deliver(subscription, None)
+
+
+async def event_stream(
+    hub: EventHub,
+    subscription: Subscription,
+    heartbeat: float = EVENT_HEARTBEAT_SECONDS,
+) -> AsyncIterator[bytes]:
+    """Encode a subscription as text/event-stream, with comment heartbeats."""
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                event = await subscription.get(heartbeat)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if event is None:
+                return
+            yield event.encode()
+    finally:
+        hub.unsubscribe(subscription)
+
+
+lead_events = EventHub()
@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, Iterable, Iterator, Sequence
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _ndjson_chunks(columns: Sequence[str], batches: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, map(_plain, row))), separators=(",", ":")) + "\n"
+            for row in rows
+        ).encode()
+
+
+def _csv_chunks(columns: Sequence[str], batches: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows([_plain(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def serialize_rows(fmt: str, columns: Sequence[str], batches: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    """
+    Encode batches of raw row tuples as NDJSON or CSV, one bytes chunk per batch.
+    """
+    if fmt == "ndjson":
+        return _ndjson_chunks(columns, batches)
+    if fmt == "csv":
+        return _csv_chunks(columns, batches)
+    raise ValueError(f"Unsupported export format {fmt!r}")
@@ -0,0 +1,50 @@
+import csv
+import json
+from typing import Any, Iterator, Tuple
+
+# Media types accepted by the bulk import endpoint
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+Row = Tuple[int, Any]
+
+
+def _csv_rows(path: str) -> Iterator[Row]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        try:
+            for record in reader:
+                yield reader.line_num, record
+        except csv.Error as e:
+            yield reader.line_num, ValueError(f"malformed CSV: {e}")
+        except UnicodeDecodeError:
+            yield reader.line_num + 1, ValueError("body is not valid UTF-8")
+
+
+def _ndjson_rows(path: str) -> Iterator[Row]:
+    with open(path, "rb") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f"invalid JSON: {e}")
+
+
+def read_rows(path: str, fmt: str) -> Iterator[Row]:
+    """
+    Lazily yield (line number, record) pairs from a CSV or NDJSON file.
+
+    Records that cannot be parsed are yielded as exceptions so the caller can
+    report them against their line and carry on.
+    """
+    if fmt == "csv":
+        return _csv_rows(path)
+    if fmt == "ndjson":
+        return _ndjson_rows(path)
+    raise ValueError(f"Unsupported import format {fmt!r}")
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Any, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.crud import notifications as notifications_crud
+from app.db.session import SessionLocal
+from app.services.email import send_attorney_notification, send_lead_notification, send_prospect_confirmation
+
+logger = logging.getLogger(__name__)
+
+# Each email is a notification of its own, so a retry never resends one
+# that already went out
+PROSPECT_CONFIRMATION = "prospect_confirmation"
+ATTORNEY_NOTIFICATION = "attorney_notification"
+# Both emails in one row; only delivered for rows queued before the split
+LEAD_NOTIFICATION = "lead_notification"
+
+NOTIFICATION_WORKERS = int(os.environ.get("NOTIFICATION_WORKERS", 2))
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get("NOTIFICATION_MAX_ATTEMPTS", 5))
+NOTIFICATION_POLL_INTERVAL = float(os.environ.get("NOTIFICATION_POLL_INTERVAL", 5.0))
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+async def _deliver_prospect_confirmation(payload: Dict[str, Any]) -> None:
+    await send_prospect_confirmation(payload["lead"])
+
+
+async def _deliver_attorney_notification(payload: Dict[str, Any]) -> None:
+    await send_attorney_notification(payload["lead"], payload["attorney_email"])
+
+
+async def _deliver_lead_notification(payload: Dict[str, Any]) -> None:
+    await send_lead_notification(payload["lead"], payload["attorney_email"])
+
+
+DEFAULT_HANDLERS: Dict[str, Handler] = {
+    PROSPECT_CONFIRMATION: _deliver_prospect_confirmation,
+    ATTORNEY_NOTIFICATION: _deliver_attorney_notification,
+    LEAD_NOTIFICATION: _deliver_lead_notification,
+}
+
+
+class NotificationWorker:
+    """
+    Pool of asyncio tasks draining the notifications outbox.
+
+    Failed deliveries are retried with exponential backoff and jitter until
+    `max_attempts` is reached, after which the row is marked FAILED.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        concurrency: int = NOTIFICATION_WORKERS,
+        handlers: Optional[Dict[str, Handler]] = None,
+        max_attempts: int = NOTIFICATION_MAX_ATTEMPTS,
+        poll_interval: float = NOTIFICATION_POLL_INTERVAL,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        lease_seconds: int = 60,
+    ):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.handlers = dict(DEFAULT_HANDLERS if handlers is None else handlers)
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        if self.running or self.concurrency < 1:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"notification-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def wake(self) -> None:
+        """Signal that new work was enqueued so idle workers don't wait for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def retry_delay(self, attempts: int) -> float:
+        delay = min(self.base_delay * (2 ** (attempts - 1)), self.max_delay)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await self.process_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification worker iteration failed")
+                processed = False
+            if not processed:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def process_next(self) -> bool:
+        """Claim and deliver a single notification. Returns False when none were due."""
+        claimed = await run_in_threadpool(self._claim)
+        if not claimed:
+            return False
+        notification_id, kind, payload, attempts, lease = claimed
+
+        try:
+            handler = self.handlers[kind]
+            await handler(payload)
+        except Exception as e:
+            retry_at = None
+            if attempts < self.max_attempts:
+                retry_at = datetime.utcnow() + timedelta(seconds=self.retry_delay(attempts))
+            logger.warning(
+                "Delivery of notification %s failed (attempt %s/%s): %s",
+                notification_id, attempts, self.max_attempts, e,
+            )
+            recorded = await run_in_threadpool(
+                self._with_session, notifications_crud.mark_notification_failed,
+                notification_id, lease, repr(e), retry_at,
+            )
+        else:
+            recorded = await run_in_threadpool(
+                self._with_session, notifications_crud.mark_notification_sent, notification_id, lease
+            )
+        if not recorded:
+            logger.warning("Lease on notification %s ran out before its outcome was recorded", notification_id)
+        return True
+
+    def _claim(self):
+        db = self.session_factory()
+        try:
+            rows = notifications_crud.claim_due_notifications(db, 1, self.lease_seconds)
+            if not rows:
+                return None
+            row = rows[0]
+            return row.id, row.kind, row.payload, row.attempts, row.next_attempt_at
+        finally:
+            db.close()
+
+    def _with_session(self, func, *args):
+        db = self.session_factory()
+        try:
+            return func(db, *args)
+        finally:
+            db.close()
+
+
+notification_worker = NotificationWorker()
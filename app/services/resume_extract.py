@@ -0,0 +1,117 @@
+# Resume text extraction and preview rendering. This runs in worker
+# processes, so it imports nothing from the application and a spawned
+# worker only loads the parsers it needs. pypdf reads PDF text; PyMuPDF is
+# optional and, when installed, renders a PNG thumbnail of the first page.
+import re
+import zipfile
+from dataclasses import dataclass
+from typing import List, Optional
+from xml.etree import ElementTree
+
+MAX_TEXT_CHARS = 200_000
+PREVIEW_TEXT_CHARS = 2000
+# Uncompressed size of a .docx's document.xml read at most; a small upload
+# can claim to inflate to gigabytes
+MAX_DOCX_XML_BYTES = 20 * 1024 * 1024
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_UTF16_RUN = re.compile(rb"(?:[\x20-\x7e\t\r\n]\x00){4,}")
+_ASCII_RUN = re.compile(rb"[\x20-\x7e\t\r\n]{4,}")
+
+
+@dataclass
+class Extraction:
+    text: str
+    page_count: Optional[int]
+    preview: bytes
+    preview_content_type: str
+
+
+def _text_preview(first_page: str) -> bytes:
+    return first_page.strip()[:PREVIEW_TEXT_CHARS].encode("utf-8")
+
+
+def _render_pdf_thumbnail(path: str, width: int) -> Optional[bytes]:
+    try:
+        import pymupdf
+    except ImportError:
+        return None
+    with pymupdf.open(path, filetype="pdf") as document:
+        if document.page_count == 0:
+            return None
+        page = document[0]
+        zoom = width / page.rect.width
+        return page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom)).tobytes("png")
+
+
+def _extract_pdf(path: str, preview_width: int) -> Extraction:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages: List[str] = []
+    length = 0
+    for page in reader.pages:
+        page_text = page.extract_text() or ""
+        pages.append(page_text)
+        length += len(page_text)
+        if length >= MAX_TEXT_CHARS:
+            break
+    thumbnail = _render_pdf_thumbnail(path, preview_width)
+    if thumbnail is not None:
+        preview, preview_type = thumbnail, "image/png"
+    else:
+        preview, preview_type = _text_preview(pages[0] if pages else ""), "text/plain; charset=utf-8"
+    return Extraction("\n".join(pages), len(reader.pages), preview, preview_type)
+
+
+def _extract_docx(path: str) -> Extraction:
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo("word/document.xml")
+        if info.file_size > MAX_DOCX_XML_BYTES:
+            raise ValueError(f"document.xml inflates to {info.file_size} bytes")
+        # The declared size can lie, so the read is capped as well
+        with archive.open(info) as f:
+            data = f.read(MAX_DOCX_XML_BYTES + 1)
+        if len(data) > MAX_DOCX_XML_BYTES:
+            raise ValueError(f"document.xml inflates to more than {MAX_DOCX_XML_BYTES} bytes")
+    root = ElementTree.fromstring(data)
+    paragraphs = [
+        "".join(node.text or "" for node in paragraph.iter(f"{_WORD_NS}t"))
+        for paragraph in root.iter(f"{_WORD_NS}p")
+    ]
+    text = "\n".join(p for p in paragraphs if p)
+    return Extraction(text, None, _text_preview(text), "text/plain; charset=utf-8")
+
+
+def _extract_doc(path: str) -> Extraction:
+    # Legacy Word files are binary; keep the readable runs, which Word
+    # stores as either UTF-16LE or single-byte text
+    with open(path, "rb") as f:
+        data = f.read()
+    runs = [run.decode("utf-16-le") for run in _UTF16_RUN.findall(data)]
+    if not runs:
+        runs = [run.decode("latin-1") for run in _ASCII_RUN.findall(data)]
+    text = "\n".join(run.strip() for run in runs if run.strip())
+    return Extraction(text, None, _text_preview(text), "text/plain; charset=utf-8")
+
+
+def _extract_txt(path: str) -> Extraction:
+    with open(path, "rb") as f:
+        text = f.read(MAX_TEXT_CHARS * 4).decode("utf-8", errors="replace")
+    return Extraction(text, None, _text_preview(text), "text/plain; charset=utf-8")
+
+
+def extract_resume(path: str, content_type: Optional[str], preview_width: int = 400) -> Extraction:
+    """Extract plain text and a first-page preview from the resume at `path`."""
+    if content_type == "application/pdf":
+        extraction = _extract_pdf(path, preview_width)
+    elif content_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+        extraction = _extract_docx(path)
+    elif content_type == "application/msword":
+        extraction = _extract_doc(path)
+    elif content_type in (None, "text/plain"):
+        extraction = _extract_txt(path)
+    else:
+        raise ValueError(f"Unsupported resume type {content_type!r}")
+    extraction.text = extraction.text[:MAX_TEXT_CHARS]
+    return extraction
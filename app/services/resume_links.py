@@ -0,0 +1,119 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from app.core.security import DEFAULT_SECRET_KEY, JWT_ACTIVE_KID, JWT_KEYS
+from app.crud.leads import ResumeInfo
+
+RESUME_LINK_TTL_SECONDS = int(os.environ.get("RESUME_LINK_TTL_SECONDS", 300))
+RESUME_LINK_MAX_TTL_SECONDS = int(os.environ.get("RESUME_LINK_MAX_TTL_SECONDS", 3600))
+
+
+class InvalidResumeLink(Exception):
+    pass
+
+
+class ResumeLinkExpired(InvalidResumeLink):
+    pass
+
+
+class ResumeLinksDisabled(Exception):
+    """No secret other than the published default is configured to sign links with."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _link_secret(configured: Optional[str], jwt_key: str) -> Optional[str]:
+    """
+    The secret links are signed with: `configured` if set, otherwise one
+    derived from the active JWT key. None while only the default secret
+    is available.
+    """
+    if configured:
+        return None if configured == DEFAULT_SECRET_KEY else configured
+    if jwt_key == DEFAULT_SECRET_KEY:
+        return None
+    # Derived rather than reused, so a link never doubles as a JWT key
+    return _b64encode(hmac.new(jwt_key.encode(), b"resume-links", hashlib.sha256).digest())
+
+
+RESUME_LINK_SECRET = _link_secret(os.environ.get("RESUME_LINK_SECRET"), JWT_KEYS[JWT_ACTIVE_KID])
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _signature(payload: str, secret: Optional[str]) -> str:
+    secret = secret or RESUME_LINK_SECRET
+    if not secret or secret == DEFAULT_SECRET_KEY:
+        raise ResumeLinksDisabled("Set RESUME_LINK_SECRET or a JWT key other than the default")
+    return _b64encode(hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def sign_resume_link(
+    info: ResumeInfo,
+    expires_in: Optional[int] = None,
+    secret: Optional[str] = None,
+    now: Optional[float] = None,
+) -> Tuple[str, int]:
+    """
+    Create a token granting download of one resume until it expires.
+
+    Everything needed to serve the file is carried in the signed payload,
+    so redeeming the token needs neither the database nor a bearer token.
+    Returns the token and its expiry as a Unix timestamp. Raises
+    ResumeLinksDisabled while no usable secret is configured.
+    """
+    expires_in = RESUME_LINK_TTL_SECONDS if expires_in is None else expires_in
+    expires_in = max(1, min(expires_in, RESUME_LINK_MAX_TTL_SECONDS))
+    expires_at = int(now if now is not None else time.time()) + expires_in
+    payload = _b64encode(json.dumps(
+        [
+            info.key,
+            info.filename,
+            info.content_type,
+            info.size,
+            int(info.last_modified.replace(tzinfo=timezone.utc).timestamp()),
+            expires_at,
+        ],
+        separators=(",", ":"),
+    ).encode())
+    return f"{payload}.{_signature(payload, secret)}", expires_at
+
+
+def verify_resume_link(
+    token: str,
+    secret: Optional[str] = None,
+    now: Optional[float] = None,
+) -> Tuple[ResumeInfo, int]:
+    """
+    Check a token's signature and expiry and return the resume it grants
+    along with the expiry timestamp. Raises InvalidResumeLink,
+    ResumeLinkExpired or ResumeLinksDisabled.
+    """
+    payload, _, signature = token.partition(".")
+    expected = _signature(payload, secret)
+    if not signature or not hmac.compare_digest(signature, expected):
+        raise InvalidResumeLink("Invalid signature")
+    try:
+        key, filename, content_type, size, last_modified, expires_at = json.loads(_b64decode(payload))
+    except (TypeError, ValueError):
+        raise InvalidResumeLink("Malformed link")
+    if (now if now is not None else time.time()) >= expires_at:
+        raise ResumeLinkExpired("Link has expired")
+    info = ResumeInfo(
+        key=key,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        last_modified=datetime.fromtimestamp(last_modified, timezone.utc).replace(tzinfo=None),
+    )
+    return info, expires_at
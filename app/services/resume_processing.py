@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.crud import leads as leads_crud
+from app.crud import resume_jobs as resume_jobs_crud
+from app.db import models
+from app.db.session import SessionLocal
+from app.services.resume_extract import Extraction, extract_resume
+from app.services.storage import ResumeStorage, storage as default_storage
+
+logger = logging.getLogger(__name__)
+
+RESUME_PROCESS_WORKERS = int(
+    os.environ.get("RESUME_PROCESS_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+)
+RESUME_JOB_MAX_ATTEMPTS = int(os.environ.get("RESUME_JOB_MAX_ATTEMPTS", 3))
+RESUME_JOB_POLL_INTERVAL = float(os.environ.get("RESUME_JOB_POLL_INTERVAL", 5.0))
+RESUME_JOB_LEASE_SECONDS = int(os.environ.get("RESUME_JOB_LEASE_SECONDS", 300))
+RESUME_PREVIEW_WIDTH = int(os.environ.get("RESUME_PREVIEW_WIDTH", 400))
+
+
+class ResumeProcessor:
+    """
+    Background pipeline extracting text and a first-page preview from
+    every stored resume.
+
+    Jobs are claimed from the resume_jobs table by `workers` asyncio tasks,
+    and the parsing itself runs in a process pool of the same size so PDF
+    parsing never competes with request handling for the GIL. Results are
+    written next to the blob in storage and the text is added to the
+    full-text index of every lead sharing the file.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        storage: ResumeStorage = default_storage,
+        workers: int = RESUME_PROCESS_WORKERS,
+        max_attempts: int = RESUME_JOB_MAX_ATTEMPTS,
+        poll_interval: float = RESUME_JOB_POLL_INTERVAL,
+        lease_seconds: int = RESUME_JOB_LEASE_SECONDS,
+        preview_width: int = RESUME_PREVIEW_WIDTH,
+        executor: Optional[Executor] = None,
+    ):
+        self.session_factory = session_factory
+        self.storage = storage
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.preview_width = preview_width
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # Spawned rather than forked: the parent has live threads and
+            # database connections that must not be copied into children
+            self._executor = ProcessPoolExecutor(
+                max_workers=max(1, self.workers),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def start(self) -> None:
+        if self.running or self.workers < 1:
+            return
+        self._get_executor()
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"resume-processor-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._owns_executor and self._executor is not None:
+            # Jobs cut short here keep their lease and are run again later
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def retry_delay(self, attempts: int) -> float:
+        return min(10.0 * (2 ** (attempts - 1)), 600.0) * random.uniform(0.5, 1.0)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await self.process_next()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Resume processor iteration failed")
+                processed = False
+            if not processed:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def process_next(self) -> bool:
+        """Claim and process a single job. Returns False when none were due."""
+        claimed = await run_in_threadpool(
+            self._with_session, resume_jobs_crud.claim_due_resume_jobs, 1, self.lease_seconds
+        )
+        if not claimed:
+            return False
+        key, content_type, attempts = claimed[0]
+
+        try:
+            extraction = await self._extract(key, content_type)
+            await run_in_threadpool(self._store, key, extraction)
+        except Exception as e:
+            retry_at = None
+            if attempts < self.max_attempts:
+                retry_at = datetime.utcnow() + timedelta(seconds=self.retry_delay(attempts))
+            logger.warning(
+                "Processing of resume %s failed (attempt %s/%s): %s",
+                key, attempts, self.max_attempts, e,
+            )
+            await run_in_threadpool(
+                self._with_session, resume_jobs_crud.mark_resume_job_failed, key, repr(e), retry_at
+            )
+        return True
+
+    async def _extract(self, key: str, content_type: Optional[str]) -> Extraction:
+        loop = asyncio.get_running_loop()
+        path = self.storage.local_path(key)
+        if path is not None:
+            return await loop.run_in_executor(
+                self._get_executor(), extract_resume, path, content_type, self.preview_width
+            )
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            await run_in_threadpool(self.storage.download, key, path)
+            return await loop.run_in_executor(
+                self._get_executor(), extract_resume, path, content_type, self.preview_width
+            )
+        finally:
+            os.remove(path)
+
+    def _store(self, key: str, extraction: Extraction) -> None:
+        self.storage.put_derived(key, "txt", extraction.text.encode("utf-8"))
+        self.storage.put_derived(key, "preview", extraction.preview)
+        db = self.session_factory()
+        try:
+            # Indexing and completion commit together, so a lead added while
+            # the job ran is either covered here or sees the job as done
+            leads_crud.set_resume_text_for_key(db, key, extraction.text, commit=False)
+            resume_jobs_crud.mark_resume_job_done(
+                db, key, extraction.page_count, extraction.preview_content_type
+            )
+        finally:
+            db.close()
+
+    def index_processed_resume(self, db: Session, lead_id: int, key: str) -> None:
+        """Index the text of an already processed resume for a newly added lead."""
+        job = resume_jobs_crud.get_resume_job(db, key)
+        if job is None or job.status != models.ResumeJobStatus.DONE:
+            return
+        text = self.storage.read_derived(key, "txt")
+        if text is not None:
+            leads_crud.set_resume_text(db, lead_id, text.decode("utf-8"))
+
+    def _with_session(self, func, *args):
+        db = self.session_factory()
+        try:
+            return func(db, *args)
+        finally:
+            db.close()
+
+
+resume_processor = ResumeProcessor()
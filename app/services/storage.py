@@ -0,0 +1,315 @@
+import functools
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Iterator, Optional
+
+RESUME_STORAGE_BACKEND = os.environ.get("RESUME_STORAGE_BACKEND", "local")
+RESUME_STORAGE_DIR = os.environ.get("RESUME_STORAGE_DIR", "uploads")
+S3_BUCKET = os.environ.get("S3_BUCKET", "")
+S3_PREFIX = os.environ.get("S3_PREFIX", "resumes/")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None
+# Where resumes were written, as uploads/{email}_{filename}, before content addressing
+LEGACY_UPLOAD_DIR = os.environ.get("LEGACY_UPLOAD_DIR", "uploads")
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Files derived from a resume (extracted text, preview) are stored next to it
+DERIVED_NAMES = ("txt", "preview")
+
+
+class ResumeStorage(ABC):
+    """
+    Content-addressed blob store for resumes.
+
+    Keys are the SHA-256 hex digest of the content, so storing the same
+    file twice keeps a single copy. Uploads are first streamed into
+    `staging_dir` and then handed over with `put`. Which leads still
+    reference a blob is tracked in the database, not by the backend.
+    """
+
+    staging_dir: str
+
+    def staging_path(self) -> str:
+        return os.path.join(self.staging_dir, uuid.uuid4().hex)
+
+    @abstractmethod
+    def put(self, staged_path: str, key: str) -> bool:
+        """Move a staged file into storage. Returns False if the key was already stored."""
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path of a stored blob, for backends that keep files on local disk."""
+        return None
+
+    @abstractmethod
+    def put_derived(self, key: str, name: str, data: bytes) -> None:
+        """Store a file derived from the blob `key`, replacing any earlier version."""
+        ...
+
+    @abstractmethod
+    def read_derived(self, key: str, name: str) -> Optional[bytes]:
+        ...
+
+    def download(self, key: str, path: str) -> None:
+        """Copy a stored blob to a local file."""
+        with open(path, "wb") as out:
+            for chunk in self.iter_chunks(key):
+                out.write(chunk)
+
+    def read(self, key: str) -> bytes:
+        with self.open(key) as f:
+            return f.read()
+
+    def iter_chunks(self, key: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        with self.open(key) as f:
+            yield from _read_chunks(f, chunk_size)
+
+    def iter_range(
+        self, key: str, start: int, length: int, chunk_size: int = READ_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """Yield `length` bytes of a stored blob beginning at offset `start`."""
+        with self.open(key) as f:
+            f.seek(start)
+            yield from _read_chunks(f, chunk_size, length)
+
+
+def _check_derived_name(name: str) -> str:
+    if name not in DERIVED_NAMES:
+        raise ValueError(f"Invalid derived file name {name!r}")
+    return name
+
+
+def _read_chunks(f: BinaryIO, chunk_size: int, limit: Optional[int] = None) -> Iterator[bytes]:
+    remaining = limit
+    while remaining is None or remaining > 0:
+        chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+        if not chunk:
+            return
+        if remaining is not None:
+            remaining -= len(chunk)
+        yield chunk
+
+
+def is_content_key(key: str) -> bool:
+    """
+    Whether `key` is a content hash. Leads saved before content addressing
+    instead hold the path their resume was written to, relative to the
+    working directory, and those files are read where they are.
+    """
+    return len(key) == 64 and all(c in "0123456789abcdef" for c in key)
+
+
+def _check_legacy_path(key: str) -> str:
+    # Keys end up in signed download links, so a legacy key may only name
+    # a file inside the old upload directory, wherever symlinks lead
+    legacy_dir = os.path.realpath(LEGACY_UPLOAD_DIR)
+    if os.path.isabs(key) or os.path.dirname(os.path.realpath(key)) != legacy_dir:
+        raise ValueError(f"Invalid storage key {key!r}")
+    return key
+
+
+def _check_key(key: str) -> str:
+    if not is_content_key(key):
+        raise ValueError(f"Invalid storage key {key!r}")
+    return key
+
+
+class LocalContentStore(ResumeStorage):
+    """
+    Blobs on local disk under `root/ab/cd/<sha256>`.
+
+    Two levels of sharding keep every directory small enough to list
+    quickly however many resumes are stored.
+    """
+
+    def __init__(self, root: str = RESUME_STORAGE_DIR):
+        self.root = root
+        self.staging_dir = os.path.join(root, ".staging")
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    def local_path(self, key: str) -> str:
+        if not is_content_key(key):
+            return _check_legacy_path(key)
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, staged_path: str, key: str) -> bool:
+        path = self.local_path(key)
+        if os.path.exists(path):
+            os.remove(staged_path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(staged_path, path)
+        return True
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.local_path(key))
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.local_path(key), "rb")
+
+    def delete(self, key: str) -> None:
+        path = self.local_path(key)
+        for target in [path] + [f"{path}.{name}" for name in DERIVED_NAMES]:
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
+
+    def _derived_path(self, key: str, name: str) -> str:
+        return f"{self.local_path(key)}.{_check_derived_name(name)}"
+
+    def put_derived(self, key: str, name: str, data: bytes) -> None:
+        path = self._derived_path(key, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def read_derived(self, key: str, name: str) -> Optional[bytes]:
+        try:
+            with open(self._derived_path(key, name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+def _legacy_on_local_disk(method):
+    # Resumes saved before content addressing were only ever on local disk
+    @functools.wraps(method)
+    def wrapper(self, key: str, *args, **kwargs):
+        if is_content_key(key):
+            return method(self, key, *args, **kwargs)
+        return getattr(self.legacy, method.__name__)(key, *args, **kwargs)
+    return wrapper
+
+
+class S3Storage(ResumeStorage):
+    """
+    Blobs in an S3-compatible bucket under `prefix + <sha256>`.
+
+    Requires boto3. `endpoint_url` points it at MinIO or another
+    S3-compatible service. Resumes of leads saved before content
+    addressing are still read from local disk.
+    """
+
+    def __init__(
+        self,
+        bucket: str = S3_BUCKET,
+        prefix: str = S3_PREFIX,
+        endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+        staging_dir: Optional[str] = None,
+        client=None,
+    ):
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("The S3 storage backend requires boto3 (pip install boto3)")
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.staging_dir = staging_dir or os.path.join(RESUME_STORAGE_DIR, ".staging")
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self.legacy = LocalContentStore()
+
+    def _object_key(self, key: str) -> str:
+        return self.prefix + _check_key(key)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None if is_content_key(key) else _check_legacy_path(key)
+
+    @_legacy_on_local_disk
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def put(self, staged_path: str, key: str) -> bool:
+        try:
+            if self.exists(key):
+                return False
+            self.client.upload_file(staged_path, self.bucket, self._object_key(key))
+            return True
+        finally:
+            os.remove(staged_path)
+
+    @_legacy_on_local_disk
+    def open(self, key: str) -> BinaryIO:
+        return self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))["Body"]
+
+    @_legacy_on_local_disk
+    def iter_range(
+        self, key: str, start: int, length: int, chunk_size: int = READ_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        # Let S3 do the slicing rather than reading past the start of the object
+        body = self.client.get_object(
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            Range=f"bytes={start}-{start + length - 1}",
+        )["Body"]
+        with body:
+            yield from _read_chunks(body, chunk_size, length)
+
+    @_legacy_on_local_disk
+    def delete(self, key: str) -> None:
+        object_key = self._object_key(key)
+        self.client.delete_objects(
+            Bucket=self.bucket,
+            Delete={"Objects": [{"Key": object_key}] + [
+                {"Key": f"{object_key}.{name}"} for name in DERIVED_NAMES
+            ]},
+        )
+
+    @_legacy_on_local_disk
+    def put_derived(self, key: str, name: str, data: bytes) -> None:
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=f"{self._object_key(key)}.{_check_derived_name(name)}",
+            Body=data,
+        )
+
+    @_legacy_on_local_disk
+    def read_derived(self, key: str, name: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket, Key=f"{self._object_key(key)}.{_check_derived_name(name)}"
+            )
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    @_legacy_on_local_disk
+    def download(self, key: str, path: str) -> None:
+        self.client.download_file(self.bucket, self._object_key(key), path)
+
+
+def create_storage(backend: str = RESUME_STORAGE_BACKEND) -> ResumeStorage:
+    if backend == "local":
+        return LocalContentStore()
+    if backend == "s3":
+        return S3Storage()
+    raise ValueError(f"Unknown resume storage backend {backend!r}, expected 'local' or 's3'")
+
+
+storage = create_storage()
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+
+from app.core.metrics import UPLOAD_BYTES, UPLOAD_THROUGHPUT
+
+# Uploads are copied in fixed-size chunks so memory per request stays bounded
+CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 64 * 1024))
+MAX_RESUME_SIZE = int(os.environ.get("MAX_RESUME_SIZE", 10 * 1024 * 1024))
+# Room for the other form fields and the multipart framing around a resume
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_size: int):
+        super().__init__(f"Upload exceeds the maximum size of {max_size} bytes")
+        self.max_size = max_size
+
+
+class BodySizeLimitMiddleware:
+    """
+    Pure ASGI middleware capping the request body of selected routes.
+
+    Starlette's form parser spools a whole upload to disk before the
+    endpoint runs, so a limit checked there only applies once the upload
+    has been received. Here a declared Content-Length over the limit is
+    answered with 413 before anything is read, and a body that grows past
+    it ends the request with 413 as soon as the excess arrives. `limits`
+    maps (method, path) to a size in bytes; trailing slashes are ignored.
+    """
+
+    def __init__(self, app, limits: Optional[Dict[Tuple[str, str], int]] = None):
+        self.app = app
+        self.limits = {
+            (method, path.rstrip("/")): limit
+            for (method, path), limit in (limits or {}).items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.limits.get((scope["method"], scope["path"].rstrip("/")))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body exceeds the maximum size of {limit} bytes"
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Passed through the form parser to the exception handlers
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+@dataclass
+class StoredUpload:
+    path: str
+    sha256: str
+    size: int
+
+
+async def _discard(path: str) -> None:
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def save_stream(
+    chunks: AsyncIterator[bytes],
+    destination: str,
+    max_size: Optional[int] = None,
+) -> StoredUpload:
+    """
+    Write an async stream of byte chunks to `destination`.
+
+    Bytes are hashed and counted as they arrive and written to a temporary
+    file in the destination directory, which is renamed into place only once
+    the whole stream has been accepted. Raises UploadTooLarge as soon as the
+    size limit is crossed; no partial file is left behind.
+    """
+    max_size = MAX_RESUME_SIZE if max_size is None else max_size
+
+    directory = os.path.dirname(destination) or "."
+    tmp_path = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    started = time.perf_counter()
+
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(max_size)
+                digest.update(chunk)
+                await out.write(chunk)
+        await aiofiles.os.replace(tmp_path, destination)
+    except BaseException:
+        await _discard(tmp_path)
+        raise
+
+    elapsed = time.perf_counter() - started
+    UPLOAD_BYTES.inc(size)
+    if size and elapsed > 0:
+        UPLOAD_THROUGHPUT.observe(size / elapsed)
+
+    return StoredUpload(path=destination, sha256=digest.hexdigest(), size=size)
+
+
+async def save_upload(
+    upload: UploadFile,
+    destination: str,
+    max_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> StoredUpload:
+    """Stream an uploaded file to `destination` in chunks of `chunk_size` bytes."""
+    chunk_size = CHUNK_SIZE if chunk_size is None else chunk_size
+
+    async def chunks():
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    return await save_stream(chunks(), destination, max_size)
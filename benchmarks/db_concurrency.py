@@ -0,0 +1,148 @@
+"""
+Measure what running CRUD calls on the threadpool buys under concurrency.
+
+Seeds a temporary SQLite database, then fires concurrent authenticated
+`GET /api/leads/` requests at the app in-process while a ticker task
+measures event-loop lag. `--inline` runs the CRUD calls directly on the
+event loop instead, which is how the endpoints behaved before.
+
+    python -m benchmarks.db_concurrency --leads 50000 --requests 400 --concurrency 32
+    python -m benchmarks.db_concurrency --leads 50000 --requests 400 --concurrency 32 --inline
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+import httpx
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+
+def _seed(engine, lead_count: int) -> None:
+    from app.db import models
+
+    rows = [
+        {
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "email": f"lead{i}@example.com",
+            "resume_path": f"uploads/lead{i}.pdf",
+        }
+        for i in range(lead_count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(models.Lead), rows)
+
+
+async def _inline(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+async def _run(args) -> dict:
+    from app.main import app
+    from app.api.endpoints import leads as leads_endpoints
+    from app.core import security
+    from app.crud import users as users_crud
+    from app.db.models import Base
+    from app.db.session import get_db
+
+    if args.inline:
+        leads_endpoints.run_in_threadpool = _inline
+        security.run_in_threadpool = _inline
+
+    workdir = tempfile.mkdtemp(prefix="leads-bench-")
+    engine = create_engine(
+        f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        connect_args={"check_same_thread": False},
+        pool_size=args.concurrency,
+        max_overflow=0,
+    )
+    Base.metadata.create_all(bind=engine)
+    _seed(engine, args.leads)
+    SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with SessionFactory() as db:
+        users_crud.create_user(db, "bench@example.com", hashed_password="unused")
+    token = security.create_access_token({"sub": "bench@example.com"}, timedelta(hours=1))
+
+    def _get_bench_db():
+        db = SessionFactory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = _get_bench_db
+
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        interval = 0.005
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - start - interval)
+
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://bench",
+        headers={"Authorization": f"Bearer {token}"},
+    ) as client:
+        async def one_request(i: int):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(
+                    "/api/leads/",
+                    params={"page_size": 100, "after_id": (i * 97) % max(args.leads, 1)},
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        tick_task = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await tick_task
+
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+    latencies.sort()
+    return {
+        "mode": "inline" if args.inline else "threadpool",
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "rps": round(args.requests / elapsed, 1),
+        "latency_ms": {
+            "p50": round(statistics.median(latencies) * 1000, 2),
+            "p95": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        },
+        "event_loop_lag_ms": {
+            "max": round(max(lags, default=0) * 1000, 2),
+            "mean": round(statistics.fmean(lags) * 1000, 2) if lags else 0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--inline", action="store_true", help="run CRUD on the event loop (old behaviour)")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
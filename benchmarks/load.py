@@ -0,0 +1,378 @@
+"""
+Reproducible load test for the leads API.
+
+Starts the app against a temporary SQLite database and a local SMTP sink,
+either in-process (httpx over ASGI) or as a real uvicorn server, seeds it,
+then drives each scenario in turn and prints a JSON report with RPS and
+p50/p95/p99 latencies per scenario. Scenarios:
+
+    submit    concurrent multipart lead submissions with resumes
+    list      keyset-paginated listing at random depths of the seeded table
+    download  resume downloads, some revalidated with If-None-Match
+    login     a storm of password logins
+    mixed     all of the above at once, weighted like dashboard traffic
+
+    python -m benchmarks.load --seed 1000000 --output run.json
+    python -m benchmarks.load --server uvicorn --scenarios list,download
+    python -m benchmarks.load --db /tmp/leads-1m.db --baseline run.json
+
+`--db` keeps the seeded database between runs so large seeds are paid for
+once; `--baseline` adds the change in RPS and p95 against an earlier report.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+SCENARIOS = ("submit", "list", "download", "login", "mixed")
+MIX_WEIGHTS = {"list": 60, "download": 25, "submit": 10, "login": 5}
+SEED_BATCH_SIZE = 50_000
+USER_EMAIL = "bench@example.com"
+USER_PASSWORD = "bench-password"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _configure_environment(args, workdir: str, smtp_port: int) -> Dict[str, str]:
+    # Must run before any app module is imported: they read settings at import
+    db_path = args.db or os.path.join(workdir, "bench.db")
+    env = {
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "RESUME_STORAGE_BACKEND": "local",
+        # Kept beside the database so a reused database still finds its resumes
+        "RESUME_STORAGE_DIR": os.path.splitext(db_path)[0] + "-uploads",
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": str(smtp_port),
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "RESUME_PROCESS_WORKERS": "0",
+    }
+    os.environ.update(env)
+    return env
+
+
+def _seed(lead_count: int) -> int:
+    """Bulk-insert synthetic leads until the table holds `lead_count` rows."""
+    from sqlalchemy import func, insert, select
+
+    from app.crud.leads import LEAD_COUNTER
+    from app.db import models
+    from app.db.session import engine
+
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(models.Lead)).scalar_one()
+    now = datetime.utcnow()
+    for start in range(existing, lead_count, SEED_BATCH_SIZE):
+        rows = [
+            {
+                "first_name": f"First{i}",
+                "last_name": f"Last{i}",
+                "email": f"lead{i}@example.com",
+                "state": models.LeadState.REACHED_OUT if i % 3 == 0 else models.LeadState.PENDING,
+                "created_at": now - timedelta(seconds=lead_count - i),
+                "updated_at": now - timedelta(seconds=lead_count - i),
+            }
+            for i in range(start, min(start + SEED_BATCH_SIZE, lead_count))
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(models.Lead), rows)
+    with engine.begin() as conn:
+        total = conn.execute(select(func.count()).select_from(models.Lead)).scalar_one()
+        conn.execute(models.Counter.__table__.delete().where(models.Counter.name == LEAD_COUNTER))
+        conn.execute(insert(models.Counter), [{"name": LEAD_COUNTER, "value": total}])
+    return total
+
+
+def _ensure_user() -> str:
+    from app.core import security
+    from app.crud import users as users_crud
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        if users_crud.get_user_by_email(db, USER_EMAIL) is None:
+            users_crud.create_user(db, USER_EMAIL, password=USER_PASSWORD)
+    return security.create_access_token({"sub": USER_EMAIL}, timedelta(hours=2))
+
+
+def _resume_bytes(rng: random.Random, size: int) -> bytes:
+    return b"%PDF-1.4\n" + rng.randbytes(max(0, size - 9))
+
+
+class LoadRunner:
+    def __init__(self, client: httpx.AsyncClient, token: str, lead_count: int, args):
+        self.client = client
+        self.auth = {"Authorization": f"Bearer {token}"}
+        self.lead_count = max(lead_count, 1)
+        self.args = args
+        self.rng = random.Random(args.random_seed)
+        self.resume_ids: List[int] = []
+        self.etags: Dict[int, str] = {}
+        # A fixed pool of resume bodies, so some submissions hit the dedupe path
+        self.resumes = [_resume_bytes(self.rng, args.resume_size) for _ in range(args.distinct_resumes)]
+        self._submitted = 0
+
+    async def submit(self) -> httpx.Response:
+        self._submitted += 1
+        response = await self.client.post(
+            "/api/leads/",
+            data={
+                "first_name": "Bench",
+                "last_name": f"Lead{self._submitted}",
+                "email": f"bench{self._submitted}@example.com",
+            },
+            files={"resume": ("resume.pdf", self.rng.choice(self.resumes), "application/pdf")},
+        )
+        if response.status_code == 200:
+            self.resume_ids.append(response.json()["id"])
+        return response
+
+    async def list(self) -> httpx.Response:
+        params = {
+            "page_size": self.args.page_size,
+            "after_id": self.rng.randrange(self.lead_count),
+            "include_total": "false",
+        }
+        if self.rng.random() < 0.2:
+            params["state"] = "REACHED_OUT"
+        return await self.client.get("/api/leads/", params=params, headers=self.auth)
+
+    async def download(self) -> httpx.Response:
+        lead_id = self.rng.choice(self.resume_ids)
+        headers = dict(self.auth)
+        etag = self.etags.get(lead_id)
+        if etag and self.rng.random() < self.args.revalidate:
+            headers["If-None-Match"] = etag
+        response = await self.client.get(f"/api/leads/{lead_id}/resume", headers=headers)
+        if "etag" in response.headers:
+            self.etags[lead_id] = response.headers["etag"]
+        return response
+
+    async def login(self) -> httpx.Response:
+        return await self.client.post(
+            "/api/auth/token", data={"username": USER_EMAIL, "password": USER_PASSWORD}
+        )
+
+    async def mixed(self) -> httpx.Response:
+        scenario = self.rng.choices(list(MIX_WEIGHTS), weights=list(MIX_WEIGHTS.values()))[0]
+        return await getattr(self, scenario)()
+
+    async def drive(self, scenario: str, requests: int, concurrency: int) -> dict:
+        make_request: Callable[[], Awaitable[httpx.Response]] = getattr(self, scenario)
+        latencies: List[float] = []
+        statuses: Counter = Counter()
+        errors = 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await make_request()
+                except httpx.HTTPError:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        ok = sum(count for status, count in statuses.items() if status < 400)
+        return {
+            "requests": requests,
+            "concurrency": concurrency,
+            "seconds": round(elapsed, 3),
+            "rps": round(requests / elapsed, 1) if elapsed else 0.0,
+            "ok_rps": round(ok / elapsed, 1) if elapsed else 0.0,
+            "latency_ms": {
+                "p50": round(_percentile(latencies, 0.50) * 1000, 2),
+                "p95": round(_percentile(latencies, 0.95) * 1000, 2),
+                "p99": round(_percentile(latencies, 0.99) * 1000, 2),
+                "mean": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+                "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            },
+            "status": {str(status): count for status, count in sorted(statuses.items())},
+            "transport_errors": errors,
+        }
+
+
+async def _run_scenarios(client: httpx.AsyncClient, token: str, lead_count: int, args) -> dict:
+    runner = LoadRunner(client, token, lead_count, args)
+    # Resumes for the download scenario; not part of any measurement
+    while len(runner.resume_ids) < args.distinct_resumes:
+        (await runner.submit()).raise_for_status()
+
+    results = {}
+    for scenario in args.scenarios:
+        if args.warmup:
+            await runner.drive(scenario, args.warmup, args.concurrency)
+        results[scenario] = await runner.drive(scenario, args.requests, args.concurrency)
+    return results
+
+
+async def _run_in_process(token: str, lead_count: int, args) -> dict:
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await _run_scenarios(client, token, lead_count, args)
+
+
+async def _run_uvicorn(token: str, lead_count: int, args, env: Dict[str, str]) -> dict:
+    port = _free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        ],
+        env={**os.environ, **env},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    (await client.get("/metrics")).raise_for_status()
+                    break
+                except httpx.HTTPError:
+                    if time.monotonic() > deadline or server.poll() is not None:
+                        raise RuntimeError("uvicorn did not start")
+                    await asyncio.sleep(0.2)
+            return await _run_scenarios(client, token, lead_count, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _compare(results: dict, baseline_path: str) -> dict:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["scenarios"]
+    deltas = {}
+    for scenario, current in results.items():
+        previous = baseline.get(scenario)
+        if not previous:
+            continue
+        deltas[scenario] = {
+            "rps_change_pct": round((current["rps"] / previous["rps"] - 1) * 100, 1) if previous["rps"] else None,
+            "p95_change_pct": round(
+                (current["latency_ms"]["p95"] / previous["latency_ms"]["p95"] - 1) * 100, 1
+            ) if previous["latency_ms"]["p95"] else None,
+        }
+    return deltas
+
+
+def run(args) -> dict:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.handlers import Sink
+
+    workdir = tempfile.mkdtemp(prefix="leads-load-")
+    smtp_port = _free_port()
+    sink = Controller(Sink(), hostname="127.0.0.1", port=smtp_port)
+    sink.start()
+    try:
+        env = _configure_environment(args, workdir, smtp_port)
+        seed_started = time.perf_counter()
+        lead_count = _seed(args.seed)
+        seed_seconds = time.perf_counter() - seed_started
+        token = _ensure_user()
+
+        if args.server == "uvicorn":
+            results = asyncio.run(_run_uvicorn(token, lead_count, args, env))
+        else:
+            results = asyncio.run(_run_in_process(token, lead_count, args))
+    finally:
+        sink.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "server": args.server,
+            "seeded_leads": lead_count,
+            "seed_seconds": round(seed_seconds, 1),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "scenarios": results,
+    }
+    if args.baseline:
+        report["baseline_delta"] = _compare(results, args.baseline)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--scenarios", default="submit,list,download,login,mixed",
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--seed", type=int, default=100_000, help="leads in the table before the run")
+    parser.add_argument("--db", help="database file to reuse across runs (default: a temp file)")
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--resume-size", type=int, default=100 * 1024, help="bytes per submitted resume")
+    parser.add_argument("--distinct-resumes", type=int, default=20)
+    parser.add_argument("--revalidate", type=float, default=0.5,
+                        help="share of repeat downloads sent with If-None-Match")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Compare the CPU cost of building and encoding one page of leads.
+
+"model" is the previous list endpoint path: ORM objects validated into
+PaginatedLeads, validated again against the response model and rendered
+with the standard JSONResponse. "fast" is `get_leads_page` encoded with
+ORJSONResponse. Both read the same pages from a seeded temporary database.
+
+    python -m benchmarks.serialization --leads 20000 --page-size 100 --pages 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+
+def _seed(engine, lead_count: int) -> None:
+    from app.db import models
+
+    rows = [
+        {
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "email": f"lead{i}@example.com",
+            "resume_path": f"{i:064x}",
+            "resume_filename": f"lead{i}.pdf",
+        }
+        for i in range(lead_count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(models.Lead), rows)
+
+
+async def _model_page(db, page_size: int, after_id: int, field) -> bytes:
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from app.crud import leads as leads_crud
+
+    page = leads_crud.get_leads(db, page_size, after_id)
+    content = await serialize_response(field=field, response_content=page, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def _fast_page(db, page_size: int, after_id: int, field) -> bytes:
+    from fastapi.responses import ORJSONResponse
+    from app.crud import leads as leads_crud
+
+    return ORJSONResponse(leads_crud.get_leads_page(db, page_size, after_id)).body
+
+
+async def _measure(render, SessionFactory, args, cursors, field) -> dict:
+    with SessionFactory() as db:
+        for after_id in cursors[: args.warmup]:
+            await render(db, args.page_size, after_id, field)
+        sizes = 0
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        for after_id in cursors:
+            sizes += len(await render(db, args.page_size, after_id, field))
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+    return {
+        "cpu_ms_per_page": round(cpu * 1000 / len(cursors), 3),
+        "wall_ms_per_page": round(wall * 1000 / len(cursors), 3),
+        "bytes_per_page": sizes // len(cursors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--random-seed", type=int, default=1)
+    args = parser.parse_args()
+
+    from fastapi.utils import create_response_field
+    from app.db.models import Base
+    from app.schemas import PaginatedLeads
+
+    workdir = tempfile.mkdtemp(prefix="leads-serialization-")
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    _seed(engine, args.leads)
+    SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    rng = random.Random(args.random_seed)
+    cursors = [rng.randint(0, max(0, args.leads - args.page_size)) for _ in range(args.pages)]
+    field = create_response_field(name="Response_list_leads", type_=PaginatedLeads)
+
+    with SessionFactory() as db:
+        assert asyncio.run(_model_page(db, 5, 0, field)) == asyncio.run(_fast_page(db, 5, 0, field)), \
+            "fast path output differs from the model path"
+
+    results = {
+        name: asyncio.run(_measure(render, SessionFactory, args, cursors, field))
+        for name, render in (("model", _model_page), ("fast", _fast_page))
+    }
+    results["cpu_reduction"] = round(
+        1 - results["fast"]["cpu_ms_per_page"] / results["model"]["cpu_ms_per_page"], 3
+    )
+    print(json.dumps({"args": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
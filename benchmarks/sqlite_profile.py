@@ -0,0 +1,112 @@
+"""
+Compare SQLite write/read throughput between engine profiles.
+
+For each profile a fresh database file is created and seeded, then writer
+threads insert leads (one commit per lead, like `create_lead`) while reader
+threads page through `get_leads` for a fixed duration.
+
+    python -m benchmarks.sqlite_profile --writers 4 --readers 8 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+
+def _run_profile(profile: str, args) -> dict:
+    from app.crud import leads as leads_crud
+    from app.db import models
+    from app.db.session import create_db_engine
+
+    workdir = tempfile.mkdtemp(prefix=f"leads-{profile}-")
+    engine = create_db_engine(
+        f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        profile=profile,
+        pool_size=args.writers + args.readers,
+        max_overflow=0,
+    )
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Lead), [
+            {
+                "first_name": f"First{i}",
+                "last_name": f"Last{i}",
+                "email": f"seed{i}@example.com",
+                "resume_path": f"uploads/seed{i}.pdf",
+            }
+            for i in range(args.seed)
+        ])
+    SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.seconds
+
+    def writer(n: int):
+        i = 0
+        with SessionFactory() as db:
+            while time.monotonic() < deadline:
+                try:
+                    leads_crud.create_lead(db, {
+                        "first_name": "Bench",
+                        "last_name": f"Writer{n}",
+                        "email": f"writer{n}-{i}@example.com",
+                        "resume_path": "uploads/bench.pdf",
+                    })
+                    key = "writes"
+                except OperationalError:
+                    db.rollback()
+                    key = "errors"
+                with lock:
+                    counts[key] += 1
+                i += 1
+
+    def reader():
+        with SessionFactory() as db:
+            while time.monotonic() < deadline:
+                try:
+                    leads_crud.get_leads(db, 100, random.randint(0, args.seed))
+                    db.rollback()
+                    key = "reads"
+                except OperationalError:
+                    db.rollback()
+                    key = "errors"
+                with lock:
+                    counts[key] += 1
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    threads += [threading.Thread(target=reader) for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    return {
+        "profile": profile,
+        "writes_per_sec": round(counts["writes"] / args.seconds, 1),
+        "reads_per_sec": round(counts["reads"] / args.seconds, 1),
+        "errors": counts["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=10000)
+    parser.add_argument("--profiles", nargs="+", default=["baseline", "production"])
+    args = parser.parse_args()
+    print(json.dumps([_run_profile(profile, args) for profile in args.profiles], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,32 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 import os
+import shutil
+import tempfile
 from typing import Generator, Dict
 
+# Keep the app's own database and resume store out of the working tree
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="leads-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DATA_DIR, 'leads.db')}"
+os.environ["RESUME_STORAGE_DIR"] = os.path.join(TEST_DATA_DIR, "uploads")
+
+# Signed resume links refuse to work with the default secret
+os.environ.setdefault("RESUME_LINK_SECRET", "test-resume-link-secret")
+
+# Outbox workers are exercised directly in test_notifications.py
+os.environ.setdefault("NOTIFICATION_WORKERS", "0")
+# and the resume pipeline in test_resume_processing.py
+os.environ.setdefault("RESUME_PROCESS_WORKERS", "0")
+
 from app.main import app
 from app.db.session import get_db
 from app.db.models import Base
+from app.core.metrics import instrument_engine
+from app.core.rate_limit import rate_limiter
+from app.core.security import access_tokens, user_cache
+from app.crud.leads import resume_cache
 from app.crud import users as users_crud
+from app.services.assignment import lead_assignment
 
 # Use in-memory SQLite for testing
 SQLALCHEMY_DATABASE_URL = "sqlite://"
@@ -19,6 +39,7 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+instrument_engine(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create test upload directory
@@ -26,6 +47,14 @@ TEST_UPLOAD_DIR = "test_uploads"
 if not os.path.exists(TEST_UPLOAD_DIR):
     os.makedirs(TEST_UPLOAD_DIR)
 
+@pytest.fixture(scope="session", autouse=True)
+def test_data_dir() -> Generator:
+    """
+    Remove the temporary database and resume store after the run.
+    """
+    yield TEST_DATA_DIR
+    shutil.rmtree(TEST_DATA_DIR, ignore_errors=True)
+
 @pytest.fixture(scope="function")
 def db() -> Generator:
     """
@@ -91,6 +120,22 @@ def authorized_client(client: TestClient, test_user_token: str) -> TestClient:
     client.headers["Authorization"] = f"Bearer {test_user_token}"
     return client
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    Drop in-process caches and rate limits so entries don't leak between test databases.
+    """
+    user_cache.clear()
+    access_tokens.cache.clear()
+    resume_cache.clear()
+    rate_limiter.backend.clear()
+    lead_assignment.reset()
+    yield
+    user_cache.clear()
+    access_tokens.cache.clear()
+    resume_cache.clear()
+    rate_limiter.backend.clear()
+
 @pytest.fixture(autouse=True)
 def cleanup_test_uploads():
     """
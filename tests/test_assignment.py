@@ -0,0 +1,149 @@
+from collections import Counter
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from app.crud import users as users_crud
+from app.db.models import Lead, LeadState, Notification, User
+from app.services.assignment import AssignmentEngine, create_strategy, lead_assignment
+from app.services.notifications import ATTORNEY_NOTIFICATION
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def _attorneys(db: Session, *weights: int):
+    ids = []
+    for i, weight in enumerate(weights, db.query(User).count()):
+        user = users_crud.create_user(db, f"attorney{i}@example.com", hashed_password="x")
+        users_crud.set_assignment_weight(db, user.email, weight)
+        ids.append(user.id)
+    return ids
+
+def _pending(db: Session, assigned_to_id: int, count: int):
+    db.execute(insert(Lead), [
+        {"first_name": "F", "last_name": "L", "email": "l@example.com", "assigned_to_id": assigned_to_id}
+        for _ in range(count)
+    ])
+    db.commit()
+
+def _assign(engine: AssignmentEngine, db: Session, n: int):
+    return [engine.assign(db).id for _ in range(n)]
+
+def test_round_robin(db: Session):
+    a, b, c = _attorneys(db, 1, 1, 1)
+    engine = AssignmentEngine("round_robin")
+    assert _assign(engine, db, 7) == [a, b, c, a, b, c, a]
+
+def test_least_loaded_follows_state_changes(db: Session):
+    a, b = _attorneys(db, 1, 1)
+    _pending(db, a, 3)
+    engine = AssignmentEngine("least_loaded")
+    assert _assign(engine, db, 4) == [b, b, b, a]
+    assert engine.loads() == {a: 4, b: 3}
+
+    # b reaches out to two of their leads and gets the next ones
+    engine.state_changed(b, LeadState.PENDING, LeadState.REACHED_OUT)
+    engine.state_changed(b, LeadState.PENDING, LeadState.REACHED_OUT)
+    engine.state_changed(b, LeadState.REACHED_OUT, LeadState.REACHED_OUT)
+    assert _assign(engine, db, 2) == [b, b]
+    engine.release(b)
+    assert engine.loads() == {a: 4, b: 2}
+
+def test_weighted_interleaves_in_proportion(db: Session):
+    a, b = _attorneys(db, 1, 3)
+    engine = AssignmentEngine("weighted")
+    picks = _assign(engine, db, 8)
+    assert Counter(picks) == {a: 2, b: 6}
+    # Not in runs: a gets one lead in each half
+    assert picks[:4].count(a) == 1
+
+    # A newcomer starts level with the others instead of taking every lead
+    c, = _attorneys(db, 3)
+    engine.invalidate()
+    assert Counter(_assign(engine, db, 7)) == {a: 1, b: 3, c: 3}
+
+def test_assignment_needs_no_query_until_reconciled(db: Session):
+    a, b = _attorneys(db, 1, 1)
+    clock = FakeClock()
+    engine = AssignmentEngine("least_loaded", reconcile_seconds=60, clock=clock)
+    engine.assign(db)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        _assign(engine, db, 100)
+        assert statements == []
+        # Leads assigned behind the engine's back are counted once it reconciles
+        _pending(db, a, 50)
+        statements.clear()
+        clock.now += 60
+        assert engine.assign(db).id == b
+        assert len(statements) == 2
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+    assert engine.loads()[a] == 50
+
+def test_reconcile_drops_unavailable_attorneys(db: Session):
+    a, b = _attorneys(db, 1, 1)
+    engine = AssignmentEngine("round_robin")
+    assert _assign(engine, db, 2) == [a, b]
+    users_crud.set_user_active(db, "attorney0@example.com", False)
+    users_crud.set_assignment_weight(db, "attorney1@example.com", 0)
+    engine.invalidate()
+    assert engine.assign(db) is None
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        create_strategy("random")
+
+def test_registered_users_are_not_assigned_until_opted_in(authorized_client: TestClient, db: Session):
+    response = authorized_client.post(
+        "/api/leads",
+        data={"first_name": "A", "last_name": "B", "email": "a@example.com"},
+        files={"resume": ("cv.pdf", b"resume", "application/pdf")}
+    )
+    assert response.json()["assigned_to_id"] is None
+    assert users_crud.get_assignable_users(db) == []
+
+def test_new_lead_is_assigned_and_attorney_notified(authorized_client: TestClient, db: Session):
+    users_crud.set_assignment_weight(db, "test@example.com", 1)
+    other = users_crud.create_user(db, "other@example.com", hashed_password="x")
+    users_crud.set_assignment_weight(db, other.email, 1)
+    ids = []
+    for i in range(2):
+        response = authorized_client.post(
+            "/api/leads",
+            data={"first_name": "A", "last_name": "B", "email": f"{i}@example.com"},
+            files={"resume": ("cv.pdf", b"resume %d" % i, "application/pdf")}
+        )
+        ids.append(response.json()["assigned_to_id"])
+    me = users_crud.get_user_by_email(db, "test@example.com")
+    assert sorted(ids) == sorted([me.id, other.id])
+    recipients = {
+        n.payload["attorney_email"]
+        for n in db.query(Notification).filter(Notification.kind == ATTORNEY_NOTIFICATION)
+    }
+    assert recipients == {"test@example.com", "other@example.com"}
+
+    mine = authorized_client.get("/api/leads", params={"assigned_to": "me"}).json()
+    assert [lead["assigned_to_id"] for lead in mine["items"]] == [me.id]
+    assert mine["total"] == 1
+    theirs = authorized_client.get("/api/leads", params={"assigned_to": other.id}).json()
+    assert [lead["assigned_to_id"] for lead in theirs["items"]] == [other.id]
+    assert authorized_client.get("/api/leads", params={"assigned_to": "x"}).status_code == 400
+
+def test_state_change_updates_load(authorized_client: TestClient, db: Session):
+    users_crud.set_assignment_weight(db, "test@example.com", 1)
+    lead = authorized_client.post(
+        "/api/leads",
+        data={"first_name": "A", "last_name": "B", "email": "a@example.com"},
+        files={"resume": ("cv.pdf", b"resume", "application/pdf")}
+    ).json()
+    assert lead_assignment.loads() == {lead["assigned_to_id"]: 1}
+    authorized_client.patch(f"/api/leads/{lead['id']}", json={"state": "REACHED_OUT"})
+    assert lead_assignment.loads() == {lead["assigned_to_id"]: 0}
@@ -1,5 +1,19 @@
+import asyncio
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
 from fastapi.testclient import TestClient
+from jose import JWTError, jwt
+from passlib.context import CryptContext
 from sqlalchemy.orm import Session
+from app.api.endpoints import auth
+from app.core import security
+from app.core.security import AccessTokens, PasswordHasher, PasswordHasherBusy, user_cache
+from app.crud import users as users_crud
 
 def test_create_user(client: TestClient):
     response = client.post(
@@ -59,4 +73,157 @@ def test_login_wrong_email(client: TestClient):
         }
     )
     assert response.status_code == 401
-    assert response.json()["detail"] == "Incorrect email or password" 
\ No newline at end of file
+    assert response.json()["detail"] == "Incorrect email or password"
+
+def test_authenticated_user_is_cached(authorized_client: TestClient):
+    user_cache.clear()
+    before = user_cache.stats()
+    assert authorized_client.get("/api/leads").status_code == 200
+    assert authorized_client.get("/api/leads").status_code == 200
+    after = user_cache.stats()
+
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+def test_deactivated_user_is_evicted(authorized_client: TestClient, db: Session, test_user):
+    assert authorized_client.get("/api/leads").status_code == 200
+    users_crud.set_user_active(db, test_user["email"], False)
+
+    response = authorized_client.get("/api/leads")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
+
+def test_login_returns_503_when_hash_pool_is_saturated(client: TestClient, test_user, monkeypatch):
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+    hasher._slots.acquire()  # Occupy the only slot
+    monkeypatch.setattr(auth, "password_hasher", hasher)
+
+    response = client.post(
+        "/api/auth/token",
+        data={
+            "username": test_user["email"],
+            "password": test_user["password"]
+        }
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_hasher_rejects_work_beyond_queue_limit():
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+    release = threading.Event()
+
+    async def run():
+        blocked = asyncio.ensure_future(hasher._run(release.wait))
+        await asyncio.sleep(0.01)
+        try:
+            await hasher.hash("password")
+        except PasswordHasherBusy:
+            rejected = True
+        else:
+            rejected = False
+        release.set()
+        await blocked
+        return rejected
+
+    assert asyncio.run(run()) is True
+
+def test_hasher_slot_is_held_until_cancelled_job_finishes():
+    hasher = PasswordHasher(workers=1, queue_limit=0)
+    release = threading.Event()
+
+    async def run():
+        blocked = asyncio.ensure_future(hasher._run(release.wait))
+        await asyncio.sleep(0.01)
+        blocked.cancel()
+        await asyncio.gather(blocked, return_exceptions=True)
+        # The job is still running in the pool, so its slot stays taken
+        try:
+            await asyncio.wait_for(hasher.hash("password"), 1)
+        except (PasswordHasherBusy, asyncio.TimeoutError) as e:
+            rejected = isinstance(e, PasswordHasherBusy)
+        else:
+            rejected = False
+        finally:
+            release.set()
+        for _ in range(100):
+            if hasher._slots.acquire(blocking=False):
+                hasher._slots.release()
+                return rejected, True
+            await asyncio.sleep(0.01)
+        return rejected, False
+
+    assert asyncio.run(run()) == (True, True)
+
+def test_login_rehashes_outdated_hash(client: TestClient, db: Session, monkeypatch):
+    old_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4)
+    users_crud.create_user(db, "rehash@example.com", hashed_password=old_context.hash("password123"))
+
+    monkeypatch.setattr(security, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+    monkeypatch.setattr(auth, "password_hasher", security.PasswordHasher(rehash_on_login=True))
+
+    response = client.post(
+        "/api/auth/token",
+        data={"username": "rehash@example.com", "password": "password123"}
+    )
+    assert response.status_code == 200
+
+    db.expire_all()
+    user = users_crud.get_user_by_email(db, "rehash@example.com")
+    assert user.hashed_password.startswith("$2b$05$")
+
+def test_verified_tokens_are_cached(authorized_client: TestClient, monkeypatch):
+    decoded = []
+    decode = security.jwt.decode
+    monkeypatch.setattr(security.jwt, "decode", lambda *a, **kw: decoded.append(1) or decode(*a, **kw))
+    security.access_tokens.cache.clear()
+
+    for _ in range(3):
+        assert authorized_client.get("/api/leads").status_code == 200
+    assert len(decoded) == 1
+
+def test_cached_token_expires_with_token():
+    tokens = AccessTokens(keys={"k1": "secret"}, active_kid="k1", cache_ttl=300)
+    token = tokens.issue({"sub": "a@example.com"}, timedelta(seconds=30))
+    claims = tokens.verify(token)
+    assert claims["sub"] == "a@example.com"
+
+    _, expires_at = tokens.cache._data[hashlib.sha256(token.encode()).digest()]
+    assert expires_at - time.monotonic() <= claims["exp"] - time.time() + 0.01
+    assert expires_at - time.monotonic() <= 30
+
+def test_key_rotation():
+    tokens = AccessTokens(keys={"k1": "first"}, active_kid="k1")
+    old_token = tokens.issue({"sub": "a@example.com"}, timedelta(minutes=5))
+    assert tokens.verify(old_token)["sub"] == "a@example.com"
+
+    # A new active key: old tokens still verify, from the cache too
+    tokens.set_keys({"k1": "first", "k2": "second"}, "k2")
+    new_token = tokens.issue({"sub": "b@example.com"}, timedelta(minutes=5))
+    assert jwt.get_unverified_header(new_token)["kid"] == "k2"
+    assert tokens.cache.get(hashlib.sha256(old_token.encode()).digest()) is not None
+    assert tokens.verify(old_token)["sub"] == "a@example.com"
+    assert tokens.verify(new_token)["sub"] == "b@example.com"
+
+    # Retiring the old key rejects its tokens even though they were cached
+    tokens.set_keys({"k2": "second"}, "k2")
+    with pytest.raises(JWTError):
+        tokens.verify(old_token)
+    with pytest.raises(ValueError):
+        tokens.set_keys({"k2": "second"}, "k3")
+
+def test_asymmetric_keys():
+    pem = rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    tokens = AccessTokens(keys={"rsa1": pem}, active_kid="rsa1", algorithm="RS256")
+    token = tokens.issue({"sub": "a@example.com"}, timedelta(minutes=5))
+    assert tokens.verify(token)["sub"] == "a@example.com"
+
+def test_unknown_key_id_is_rejected(client: TestClient, test_user):
+    token = jwt.encode(
+        {"sub": test_user["email"], "exp": datetime.utcnow() + timedelta(minutes=5)},
+        "your-secret-key-here",
+        headers={"kid": "unknown"}
+    )
+    response = client.get("/api/leads", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
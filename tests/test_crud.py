@@ -2,7 +2,7 @@ from sqlalchemy.orm import Session
 import pytest
 from app.crud import leads as leads_crud
 from app.crud import users as users_crud
-from app.db.models import LeadState
+from app.db.models import Counter, Lead, LeadState
 
 def test_create_user(db: Session):
     email = "test@example.com"
@@ -116,4 +116,67 @@ def test_update_lead(db: Session):
 def test_update_lead_not_found(db: Session):
     update_data = {"first_name": "Jane"}
     updated_lead = leads_crud.update_lead(db, 999, update_data)
-    assert updated_lead is None 
\ No newline at end of file
+    assert updated_lead is None
+
+def test_get_leads_without_total(db: Session):
+    leads_crud.create_lead(db, {
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@example.com",
+        "resume_path": "/path/to/resume.pdf"
+    })
+    result = leads_crud.get_leads(db, 10, include_total=False)
+    assert result.total is None
+    assert len(result.items) == 1
+
+def test_lead_count_is_maintained_on_create(db: Session):
+    for i in range(3):
+        leads_crud.create_lead(db, {
+            "first_name": f"User{i}",
+            "last_name": "Test",
+            "email": f"user{i}@example.com",
+            "resume_path": f"/path/to/resume{i}.pdf"
+        })
+    counter = db.query(Counter).filter(Counter.name == leads_crud.LEAD_COUNTER).one()
+    assert counter.value == 3
+    assert leads_crud.get_lead_count(db) == 3
+
+def test_lead_count_is_seeded_from_existing_rows(db: Session):
+    for i in range(2):
+        db.add(Lead(
+            first_name=f"User{i}",
+            last_name="Test",
+            email=f"user{i}@example.com",
+            resume_path=f"/path/to/resume{i}.pdf"
+        ))
+    db.commit()
+
+    assert leads_crud.get_lead_count(db) == 2
+    leads_crud.create_lead(db, {
+        "first_name": "John",
+        "last_name": "Doe",
+        "email": "john.doe@example.com",
+        "resume_path": "/path/to/resume.pdf"
+    })
+    assert leads_crud.get_lead_count(db) == 3
+
+def test_import_leads_batches_and_reports_errors(db: Session):
+    rows = [
+        (2, {"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com"}),
+        (3, {"first_name": "Bob", "last_name": "Ray", "email": "not-an-email"}),
+        (4, ValueError("invalid JSON: Expecting value")),
+        (5, {"first_name": "Cat", "last_name": "Poe", "email": "cat@example.com"}),
+        (6, {"first_name": "Dan", "last_name": "Orr", "email": "dan@example.com"}),
+    ]
+    report = leads_crud.import_leads(db, iter(rows), batch_size=2)
+
+    assert report.inserted == 3
+    assert report.failed == 2
+    assert [e.row for e in report.errors] == [3, 4]
+    assert "email" in report.errors[0].error
+    assert report.errors_truncated is False
+    assert leads_crud.get_lead_count(db) == 3
+
+    leads = leads_crud.get_leads(db, 10)
+    assert [lead.email for lead in leads.items] == ["ann@example.com", "cat@example.com", "dan@example.com"]
+    assert all(lead.state == LeadState.PENDING and lead.resume_path is None for lead in leads.items)
@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+from app.crud import leads as leads_crud
+from app.db.models import Base
+from app.db.session import create_db_engine
+
+# Schema of a database created by the first release
+FIRST_RELEASE_SCHEMA = (
+    """CREATE TABLE leads (
+        id INTEGER NOT NULL, first_name VARCHAR NOT NULL, last_name VARCHAR NOT NULL,
+        email VARCHAR NOT NULL, resume_path VARCHAR NOT NULL, state VARCHAR(11),
+        created_at DATETIME, updated_at DATETIME, PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX ix_leads_id ON leads (id)",
+    "CREATE INDEX ix_leads_email ON leads (email)",
+    """CREATE TABLE users (
+        id INTEGER NOT NULL, email VARCHAR NOT NULL, hashed_password VARCHAR NOT NULL,
+        is_active BOOLEAN, created_at DATETIME, PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX ix_users_id ON users (id)",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+)
+
+@pytest.fixture
+def first_release_engine(tmp_path):
+    """A database created by the first release, holding one lead."""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in FIRST_RELEASE_SCHEMA:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql(
+            "INSERT INTO leads (first_name, last_name, email, resume_path, state, created_at, updated_at) "
+            "VALUES ('John', 'Doe', 'john.doe@example.com', 'uploads/john.doe@example.com_cv.pdf', "
+            "'PENDING', '2024-03-20 10:00:00', '2024-03-20 10:00:00')"
+        )
+    yield engine
+    engine.dispose()
+
+def _pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+def test_production_profile_applies_pragmas(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'tuned.db'}", profile="production")
+    try:
+        assert isinstance(engine.pool, QueuePool)
+        assert _pragma(engine, "journal_mode") == "wal"
+        assert _pragma(engine, "synchronous") == 1  # NORMAL
+        assert _pragma(engine, "busy_timeout") == 5000
+        assert _pragma(engine, "cache_size") == -64 * 1024
+    finally:
+        engine.dispose()
+
+def test_baseline_profile_keeps_sqlite_defaults(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'plain.db'}", profile="baseline")
+    try:
+        assert _pragma(engine, "journal_mode") == "delete"
+    finally:
+        engine.dispose()
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        create_db_engine("sqlite://", profile="turbo")
+
+def _columns(engine, table):
+    with engine.connect() as conn:
+        return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+def test_first_release_database_gains_new_columns(first_release_engine):
+    Base.metadata.create_all(bind=first_release_engine)
+    assert {"resume_sha256", "resume_size", "reached_out_at", "assigned_to_id"} <= _columns(first_release_engine, "leads")
+    assert "assignment_weight" in _columns(first_release_engine, "users")
+    with Session(first_release_engine) as db:
+        leads = leads_crud.get_leads(db, 10).items
+        assert [lead.email for lead in leads] == ["john.doe@example.com"]
+        info = leads_crud.get_resume_info(db, leads[0].id)
+    assert info.key == "uploads/john.doe@example.com_cv.pdf"
+    assert info.filename == "john.doe@example.com_cv.pdf"
+    assert info.content_type == "application/pdf"
+
+def test_first_release_leads_are_searchable(first_release_engine):
+    Base.metadata.create_all(bind=first_release_engine)
+    with first_release_engine.connect() as conn:
+        matches = conn.exec_driver_sql("SELECT rowid FROM leads_fts WHERE leads_fts MATCH 'john'").all()
+    assert matches == [(1,)]
+    # Upgrading again doesn't index the leads twice
+    Base.metadata.create_all(bind=first_release_engine)
+    with first_release_engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT count(*) FROM leads_fts").scalar() == 1
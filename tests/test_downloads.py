@@ -0,0 +1,159 @@
+import hashlib
+import os
+import pytest
+from fastapi.testclient import TestClient
+from app.api.endpoints import leads as leads_endpoints
+from app.crud import leads as leads_crud
+from app.db import models
+from app.services.downloads import RangeNotSatisfiable, parse_range
+from app.services.storage import S3Storage
+
+CONTENT = b"%PDF-1.4 " + bytes(range(256)) * 4
+ETAG = '"%s"' % hashlib.sha256(CONTENT).hexdigest()
+
+def _create_lead(client: TestClient) -> int:
+    response = client.post(
+        "/api/leads",
+        data={"first_name": "A", "last_name": "B", "email": "a@example.com"},
+        files={"resume": ("cv.pdf", CONTENT, "application/pdf")}
+    )
+    assert response.status_code == 200
+    return response.json()["id"]
+
+def test_download_sends_validators(authorized_client: TestClient):
+    lead_id = _create_lead(authorized_client)
+
+    response = authorized_client.get(f"/api/leads/{lead_id}/resume")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == ETAG
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["cache-control"].startswith("private")
+    assert "last-modified" in response.headers
+
+def test_if_none_match_returns_304(authorized_client: TestClient, monkeypatch):
+    lead_id = _create_lead(authorized_client)
+    first = authorized_client.get(f"/api/leads/{lead_id}/resume")
+
+    # A matching tag is answered from the cached metadata alone
+    monkeypatch.setattr(leads_endpoints.storage, "local_path", lambda key: pytest.fail("storage touched"))
+    response = authorized_client.get(
+        f"/api/leads/{lead_id}/resume", headers={"If-None-Match": first.headers["etag"]}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == ETAG
+
+def test_if_none_match_mismatch_sends_body(authorized_client: TestClient):
+    lead_id = _create_lead(authorized_client)
+    response = authorized_client.get(
+        f"/api/leads/{lead_id}/resume", headers={"If-None-Match": '"other"'}
+    )
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+def test_if_modified_since(authorized_client: TestClient):
+    lead_id = _create_lead(authorized_client)
+    last_modified = authorized_client.get(f"/api/leads/{lead_id}/resume").headers["last-modified"]
+
+    response = authorized_client.get(
+        f"/api/leads/{lead_id}/resume", headers={"If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
+
+    response = authorized_client.get(
+        f"/api/leads/{lead_id}/resume",
+        headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}
+    )
+    assert response.status_code == 200
+
+def test_range_request(authorized_client: TestClient):
+    lead_id = _create_lead(authorized_client)
+
+    response = authorized_client.get(f"/api/leads/{lead_id}/resume", headers={"Range": "bytes=9-18"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[9:19]
+    assert response.headers["content-range"] == f"bytes 9-18/{len(CONTENT)}"
+    assert response.headers["content-length"] == "10"
+
+    response = authorized_client.get(f"/api/leads/{lead_id}/resume", headers={"Range": "bytes=-5"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[-5:]
+
+def test_range_not_satisfiable(authorized_client: TestClient):
+    lead_id = _create_lead(authorized_client)
+    response = authorized_client.get(
+        f"/api/leads/{lead_id}/resume", headers={"Range": f"bytes={len(CONTENT)}-"}
+    )
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+def test_stale_if_range_sends_whole_file(authorized_client: TestClient):
+    lead_id = _create_lead(authorized_client)
+    response = authorized_client.get(
+        f"/api/leads/{lead_id}/resume", headers={"Range": "bytes=0-3", "If-Range": '"other"'}
+    )
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+    response = authorized_client.get(
+        f"/api/leads/{lead_id}/resume", headers={"Range": "bytes=0-3", "If-Range": ETAG}
+    )
+    assert response.status_code == 206
+    assert response.content == CONTENT[:4]
+
+def test_parse_range():
+    assert parse_range("bytes=0-99", 50) == (0, 49)
+    assert parse_range("bytes=10-", 50) == (10, 49)
+    assert parse_range("bytes=-10", 50) == (40, 49)
+    assert parse_range("bytes=0-1,5-6", 50) is None
+    assert parse_range("items=0-1", 50) is None
+    assert parse_range("bytes=5-1", 50) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=50-", 50)
+
+def test_resume_metadata_cached(authorized_client: TestClient, db):
+    lead_id = _create_lead(authorized_client)
+    authorized_client.get(f"/api/leads/{lead_id}/resume")
+    misses = leads_crud.resume_cache.misses
+
+    authorized_client.get(f"/api/leads/{lead_id}/resume")
+    assert leads_crud.resume_cache.misses == misses
+
+    leads_crud.update_lead(db, lead_id, {"first_name": "C"})
+    assert leads_crud.resume_cache.get(lead_id) is None
+
+def test_resume_saved_before_content_addressing(authorized_client: TestClient, db, tmp_path, monkeypatch):
+    # Such leads hold the path the resume was written to, relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("uploads")
+    with open("uploads/a@example.com_cv.pdf", "wb") as f:
+        f.write(CONTENT)
+    lead = models.Lead(first_name="A", last_name="B", email="a@example.com", resume_path="uploads/a@example.com_cv.pdf")
+    db.add(lead)
+    db.commit()
+
+    response = authorized_client.get(f"/api/leads/{lead.id}/resume")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["content-disposition"].endswith("a%40example.com_cv.pdf")
+
+    link = authorized_client.get(f"/api/leads/{lead.id}/resume/link").json()
+    response = authorized_client.get(link["url"], headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[:10]
+
+def test_range_from_s3(authorized_client: TestClient, monkeypatch, tmp_path):
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="resumes")
+        store = S3Storage(bucket="resumes", staging_dir=str(tmp_path), client=client)
+        monkeypatch.setattr(leads_endpoints, "storage", store)
+        lead_id = _create_lead(authorized_client)
+
+        response = authorized_client.get(f"/api/leads/{lead_id}/resume", headers={"Range": "bytes=100-199"})
+        assert response.status_code == 206
+        assert response.content == CONTENT[100:200]
@@ -0,0 +1,102 @@
+import asyncio
+import socket
+import pytest
+from app.services.email import SMTPTransport, build_message
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.sessions.add(id(session))
+        return "250 OK"
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+def _transport(controller, **kwargs) -> SMTPTransport:
+    return SMTPTransport(hostname=controller.hostname, port=controller.port, **kwargs)
+
+async def _messages(count: int):
+    return [
+        await build_message(f"Message {i}", [f"user{i}@example.com"], "body")
+        for i in range(count)
+    ]
+
+def test_messages_share_one_session(smtp_server):
+    controller, handler = smtp_server
+
+    async def run():
+        transport = _transport(controller, pool_size=1, batch_size=10, batch_interval_ms=20)
+        await asyncio.gather(*(transport.send(m) for m in await _messages(5)))
+        metrics = transport.metrics()
+        await transport.close()
+        return metrics
+
+    metrics = asyncio.run(run())
+    assert len(handler.messages) == 5
+    assert len(handler.sessions) == 1
+    assert metrics["sent"] == 5
+    assert metrics["connects"] == 1
+    assert metrics["reconnects"] == 0
+    assert metrics["queue_depth"] == 0
+
+def test_batches_are_capped_by_size(smtp_server):
+    controller, handler = smtp_server
+
+    async def run():
+        transport = _transport(controller, pool_size=1, batch_size=2, batch_interval_ms=1000)
+        await asyncio.gather(*(transport.send(m) for m in await _messages(4)))
+        metrics = transport.metrics()
+        await transport.close()
+        return metrics
+
+    metrics = asyncio.run(run())
+    assert metrics["sent"] == 4
+    assert metrics["batches"] == 2
+
+def test_reconnects_after_server_drops_session(smtp_server):
+    controller, handler = smtp_server
+
+    async def run():
+        transport = _transport(controller, pool_size=1, batch_interval_ms=0)
+        first, second = await _messages(2)
+        await transport.send(first)
+        # Drop the connection from under the pooled session
+        transport._connections[0].close()
+        await transport.send(second)
+        metrics = transport.metrics()
+        await transport.close()
+        return metrics
+
+    metrics = asyncio.run(run())
+    assert len(handler.messages) == 2
+    assert metrics["reconnects"] == 1
+
+def test_attachment_is_included(smtp_server, tmp_path):
+    controller, handler = smtp_server
+    resume = tmp_path / "resume.pdf"
+    resume.write_bytes(b"%PDF-1.4 resume")
+
+    async def run():
+        transport = _transport(controller, batch_interval_ms=0)
+        message = await build_message("Lead", ["attorney@example.com"], "body", [str(resume)])
+        await transport.send(message)
+        await transport.close()
+
+    asyncio.run(run())
+    assert b'filename="resume.pdf"' in handler.messages[0].content
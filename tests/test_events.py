@@ -0,0 +1,153 @@
+import asyncio
+import json
+import threading
+from fastapi.testclient import TestClient
+from app.services.events import RESET, EventHub, event_stream, lead_events
+
+def _parse(body: str):
+    events = []
+    for block in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"]), int(fields["id"])))
+    return events
+
+def _drain(subscription):
+    async def run():
+        events = []
+        while True:
+            try:
+                event = await subscription.get(0.01)
+            except asyncio.TimeoutError:
+                return events
+            if event is None:
+                return events
+            events.append(event)
+    return run()
+
+def test_resume_from_last_event_id():
+    hub = EventHub(buffer_size=3)
+    first = hub.publish("a", {"n": 1})
+    for n in range(2, 5):
+        hub.publish("a", {"n": n})
+
+    async def run():
+        # Events 2..4 are still buffered
+        replay = await _drain(hub.subscribe(first.id))
+        # Event 1 has been dropped from the buffer, so 1..4 can't be replayed
+        reset = await _drain(hub.subscribe(first.id - 1))
+        unknown = await _drain(hub.subscribe(first.id + 100))
+        return replay, reset, unknown
+
+    replay, reset, unknown = asyncio.run(run())
+    assert [event.data["n"] for event in replay] == [2, 3, 4]
+    assert [event.type for event in reset] == [RESET]
+    assert [event.type for event in unknown] == [RESET]
+
+def test_slow_subscriber_is_dropped():
+    hub = EventHub(queue_size=2)
+
+    async def run():
+        slow = hub.subscribe()
+        for n in range(3):
+            hub.publish("a", {"n": n})
+        events = await _drain(slow)
+        hub.publish("a", {"n": 3})
+        return slow, events
+
+    slow, events = asyncio.run(run())
+    assert [event.data["n"] for event in events] == [0, 1]
+    assert slow.overflowed
+    assert hub.subscriber_count == 0
+
+def test_publish_from_another_thread():
+    hub = EventHub()
+
+    async def run():
+        subscription = hub.subscribe()
+        thread = threading.Thread(target=hub.publish, args=("a", {"n": 1}))
+        thread.start()
+        event = await subscription.get(1)
+        thread.join()
+        hub.close()
+        return event, await subscription.get(1)
+
+    event, end = asyncio.run(run())
+    assert event.data == {"n": 1}
+    assert end is None
+
+def test_stream_encoding_and_heartbeat():
+    hub = EventHub()
+
+    async def run():
+        subscription = hub.subscribe()
+        chunks = event_stream(hub, subscription, heartbeat=0.01)
+        out = [await chunks.__anext__(), await chunks.__anext__()]
+        event = hub.publish("lead.created", {"id": 1})
+        out.append(await chunks.__anext__())
+        hub.close()
+        out.extend([chunk async for chunk in chunks])
+        return event, out
+
+    event, out = asyncio.run(run())
+    assert out == [
+        b"retry: 3000\n\n",
+        b": keepalive\n\n",
+        f'id: {event.id}\nevent: lead.created\ndata: {{"id":1}}\n\n'.encode(),
+    ]
+    assert hub.subscriber_count == 0
+
+def test_lead_stream_endpoint(authorized_client: TestClient):
+    last_seen = lead_events._next_id - 1
+    lead = authorized_client.post(
+        "/api/leads",
+        data={"first_name": "A", "last_name": "B", "email": "a@example.com"},
+        files={"resume": ("cv.pdf", b"resume", "application/pdf")}
+    ).json()
+    authorized_client.patch(f"/api/leads/{lead['id']}", json={"state": "REACHED_OUT"})
+    authorized_client.patch(f"/api/leads/{lead['id']}", json={"first_name": "Ann"})
+
+    def live():
+        lead_events.publish("test", {"live": True})
+        lead_events.close()
+
+    # The test client returns once the stream ends
+    timer = threading.Timer(0.3, live)
+    timer.start()
+    response = authorized_client.get("/api/leads/stream", headers={"Last-Event-ID": str(last_seen)})
+    timer.join()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse(response.text)
+    assert [(kind, data.get("id")) for kind, data, _ in events] == [
+        ("lead.created", lead["id"]),
+        ("lead.state_changed", lead["id"]),
+        ("test", None),
+    ]
+    assert events[0][1]["email"] == "a@example.com"
+    assert events[1][1]["state"] == "REACHED_OUT"
+    assert [event_id for _, _, event_id in events] == sorted(event_id for _, _, event_id in events)
+
+def test_bulk_state_change_is_published(authorized_client: TestClient):
+    for i in range(2):
+        authorized_client.post(
+            "/api/leads",
+            data={"first_name": "A", "last_name": "B", "email": f"{i}@example.com"},
+            files={"resume": ("cv.pdf", b"resume %d" % i, "application/pdf")}
+        )
+    last_seen = lead_events._next_id - 1
+    authorized_client.patch("/api/leads/", json={"filter": {"state": "PENDING"}, "update": {"state": "REACHED_OUT"}})
+
+    async def run():
+        return await _drain(lead_events.subscribe(last_seen))
+
+    events = asyncio.run(run())
+    assert [(event.type, event.data["state"]) for event in events] == [("lead.state_changed", "REACHED_OUT")] * 2
+
+def test_stream_rejects_bad_last_event_id(authorized_client: TestClient):
+    response = authorized_client.get("/api/leads/stream", headers={"Last-Event-ID": "abc"})
+    assert response.status_code == 400
+
+def test_stream_unauthorized(client: TestClient):
+    assert client.get("/api/leads/stream").status_code == 401
@@ -1,8 +1,17 @@
+import csv
+import hashlib
+import io
+import json
 import os
 import pytest
+from fastapi import FastAPI, File, UploadFile
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
+from app.api.endpoints import leads as leads_endpoints
+from app.crud import leads as leads_crud
 from app.db.models import LeadState
+from app.services import uploads
+from app.services.storage import storage
 
 TEST_RESUME_CONTENT = b"This is a test resume content"
 TEST_RESUME_FILENAME = "test_resume.pdf"
@@ -32,7 +41,7 @@ def test_create_lead(client: TestClient, test_resume_file):
     assert data["email"] == "john.doe@example.com"
     assert data["state"] == LeadState.PENDING.value
     assert "resume_path" in data
-    assert os.path.exists(data["resume_path"])
+    assert os.path.exists(storage.local_path(data["resume_path"]))
 
 def test_create_lead_invalid_file_type(client: TestClient, test_resume_file):
     with open(test_resume_file, "rb") as f:
@@ -138,4 +147,274 @@ def test_download_resume(authorized_client: TestClient, test_resume_file):
 
 def test_download_resume_not_found(authorized_client: TestClient):
     response = authorized_client.get("/api/leads/999/resume")
-    assert response.status_code == 404 
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_create_lead_records_resume_hash(client: TestClient, db: Session, test_resume_file):
+    with open(test_resume_file, "rb") as f:
+        response = client.post(
+            "/api/leads",
+            data={
+                "first_name": "John",
+                "last_name": "Doe",
+                "email": "john.doe@example.com"
+            },
+            files={"resume": (TEST_RESUME_FILENAME, f, "application/pdf")}
+        )
+    assert response.status_code == 200
+
+    lead = leads_crud.get_lead(db, response.json()["id"])
+    assert lead.resume_sha256 == hashlib.sha256(TEST_RESUME_CONTENT).hexdigest()
+    assert lead.resume_size == len(TEST_RESUME_CONTENT)
+
+def test_create_lead_resume_too_large(client: TestClient, monkeypatch, tmp_path):
+    monkeypatch.setattr(uploads, "MAX_RESUME_SIZE", 1024)
+    monkeypatch.setattr(uploads, "CHUNK_SIZE", 256)
+    before = set(os.listdir(storage.staging_dir))
+
+    response = client.post(
+        "/api/leads",
+        data={
+            "first_name": "John",
+            "last_name": "Doe",
+            "email": "big@example.com"
+        },
+        files={"resume": ("big.pdf", b"x" * 4096, "application/pdf")}
+    )
+
+    assert response.status_code == 413
+    assert set(os.listdir(storage.staging_dir)) == before
+
+def _size_limited_client(calls):
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(resume: UploadFile = File(...)):
+        calls.append(resume.filename)
+        return {}
+
+    app.add_middleware(uploads.BodySizeLimitMiddleware, limits={("POST", "/upload"): 1024})
+    return TestClient(app)
+
+def test_oversized_body_is_refused_before_form_parsing():
+    calls = []
+    client = _size_limited_client(calls)
+    assert client.post("/upload", files={"resume": ("cv.pdf", b"x" * 100)}).status_code == 200
+
+    # Declared too large: refused without reading the body
+    response = client.post("/upload", files={"resume": ("cv.pdf", b"x" * 4096)})
+    assert response.status_code == 413
+    # Sent without a length: refused once the excess arrives
+    body = (b"x" * 512 for _ in range(8))
+    response = client.post("/upload", content=body, headers={"Content-Type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413
+    assert calls == ["cv.pdf"]
+
+def test_list_leads_without_total(authorized_client: TestClient):
+    response = authorized_client.get("/api/leads", params={"include_total": "false"})
+    assert response.status_code == 200
+    assert response.json()["total"] is None
+
+def test_list_leads_matches_model_serialization(authorized_client: TestClient, db: Session):
+    for i in range(3):
+        authorized_client.post(
+            "/api/leads",
+            data={"first_name": f"F{i}", "last_name": "L", "email": f"lead{i}@example.com"},
+            files={"resume": ("cv.pdf", b"cv %d" % i, "application/pdf")}
+        )
+    authorized_client.patch("/api/leads/2", json={"state": "REACHED_OUT"})
+
+    response = authorized_client.get("/api/leads", params={"page_size": 2, "sort": "-id"})
+    assert response.status_code == 200
+    expected = leads_crud.get_leads(db, 2, sort="-id")
+    assert response.content == expected.model_dump_json().encode()
+    assert response.json()["last_id"] == 2
+
+def test_bulk_import_csv(authorized_client: TestClient):
+    body = (
+        "first_name,last_name,email\n"
+        "Ann,Lee,ann@example.com\n"
+        "Bob,Ray,not-an-email\n"
+        "Cat,Poe,cat@example.com\n"
+    )
+    response = authorized_client.post(
+        "/api/leads/bulk", content=body, headers={"Content-Type": "text/csv"}
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["inserted"] == 2
+    assert report["failed"] == 1
+    assert report["errors"][0]["row"] == 3
+
+    listing = authorized_client.get("/api/leads").json()
+    assert listing["total"] == 2
+
+def test_bulk_import_ndjson(authorized_client: TestClient):
+    body = (
+        '{"first_name": "Ann", "last_name": "Lee", "email": "ann@example.com"}\n'
+        "\n"
+        "not json\n"
+        '{"first_name": "Cat", "last_name": "Poe", "email": "cat@example.com"}\n'
+    )
+    response = authorized_client.post(
+        "/api/leads/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["inserted"] == 2
+    assert report["errors"] == [{"row": 3, "error": report["errors"][0]["error"]}]
+    assert "invalid JSON" in report["errors"][0]["error"]
+
+def test_bulk_import_rejects_unknown_format(authorized_client: TestClient):
+    response = authorized_client.post(
+        "/api/leads/bulk", content="<leads/>", headers={"Content-Type": "application/xml"}
+    )
+    assert response.status_code == 415
+
+def test_bulk_import_unauthorized(client: TestClient):
+    response = client.post(
+        "/api/leads/bulk", content="first_name\n", headers={"Content-Type": "text/csv"}
+    )
+    assert response.status_code == 401
+
+def _import(client: TestClient, count: int):
+    body = "first_name,last_name,email\n" + "".join(
+        f"First{i},Last{i},lead{i}@example.com\n" for i in range(count)
+    )
+    response = client.post("/api/leads/bulk", content=body, headers={"Content-Type": "text/csv"})
+    assert response.json()["inserted"] == count
+
+def test_export_ndjson(authorized_client: TestClient, monkeypatch):
+    monkeypatch.setattr(leads_crud, "EXPORT_CHUNK_SIZE", 2)
+    _import(authorized_client, 5)
+
+    response = authorized_client.get("/api/leads/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["email"] for row in rows] == [f"lead{i}@example.com" for i in range(5)]
+    assert rows[0]["state"] == LeadState.PENDING.value
+    assert set(rows[0]) == {
+        "id", "first_name", "last_name", "email", "resume_path", "state", "created_at", "updated_at"
+    }
+
+def test_export_csv(authorized_client: TestClient):
+    _import(authorized_client, 3)
+
+    response = authorized_client.get("/api/leads/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert 'filename="leads.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["first_name"] for row in rows] == ["First0", "First1", "First2"]
+
+def test_export_reads_through_its_own_session(authorized_client: TestClient, db: Session, monkeypatch):
+    opened, closed = [], []
+    session_factory = leads_endpoints.SessionLocal
+
+    def session_local(**kwargs):
+        session = session_factory(**kwargs)
+        close = session.close
+        session.close = lambda: closed.append(session) or close()
+        opened.append(session)
+        return session
+
+    monkeypatch.setattr(leads_endpoints, "SessionLocal", session_local)
+    _import(authorized_client, 3)
+
+    response = authorized_client.get("/api/leads/export")
+    assert len(response.text.splitlines()) == 3
+    assert len(opened) == 1 and opened[0] is not db
+    assert closed == opened
+
+def test_export_unknown_format(authorized_client: TestClient):
+    response = authorized_client.get("/api/leads/export", params={"format": "xml"})
+    assert response.status_code == 400
+
+def test_export_unauthorized(client: TestClient):
+    assert client.get("/api/leads/export").status_code == 401
+
+def test_bulk_update_by_ids(authorized_client: TestClient):
+    _import(authorized_client, 3)
+    leads = authorized_client.get("/api/leads").json()["items"]
+
+    response = authorized_client.patch(
+        "/api/leads/",
+        json={
+            "leads": [{"id": leads[0]["id"]}, {"id": leads[1]["id"]}, {"id": 999}],
+            "update": {"state": "REACHED_OUT"}
+        }
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["updated"] == 2
+    assert [r["status"] for r in data["results"]] == ["updated", "updated", "not_found"]
+
+    states = [lead["state"] for lead in authorized_client.get("/api/leads").json()["items"]]
+    assert states == ["REACHED_OUT", "REACHED_OUT", "PENDING"]
+
+def test_bulk_update_detects_conflicts(authorized_client: TestClient):
+    _import(authorized_client, 2)
+    first, second = authorized_client.get("/api/leads").json()["items"]
+
+    # Someone else edits the first lead after we loaded it
+    authorized_client.patch(f"/api/leads/{first['id']}", json={"first_name": "Changed"})
+
+    response = authorized_client.patch(
+        "/api/leads/",
+        json={
+            "leads": [
+                {"id": first["id"], "updated_at": first["updated_at"]},
+                {"id": second["id"], "updated_at": second["updated_at"]},
+            ],
+            "update": {"state": "REACHED_OUT"}
+        }
+    )
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["conflict", "updated"]
+    assert results[1]["updated_at"] != second["updated_at"]
+
+    leads = authorized_client.get("/api/leads").json()["items"]
+    assert [lead["state"] for lead in leads] == ["PENDING", "REACHED_OUT"]
+
+def test_bulk_update_by_filter(authorized_client: TestClient):
+    _import(authorized_client, 3)
+    response = authorized_client.patch(
+        "/api/leads/",
+        json={"filter": {"email_prefix": "lead1"}, "update": {"state": "REACHED_OUT"}}
+    )
+    assert response.status_code == 200
+    assert response.json()["updated"] == 1
+
+    page = authorized_client.get("/api/leads", params={"state": "REACHED_OUT"}).json()
+    assert [lead["email"] for lead in page["items"]] == ["lead1@example.com"]
+
+def test_bulk_update_by_filter_is_bounded(authorized_client: TestClient, monkeypatch):
+    _import(authorized_client, 3)
+    monkeypatch.setattr(leads_endpoints, "MAX_BULK_UPDATE", 2)
+    response = authorized_client.patch(
+        "/api/leads/",
+        json={"filter": {"state": "PENDING"}, "update": {"state": "REACHED_OUT"}}
+    )
+    assert response.status_code == 400
+    assert "3 leads" in response.json()["detail"]
+    assert authorized_client.get("/api/leads", params={"state": "REACHED_OUT"}).json()["items"] == []
+
+@pytest.mark.parametrize("update", [{"state": None}, {"email": None}, {"first_name": None}])
+def test_update_rejects_null_fields(authorized_client: TestClient, update):
+    _import(authorized_client, 1)
+    lead_id = authorized_client.get("/api/leads").json()["items"][0]["id"]
+    assert authorized_client.patch(f"/api/leads/{lead_id}", json=update).status_code == 422
+    response = authorized_client.patch("/api/leads/", json={"leads": [{"id": lead_id}], "update": update})
+    assert response.status_code == 422
+
+@pytest.mark.parametrize("body", [
+    {"update": {"state": "REACHED_OUT"}},
+    {"leads": [{"id": 1}], "filter": {"state": "PENDING"}, "update": {"state": "REACHED_OUT"}},
+    {"filter": {}, "update": {"state": "REACHED_OUT"}},
+    {"leads": [{"id": 1}], "update": {}},
+])
+def test_bulk_update_rejects_bad_requests(authorized_client: TestClient, body):
+    assert authorized_client.patch("/api/leads/", json=body).status_code == 400
+
+def test_bulk_update_unauthorized(client: TestClient):
+    response = client.patch("/api/leads/", json={"leads": [{"id": 1}], "update": {"state": "REACHED_OUT"}})
+    assert response.status_code == 401
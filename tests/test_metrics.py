@@ -0,0 +1,93 @@
+import logging
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from app.core import metrics
+from app.core.metrics import Counter, Histogram, MetricsMiddleware
+from tests.conftest import TestingSessionLocal
+
+def test_prometheus_text_format():
+    counter = Counter("jobs_total", "Jobs run", ("kind",))
+    counter.inc(kind="a")
+    counter.inc(2, kind='say "hi"')
+    assert counter.render().splitlines() == [
+        "# HELP jobs_total Jobs run",
+        "# TYPE jobs_total counter",
+        'jobs_total{kind="a"} 1',
+        'jobs_total{kind="say \\"hi\\""} 2',
+    ]
+
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+    assert histogram.samples() == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 5.55",
+        "latency_seconds_count 3",
+    ]
+
+def test_requests_are_recorded_per_route(authorized_client: TestClient):
+    before = metrics.HTTP_REQUEST_DURATION.count(method="GET", route="/api/leads/{lead_id}/resume")
+    authorized_client.get("/api/leads/1/resume")
+    authorized_client.get("/api/leads/2/resume")
+    after = metrics.HTTP_REQUEST_DURATION.count(method="GET", route="/api/leads/{lead_id}/resume")
+    assert after == before + 2
+    assert metrics.HTTP_REQUESTS.value(method="GET", route="/api/leads/{lead_id}/resume", status="404") >= 2
+
+def test_metrics_endpoint(authorized_client: TestClient):
+    authorized_client.get("/api/leads")
+    response = authorized_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/leads/",le="+Inf"}' in body
+    assert "# TYPE http_request_sql_statements histogram" in body
+    assert "db_statements_total" in body
+    assert "email_queue_depth" in body
+
+def test_upload_throughput_recorded(client: TestClient):
+    before = metrics.UPLOAD_BYTES.value()
+    client.post(
+        "/api/leads",
+        data={"first_name": "A", "last_name": "B", "email": "a@example.com"},
+        files={"resume": ("cv.pdf", b"x" * 1000, "application/pdf")}
+    )
+    assert metrics.UPLOAD_BYTES.value() == before + 1000
+
+def _query_app(queries: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        db = TestingSessionLocal()
+        try:
+            for _ in range(queries):
+                db.execute(text("SELECT 1 WHERE 1 IN (:a, :b)"), {"a": item_id, "b": 2})
+        finally:
+            db.close()
+        return {}
+
+    return app
+
+def test_sql_statements_counted_per_request(db):
+    middleware = MetricsMiddleware(_query_app(3), slow_request_ms=10_000, n_plus_one_threshold=100)
+    before = metrics.HTTP_REQUEST_SQL_STATEMENTS.count(method="GET", route="/items/{item_id}")
+    TestClient(middleware).get("/items/1")
+    assert metrics.HTTP_REQUEST_SQL_STATEMENTS.count(method="GET", route="/items/{item_id}") == before + 1
+    assert metrics._normalize("SELECT * FROM t WHERE id IN (?, ?,\n ?)") == "SELECT * FROM t WHERE id IN (?)"
+
+def test_warns_on_n_plus_one_and_slow_requests(db, caplog):
+    middleware = MetricsMiddleware(_query_app(5), slow_request_ms=0, n_plus_one_threshold=5)
+    with caplog.at_level(logging.WARNING, logger="app.core.metrics"):
+        TestClient(middleware).get("/items/1")
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(m.startswith("Slow request GET /items/{item_id}") and "5 SQL statements" in m for m in messages)
+    assert any("Possible N+1 in GET /items/{item_id}: statement ran 5 times" in m for m in messages)
+
+def test_no_n_plus_one_warning_below_threshold(db, caplog):
+    middleware = MetricsMiddleware(_query_app(4), slow_request_ms=10_000, n_plus_one_threshold=5)
+    with caplog.at_level(logging.WARNING, logger="app.core.metrics"):
+        TestClient(middleware).get("/items/1")
+    assert caplog.records == []
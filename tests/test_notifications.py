@@ -0,0 +1,156 @@
+import asyncio
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from app.crud import notifications as notifications_crud
+from app.db.models import Base, Notification, NotificationStatus
+from app.services.notifications import (
+    ATTORNEY_NOTIFICATION, LEAD_NOTIFICATION, PROSPECT_CONFIRMATION, NotificationWorker
+)
+from tests.conftest import TestingSessionLocal
+
+def _worker(handler, **kwargs):
+    kwargs.setdefault("base_delay", 0.01)
+    return NotificationWorker(
+        session_factory=TestingSessionLocal,
+        concurrency=1,
+        handlers={LEAD_NOTIFICATION: handler},
+        **kwargs
+    )
+
+def test_create_lead_enqueues_notification(client: TestClient, db: Session):
+    response = client.post(
+        "/api/leads",
+        data={
+            "first_name": "John",
+            "last_name": "Doe",
+            "email": "john.doe@example.com"
+        },
+        files={"resume": ("resume.pdf", b"resume", "application/pdf")}
+    )
+    assert response.status_code == 200
+
+    # One row per email, so a retry never resends one that was delivered
+    prospect, attorney = db.query(Notification).order_by(Notification.id).all()
+    assert prospect.kind == PROSPECT_CONFIRMATION
+    assert attorney.kind == ATTORNEY_NOTIFICATION
+    assert prospect.status == attorney.status == NotificationStatus.PENDING
+    assert prospect.payload["lead"]["email"] == "john.doe@example.com"
+    assert attorney.payload["attorney_email"] == "attorney@company.com"
+
+def test_claim_is_exclusive(db: Session):
+    notifications_crud.enqueue_notification(db, LEAD_NOTIFICATION, {"n": 1})
+
+    first = notifications_crud.claim_due_notifications(db, limit=5)
+    second = notifications_crud.claim_due_notifications(db, limit=5)
+    assert len(first) == 1
+    assert first[0].status == NotificationStatus.SENDING
+    assert first[0].attempts == 1
+    assert second == []
+
+def test_expired_lease_is_reclaimed(db: Session):
+    notifications_crud.enqueue_notification(db, LEAD_NOTIFICATION, {"n": 1})
+    claimed = notifications_crud.claim_due_notifications(db, lease_seconds=60)[0]
+
+    # Simulate a worker that crashed mid-delivery
+    claimed.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    reclaimed = notifications_crud.claim_due_notifications(db)
+    assert [n.id for n in reclaimed] == [claimed.id]
+    assert reclaimed[0].attempts == 2
+
+def test_outcome_is_only_recorded_under_the_current_lease(db: Session):
+    notifications_crud.enqueue_notification(db, LEAD_NOTIFICATION, {"n": 1})
+    stale = notifications_crud.claim_due_notifications(db)[0]
+    stale_lease = stale.next_attempt_at
+
+    # The lease runs out and another worker claims the row
+    stale.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    current = notifications_crud.claim_due_notifications(db)[0]
+    current_lease = current.next_attempt_at
+
+    assert notifications_crud.mark_notification_failed(db, current.id, stale_lease, "late") is False
+    assert notifications_crud.mark_notification_sent(db, current.id, stale_lease) is False
+    db.expire_all()
+    assert db.query(Notification).one().status == NotificationStatus.SENDING
+
+    assert notifications_crud.mark_notification_sent(db, current.id, current_lease) is True
+    assert notifications_crud.mark_notification_sent(db, current.id, current_lease) is False
+    db.expire_all()
+    assert db.query(Notification).one().status == NotificationStatus.SENT
+
+def test_worker_delivers_and_marks_sent(db: Session):
+    notifications_crud.enqueue_notification(db, LEAD_NOTIFICATION, {"n": 1})
+    delivered = []
+
+    async def handler(payload):
+        delivered.append(payload)
+
+    worker = _worker(handler)
+    assert asyncio.run(worker.process_next()) is True
+    assert asyncio.run(worker.process_next()) is False
+
+    db.expire_all()
+    notification = db.query(Notification).one()
+    assert delivered == [{"n": 1}]
+    assert notification.status == NotificationStatus.SENT
+    assert notification.sent_at is not None
+
+def test_worker_retries_with_backoff_then_gives_up(db: Session):
+    notifications_crud.enqueue_notification(db, LEAD_NOTIFICATION, {"n": 1})
+
+    async def handler(payload):
+        raise ConnectionError("smtp down")
+
+    worker = _worker(handler, max_attempts=2)
+    assert asyncio.run(worker.process_next()) is True
+
+    db.expire_all()
+    notification = db.query(Notification).one()
+    assert notification.status == NotificationStatus.PENDING
+    assert notification.next_attempt_at > datetime.utcnow() - timedelta(seconds=1)
+    assert "smtp down" in notification.last_error
+
+    notification.next_attempt_at = datetime.utcnow()
+    db.commit()
+    assert asyncio.run(worker.process_next()) is True
+
+    db.expire_all()
+    notification = db.query(Notification).one()
+    assert notification.status == NotificationStatus.FAILED
+    assert notification.attempts == 2
+
+def test_worker_pool_drains_outbox(tmp_path):
+    # The shared in-memory test connection can't host concurrent sessions,
+    # so the pool gets a database file of its own
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    Base.metadata.create_all(bind=engine)
+    SessionFactory = sessionmaker(bind=engine)
+    with SessionFactory() as db:
+        for i in range(5):
+            notifications_crud.enqueue_notification(db, LEAD_NOTIFICATION, {"n": i})
+    delivered = []
+
+    async def handler(payload):
+        delivered.append(payload["n"])
+
+    async def drain():
+        worker = NotificationWorker(
+            session_factory=SessionFactory,
+            concurrency=3,
+            handlers={LEAD_NOTIFICATION: handler},
+            poll_interval=0.01
+        )
+        worker.start()
+        for _ in range(200):
+            if len(delivered) == 5:
+                break
+            await asyncio.sleep(0.01)
+        await worker.stop()
+
+    asyncio.run(drain())
+    engine.dispose()
+    assert sorted(delivered) == list(range(5))
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from starlette.responses import PlainTextResponse
+from app.api.endpoints import leads as leads_endpoints
+from app.core.rate_limit import (
+    MemoryRateLimitBackend, RateLimit, RateLimiter, RateLimitMiddleware, RedisRateLimitBackend
+)
+from app.db.models import Lead
+from app.services.storage import storage
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def _submit(client: TestClient, email: str = "a@example.com", content: bytes = b"resume"):
+    return client.post(
+        "/api/leads",
+        data={"first_name": "A", "last_name": "B", "email": email},
+        files={"resume": ("cv.pdf", content, "application/pdf")}
+    )
+
+def test_token_bucket_refills():
+    clock = FakeClock()
+    limiter = RateLimiter(MemoryRateLimitBackend(clock=clock))
+    limit = RateLimit(2, 10)
+
+    async def hits(n):
+        return [await limiter.hit("ip", "1.2.3.4", limit) for _ in range(n)]
+
+    assert asyncio.run(hits(3)) == [0, 0, 5.0]
+    assert asyncio.run(limiter.hit("ip", "5.6.7.8", limit)) == 0
+    clock.now += 5
+    assert asyncio.run(hits(2)) == [0, 5.0]
+
+def test_memory_backend_is_bounded():
+    backend = MemoryRateLimitBackend(max_keys=2)
+    limiter = RateLimiter(backend)
+    for address in ("a", "b", "c"):
+        asyncio.run(limiter.hit("ip", address, RateLimit(1, 60)))
+    assert len(backend._buckets) == 2
+    # The evicted client starts again with a full bucket
+    assert asyncio.run(limiter.hit("ip", "a", RateLimit(1, 60))) == 0
+    assert asyncio.run(limiter.hit("ip", "c", RateLimit(1, 60))) > 0
+
+def test_redis_backend():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    client = fakeredis.FakeAsyncRedis()
+    limiter = RateLimiter(RedisRateLimitBackend(client=client))
+
+    async def run():
+        results = [await limiter.hit("ip", "1.2.3.4", RateLimit(2, 60)) for _ in range(3)]
+        claims = [await limiter.first_seen("duplicate", "x", 60) for _ in range(2)]
+        await limiter.forget("duplicate", "x")
+        claims.append(await limiter.first_seen("duplicate", "x", 60))
+        ttl = await client.pttl(limiter._key("ip", "1.2.3.4"))
+        return results, claims, ttl
+
+    results, claims, ttl = asyncio.run(run())
+    assert results[:2] == [0, 0]
+    assert 29 < results[2] <= 30
+    assert claims == [True, False, True]
+    assert 0 < ttl <= 60_000
+
+def test_backend_failure_allows_requests():
+    class BrokenBackend(MemoryRateLimitBackend):
+        async def take(self, key, capacity, rate):
+            raise ConnectionError("down")
+
+    limiter = RateLimiter(BrokenBackend())
+    assert asyncio.run(limiter.hit("ip", "1.2.3.4", RateLimit(1, 60))) == 0
+
+def test_middleware_limits_selected_routes():
+    async def app(scope, receive, send):
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    middleware = RateLimitMiddleware(
+        app,
+        RateLimiter(MemoryRateLimitBackend()),
+        {("POST", "/api/leads/"): RateLimit(1, 60)}
+    )
+    client = TestClient(middleware)
+    assert client.post("/api/leads", content=b"x").status_code == 200
+    response = client.post("/api/leads/", content=b"x")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "60"
+    # Other routes are not limited
+    assert client.get("/api/leads").status_code == 200
+
+def test_duplicate_submission_rejected(client: TestClient, db: Session):
+    assert _submit(client).status_code == 200
+    response = _submit(client, "A@example.com ")
+    assert response.status_code == 429
+    assert "retry-after" in response.headers
+    assert db.query(Lead).count() == 1
+    assert os.listdir(os.path.dirname(storage.staging_path())) == []
+
+    # A different resume, or the same one from someone else, goes through
+    assert _submit(client, content=b"updated resume").status_code == 200
+    assert _submit(client, "b@example.com").status_code == 200
+
+def test_submissions_limited_per_email(client: TestClient, db: Session, monkeypatch):
+    monkeypatch.setattr(leads_endpoints, "LEAD_SUBMIT_EMAIL_LIMIT", RateLimit(2, 3600))
+    for i in range(2):
+        assert _submit(client, content=b"resume %d" % i).status_code == 200
+    response = _submit(client, content=b"resume 3")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) > 0
+    assert db.query(Lead).count() == 2
@@ -0,0 +1,109 @@
+import time
+import pytest
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app.core.security import DEFAULT_SECRET_KEY
+from app.crud.leads import ResumeInfo
+from app.db import models
+from app.services import resume_links
+from app.services.resume_links import (
+    InvalidResumeLink, ResumeLinkExpired, ResumeLinksDisabled, sign_resume_link, verify_resume_link
+)
+
+CONTENT = b"%PDF-1.4 signed resume"
+
+INFO = ResumeInfo(
+    key="a" * 64,
+    filename="cv.pdf",
+    content_type="application/pdf",
+    size=10,
+    last_modified=datetime(2024, 5, 1, 12, 30, 0),
+)
+
+def _create_lead(client: TestClient, email: str = "a@example.com") -> int:
+    response = client.post(
+        "/api/leads",
+        data={"first_name": "A", "last_name": "B", "email": email},
+        files={"resume": ("cv.pdf", CONTENT, "application/pdf")}
+    )
+    return response.json()["id"]
+
+def test_sign_and_verify_round_trip():
+    token, expires_at = sign_resume_link(INFO, 60, secret="s", now=1000)
+    assert expires_at == 1060
+    info, expiry = verify_resume_link(token, secret="s", now=1059)
+    assert info == INFO
+    assert expiry == 1060
+
+def test_verify_rejects_tampering_and_expiry():
+    token, _ = sign_resume_link(INFO, 60, secret="s", now=1000)
+    with pytest.raises(InvalidResumeLink):
+        verify_resume_link(token, secret="other", now=1000)
+    payload, signature = token.split(".")
+    with pytest.raises(InvalidResumeLink):
+        verify_resume_link(payload[:-2] + "xx." + signature, secret="s", now=1000)
+    with pytest.raises(ResumeLinkExpired):
+        verify_resume_link(token, secret="s", now=1060)
+
+def test_link_secret_is_never_the_default():
+    assert resume_links._link_secret("configured", DEFAULT_SECRET_KEY) == "configured"
+    assert resume_links._link_secret(DEFAULT_SECRET_KEY, "jwt-key") is None
+    assert resume_links._link_secret(None, DEFAULT_SECRET_KEY) is None
+    # Derived from the JWT key, but not the JWT key itself
+    derived = resume_links._link_secret(None, "jwt-key")
+    assert derived not in (None, "jwt-key")
+    assert derived == resume_links._link_secret("", "jwt-key")
+    with pytest.raises(ResumeLinksDisabled):
+        sign_resume_link(INFO, 60, secret=DEFAULT_SECRET_KEY)
+
+def test_links_refused_without_secret(authorized_client: TestClient, client: TestClient, monkeypatch):
+    lead_id = _create_lead(authorized_client)
+    token, _ = sign_resume_link(INFO, 60)
+    monkeypatch.setattr(resume_links, "RESUME_LINK_SECRET", None)
+
+    assert authorized_client.get(f"/api/leads/{lead_id}/resume/link").status_code == 503
+    assert client.get(f"/api/leads/signed-resumes/{token}").status_code == 503
+
+def test_signed_download_needs_no_auth_or_db(
+    authorized_client: TestClient, client: TestClient, db: Session
+):
+    lead_id = _create_lead(authorized_client)
+    response = authorized_client.get(f"/api/leads/{lead_id}/resume/link")
+    assert response.status_code == 200
+    url = response.json()["url"]
+
+    # The link keeps working even once the lead row is gone
+    db.query(models.Lead).delete()
+    db.commit()
+    response = client.get(url, headers={"Authorization": ""})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert 'filename="cv.pdf"' in response.headers["content-disposition"]
+    max_age = int(response.headers["cache-control"].split("max-age=")[1])
+    assert max_age <= 300
+
+def test_signed_download_rejects_bad_links(client: TestClient):
+    token, _ = sign_resume_link(INFO, 60)
+    response = client.get(f"/api/leads/signed-resumes/{token}x")
+    assert response.status_code == 403
+
+    token, _ = sign_resume_link(INFO, 60, now=time.time() - 120)
+    response = client.get(f"/api/leads/signed-resumes/{token}")
+    assert response.status_code == 410
+
+def test_issue_links_in_bulk(authorized_client: TestClient):
+    ids = [_create_lead(authorized_client, f"{i}@example.com") for i in range(3)]
+    response = authorized_client.post(
+        "/api/leads/resume-links", json={"lead_ids": ids + [999], "expires_in": 60}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert sorted(item["lead_id"] for item in data["items"]) == ids
+    assert data["missing"] == [999]
+    for item in data["items"]:
+        assert authorized_client.get(item["url"]).content == CONTENT
+
+def test_issue_links_requires_auth(client: TestClient):
+    assert client.get("/api/leads/1/resume/link").status_code == 401
+    assert client.post("/api/leads/resume-links", json={"lead_ids": [1]}).status_code == 401
@@ -0,0 +1,188 @@
+import asyncio
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app.crud import leads as leads_crud
+from app.crud import resume_jobs as resume_jobs_crud
+from app.db.models import ResumeJob, ResumeJobStatus
+from app.schemas import LeadFilter
+from app.services import resume_extract
+from app.services.resume_extract import extract_resume
+from app.services.resume_processing import ResumeProcessor
+from app.services.storage import LocalContentStore
+from tests.conftest import TestingSessionLocal
+
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+def _pdf(text: str) -> bytes:
+    """A minimal one-page PDF showing `text`."""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = io.BytesIO(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+def _docx(paragraphs) -> bytes:
+    body = "".join(f"<w:p><w:r><w:t>{p}</w:t></w:r></w:p>" for p in paragraphs)
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as archive:
+        archive.writestr(
+            "word/document.xml",
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{body}</w:body></w:document>"
+        )
+    return out.getvalue()
+
+def _write(tmp_path, name: str, data: bytes) -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+def _processor(**kwargs) -> ResumeProcessor:
+    kwargs.setdefault("executor", ThreadPoolExecutor(max_workers=1))
+    return ResumeProcessor(session_factory=TestingSessionLocal, workers=1, **kwargs)
+
+def _create_lead(client: TestClient, content: bytes, email: str = "a@example.com", content_type: str = "application/pdf"):
+    response = client.post(
+        "/api/leads",
+        data={"first_name": "A", "last_name": "B", "email": email},
+        files={"resume": ("cv.pdf", content, content_type)}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+def test_extract_pdf(tmp_path):
+    extraction = extract_resume(_write(tmp_path, "cv.pdf", _pdf("Litigation paralegal")), "application/pdf")
+    assert "Litigation paralegal" in extraction.text
+    assert extraction.page_count == 1
+
+def test_extract_pdf_thumbnail(tmp_path):
+    pytest.importorskip("pymupdf")
+    extraction = extract_resume(_write(tmp_path, "cv.pdf", _pdf("Hello")), "application/pdf", preview_width=120)
+    assert extraction.preview_content_type == "image/png"
+    assert extraction.preview.startswith(b"\x89PNG")
+
+def test_extract_docx_txt_and_doc(tmp_path):
+    docx = extract_resume(_write(tmp_path, "cv.docx", _docx(["Jane Roe", "Contracts"])), DOCX_TYPE)
+    assert docx.text == "Jane Roe\nContracts"
+
+    txt = extract_resume(_write(tmp_path, "cv.txt", "Plain résumé".encode()), "text/plain")
+    assert txt.text == "Plain résumé"
+    assert txt.preview == "Plain résumé".encode()
+
+    doc = extract_resume(
+        _write(tmp_path, "cv.doc", b"\xd0\xcf\x11\xe0\x00\x01" + "Word resume".encode("utf-16-le") + b"\x00\x07"),
+        "application/msword"
+    )
+    assert doc.text == "Word resume"
+
+def test_docx_that_inflates_too_far_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(resume_extract, "MAX_DOCX_XML_BYTES", 1000)
+    path = _write(tmp_path, "bomb.docx", _docx(["x" * 10_000]))
+    with pytest.raises(ValueError):
+        extract_resume(path, DOCX_TYPE)
+
+def test_enqueue_is_idempotent(db: Session):
+    resume_jobs_crud.enqueue_resume_job(db, "a" * 64, "application/pdf")
+    resume_jobs_crud.enqueue_resume_job(db, "a" * 64, "application/pdf")
+    assert db.query(ResumeJob).count() == 1
+
+def test_expired_job_lease_is_reclaimed(db: Session):
+    resume_jobs_crud.enqueue_resume_job(db, "a" * 64, "application/pdf")
+    assert resume_jobs_crud.claim_due_resume_jobs(db) == [("a" * 64, "application/pdf", 1)]
+    assert resume_jobs_crud.claim_due_resume_jobs(db) == []
+
+    # Simulate a process that died mid-job
+    db.query(ResumeJob).update({ResumeJob.next_attempt_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    assert resume_jobs_crud.claim_due_resume_jobs(db) == [("a" * 64, "application/pdf", 2)]
+
+def test_pipeline_indexes_text_and_serves_preview(authorized_client: TestClient, db: Session):
+    lead = _create_lead(authorized_client, _pdf("Immigration attorney"))
+
+    response = authorized_client.get(f"/api/leads/{lead['id']}/preview")
+    assert response.status_code == 202
+    assert response.json() == {"status": "PENDING"}
+
+    assert asyncio.run(_processor().process_next()) is True
+    job = db.query(ResumeJob).one()
+    db.refresh(job)
+    assert job.status == ResumeJobStatus.DONE
+    assert job.page_count == 1
+
+    response = authorized_client.get(f"/api/leads/{lead['id']}/preview")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(job.preview_content_type.split(";")[0])
+    etag = response.headers["etag"]
+    response = authorized_client.get(f"/api/leads/{lead['id']}/preview", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    page = leads_crud.get_leads(db, 10, filters=LeadFilter(q="immigration"))
+    assert [item.id for item in page.items] == [lead["id"]]
+
+    # The same file uploaded again is indexed straight away, with no new job
+    second = _create_lead(authorized_client, _pdf("Immigration attorney"), "b@example.com")
+    page = leads_crud.get_leads(db, 10, filters=LeadFilter(q="immigration"))
+    assert sorted(item.id for item in page.items) == [lead["id"], second["id"]]
+    assert db.query(ResumeJob).count() == 1
+
+def test_failed_job_is_retried_then_given_up(authorized_client: TestClient, db: Session):
+    lead = _create_lead(authorized_client, b"not really a pdf")
+    processor = _processor(max_attempts=2)
+    processor.retry_delay = lambda attempts: 0
+
+    assert asyncio.run(processor.process_next()) is True
+    job = db.query(ResumeJob).one()
+    db.refresh(job)
+    assert job.status == ResumeJobStatus.PENDING
+    assert job.attempts == 1
+
+    assert asyncio.run(processor.process_next()) is True
+    db.refresh(job)
+    assert job.status == ResumeJobStatus.FAILED
+    assert asyncio.run(processor.process_next()) is False
+
+    response = authorized_client.get(f"/api/leads/{lead['id']}/preview")
+    assert response.status_code == 422
+
+def test_process_pool_run(db: Session, tmp_path):
+    store = LocalContentStore(str(tmp_path))
+    data = _docx(["Estate planning"])
+    path = store.staging_path()
+    with open(path, "wb") as f:
+        f.write(data)
+    key = "b" * 64
+    store.put(path, key)
+    resume_jobs_crud.enqueue_resume_job(db, key, DOCX_TYPE)
+
+    # The default executor is a spawned process pool
+    processor = ResumeProcessor(session_factory=TestingSessionLocal, storage=store, workers=1)
+
+    async def run():
+        try:
+            return await processor.process_next()
+        finally:
+            await processor.stop()
+
+    assert asyncio.run(run()) is True
+    assert store.read_derived(key, "txt") == b"Estate planning"
+    assert store.read_derived(key, "preview") == b"Estate planning"
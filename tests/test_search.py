@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app.crud import leads as leads_crud
+from app.db.models import Lead, LeadState
+from app.schemas import LeadFilter
+
+NOW = datetime(2024, 3, 20, 12, 0, 0)
+
+@pytest.fixture
+def seeded(db: Session):
+    people = [
+        ("John", "Doe", "john.doe@example.com", LeadState.PENDING, NOW - timedelta(days=10)),
+        ("Jane", "Roe", "jane@firm.com", LeadState.REACHED_OUT, NOW - timedelta(days=5)),
+        ("Johanna", "Smith", "jsmith@example.com", LeadState.PENDING, NOW - timedelta(days=2)),
+        ("Bob", "Johnson", "bob@other.org", LeadState.PENDING, NOW - timedelta(days=2)),
+        ("Alice", "Jones", "alice@example.com", LeadState.REACHED_OUT, NOW - timedelta(days=1)),
+    ]
+    for first, last, email, state, created_at in people:
+        db.add(Lead(
+            first_name=first, last_name=last, email=email, state=state,
+            created_at=created_at, updated_at=created_at
+        ))
+    db.commit()
+    return db
+
+def _emails(page):
+    return [lead.email for lead in page.items]
+
+def test_filter_by_state(seeded: Session):
+    page = leads_crud.get_leads(seeded, 10, filters=LeadFilter(state=LeadState.PENDING))
+    assert _emails(page) == ["john.doe@example.com", "jsmith@example.com", "bob@other.org"]
+    assert page.total == 3
+
+def test_filter_by_created_range(seeded: Session):
+    filters = LeadFilter(created_after=NOW - timedelta(days=7), created_before=NOW - timedelta(days=1))
+    page = leads_crud.get_leads(seeded, 10, filters=filters)
+    assert _emails(page) == ["jane@firm.com", "jsmith@example.com", "bob@other.org"]
+
+def test_name_prefix_is_case_insensitive(seeded: Session):
+    page = leads_crud.get_leads(seeded, 10, filters=LeadFilter(name_prefix="joh"))
+    assert _emails(page) == ["john.doe@example.com", "jsmith@example.com", "bob@other.org"]
+
+def test_email_prefix(seeded: Session):
+    page = leads_crud.get_leads(seeded, 10, filters=LeadFilter(email_prefix="J"))
+    assert _emails(page) == ["john.doe@example.com", "jane@firm.com", "jsmith@example.com"]
+
+def test_full_text_search(seeded: Session):
+    page = leads_crud.get_leads(seeded, 10, filters=LeadFilter(q="exam"))
+    assert _emails(page) == ["john.doe@example.com", "jsmith@example.com", "alice@example.com"]
+
+    johanna = seeded.query(Lead).filter(Lead.first_name == "Johanna").one()
+    leads_crud.set_resume_text(seeded, johanna.id, "Litigation paralegal, ten years experience")
+    page = leads_crud.get_leads(seeded, 10, filters=LeadFilter(q="paralegal"))
+    assert _emails(page) == ["jsmith@example.com"]
+
+def test_full_text_search_follows_updates(seeded: Session):
+    bob = seeded.query(Lead).filter(Lead.first_name == "Bob").one()
+    leads_crud.update_lead(seeded, bob.id, {"last_name": "Kowalski"})
+    assert _emails(leads_crud.get_leads(seeded, 10, filters=LeadFilter(q="kowalski"))) == ["bob@other.org"]
+    assert _emails(leads_crud.get_leads(seeded, 10, filters=LeadFilter(q="johnson"))) == []
+
+def test_full_text_search_ignores_syntax(seeded: Session):
+    assert leads_crud.get_leads(seeded, 10, filters=LeadFilter(q='"*')).items == []
+    assert _emails(leads_crud.get_leads(seeded, 10, filters=LeadFilter(q='firm" OR "x'))) == []
+
+def test_keyset_pagination_by_created_at(seeded: Session):
+    filters = LeadFilter(state=LeadState.PENDING)
+    seen = []
+    after_id = None
+    while True:
+        page = leads_crud.get_leads(seeded, 1, after_id, filters=filters, sort="-created_at")
+        seen += _emails(page)
+        if not page.has_more:
+            break
+        after_id = page.last_id
+    # jsmith and bob share a timestamp; the id breaks the tie
+    assert seen == ["bob@other.org", "jsmith@example.com", "john.doe@example.com"]
+
+def test_keyset_pagination_by_id_descending(seeded: Session):
+    first = leads_crud.get_leads(seeded, 2, sort="-id")
+    second = leads_crud.get_leads(seeded, 2, first.last_id, sort="-id")
+    assert _emails(first) == ["alice@example.com", "bob@other.org"]
+    assert _emails(second) == ["jsmith@example.com", "jane@firm.com"]
+
+def test_list_leads_filters_over_http(authorized_client: TestClient, seeded: Session):
+    response = authorized_client.get(
+        "/api/leads", params={"state": "REACHED_OUT", "sort": "-created_at"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [lead["email"] for lead in data["items"]] == ["alice@example.com", "jane@firm.com"]
+    assert data["total"] == 2
+
+    assert authorized_client.get("/api/leads", params={"sort": "email"}).status_code == 422
+
+def _plan(db: Session, query) -> list:
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
+
+@pytest.mark.parametrize("filters,sort,index", [
+    (LeadFilter(state=LeadState.PENDING), "id", "ix_leads_state_id"),
+    (LeadFilter(state=LeadState.PENDING), "-created_at", "ix_leads_state_created_at_id"),
+    (LeadFilter(created_after=NOW), "created_at", "ix_leads_created_at_id"),
+    (LeadFilter(email_prefix="jo"), "id", "ix_leads_email_nocase"),
+    (LeadFilter(name_prefix="jo"), "id", "ix_leads_first_name_nocase"),
+])
+def test_filters_use_indexes(db: Session, filters, sort, index):
+    plan = _plan(db, leads_crud.build_leads_query(db, filters, sort, after_id=5))
+    assert "SCAN leads" not in plan
+    assert any(index in detail for detail in plan), plan
+
+def test_full_text_search_uses_fts_index(db: Session):
+    plan = _plan(db, leads_crud.build_leads_query(db, LeadFilter(q="john"), after_id=5))
+    assert "SCAN leads" not in plan
+    assert any("leads_fts VIRTUAL TABLE INDEX" in detail for detail in plan), plan
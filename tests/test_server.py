@@ -0,0 +1,234 @@
+import asyncio
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import httpx
+import pytest
+import uvicorn
+from app import server as app_server
+from app.core.cache import TTLCache
+from app.core.coordination import Coordinator, CoordinatorClient, share_cache
+from app.core.metrics import Registry, merge_snapshots
+from app.core.rate_limit import CoordinatorRateLimitBackend, MemoryRateLimitBackend
+from app.services.events import EventHub
+
+def _wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for condition")
+        time.sleep(0.01)
+
+@pytest.fixture
+def coordinator():
+    """A Coordinator served on its own event loop, as the launcher runs it."""
+    directory = tempfile.mkdtemp()
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    hub = Coordinator(os.path.join(directory, "coordinator.sock"), MemoryRateLimitBackend())
+    asyncio.run_coroutine_threadsafe(hub.start(), loop).result()
+    yield hub
+    asyncio.run_coroutine_threadsafe(hub.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+    shutil.rmtree(directory)
+
+@pytest.fixture
+def workers(coordinator):
+    clients = [CoordinatorClient(coordinator.path) for _ in range(2)]
+    for client in clients:
+        client.ready()
+    # Broadcasts only reach connections the coordinator has accepted
+    _wait_for(lambda: len(coordinator.worker_pids) == 2)
+    yield clients
+    for client in clients:
+        client.close()
+
+def test_cache_invalidation_reaches_other_workers(workers):
+    caches = [TTLCache(), TTLCache()]
+    for client, cache in zip(workers, caches):
+        share_cache(client, "users", cache)
+        cache.set(("user", 1), "cached")
+
+    caches[0].invalidate(("user", 1))
+    assert caches[0].get(("user", 1)) is None
+    _wait_for(lambda: caches[1].get(("user", 1)) is None)
+
+def test_rate_limits_are_shared(workers):
+    backends = [CoordinatorRateLimitBackend(client) for client in workers]
+
+    async def run():
+        waits = [await backends[i % 2].take("ip:1.2.3.4", 3, 0.001) for i in range(5)]
+        claims = [await backend.claim("lead:a@example.com", 60) for backend in backends]
+        await backends[1].release("lead:a@example.com")
+        return waits, claims, await backends[0].claim("lead:a@example.com", 60)
+
+    waits, claims, reclaimed = asyncio.run(run())
+    assert waits[:3] == [0, 0, 0]
+    assert all(wait > 0 for wait in waits[3:])
+    assert claims == [True, False]
+    assert reclaimed
+
+def test_events_have_the_same_ids_in_every_worker(workers):
+    hubs = [EventHub(), EventHub()]
+    for client, hub in zip(workers, hubs):
+        hub.relay = lambda type, data, client=client: client.broadcast("events", {"type": type, "data": data})
+        client.subscribe("events", lambda event, seq, hub=hub: hub.publish_relayed(seq, event["type"], event["data"]))
+
+    assert hubs[0].publish("lead.created", {"id": 1}) is None
+    hubs[1].publish("lead.created", {"id": 2})
+    _wait_for(lambda: all(len(hub._buffer) == 2 for hub in hubs))
+    ids = [[event.id for event in hub._buffer] for hub in hubs]
+    assert ids[0] == ids[1]
+    assert ids[0][0] < ids[0][1]
+    # A local publish after the relay fails continues after the relayed ids
+    hubs[0].relay = lambda type, data: False
+    assert hubs[0].publish("lead.created", {"id": 3}).id > ids[0][1]
+
+def test_metrics_add_up_over_workers_and_restarts(coordinator, workers):
+    registries = [Registry(), Registry()]
+    for client, registry in zip(workers, registries):
+        counter = registry.counter("submissions_total", "Submissions", ("scope",))
+        counter.inc(scope="ip")
+        registry.histogram("latency_seconds", "Latency").observe(0.01)
+        client.handle("snapshot", registry.snapshot)
+
+    def collect(client):
+        return merge_snapshots(client.call("collect", timeout=5))
+
+    merged = collect(workers[0])
+    assert merged["submissions_total"]["values"] == [[["ip"], 2]]
+    assert merged["latency_seconds"]["values"][0][3] == 2
+
+    # A worker that exits hands over its totals so they don't go backwards
+    workers[1].call("retire", snapshot=registries[1].snapshot(gauges=False))
+    workers[1].close()
+    _wait_for(lambda: len(coordinator.worker_pids) == 1)
+    merged = collect(workers[0])
+    assert merged["latency_seconds"]["values"][0][3] == 2
+    assert 'submissions_total{scope="ip"} 2' in registries[0].render(merged)
+
+def test_coordinator_unavailable():
+    client = CoordinatorClient(os.path.join(tempfile.gettempdir(), "no-such-coordinator.sock"))
+    with pytest.raises(ConnectionError):
+        client.call("take", key="k", capacity=1, rate=1)
+    assert client.broadcast("events", {}) is False
+
+    hub = EventHub()
+    hub.relay = lambda type, data: client.broadcast("events", {"type": type, "data": data})
+    assert hub.publish("lead.created", {"id": 1}) is not None
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _worker_pids(launcher: subprocess.Popen):
+    with open(f"/proc/{launcher.pid}/task/{launcher.pid}/children") as f:
+        children = f.read().split()
+    pids = []
+    for pid in children:
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if b"spawn_main" in f.read():
+                    pids.append(int(pid))
+        except FileNotFoundError:
+            pass
+    return sorted(pids)
+
+def test_stopping_worker_serves_connections_it_already_accepted(monkeypatch):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    monkeypatch.setattr(app_server, "HANDOFF_GRACE_SECONDS", 2)
+    sock = app_server.bind_socket("127.0.0.1", 0)
+    server = app_server._DrainingServer(uvicorn.Config(app, lifespan="off", log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]})
+    thread.start()
+    try:
+        _wait_for(lambda: server.started)
+        with socket.create_connection(sock.getsockname(), timeout=5) as client:
+            _wait_for(lambda: len(server.server_state.connections) == 1)
+            # Told to stop before the request on the accepted connection is read
+            server.handle_exit(signal.SIGTERM, None)
+            time.sleep(0.3)
+            client.sendall(b"GET / HTTP/1.1\r\nHost: test\r\n\r\n")
+            assert client.recv(1024).startswith(b"HTTP/1.1 200")
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        sock.close()
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/task"), reason="needs /proc to find worker processes")
+def test_launcher_shares_state_and_reloads_without_dropping_requests(tmp_path):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'leads.db'}",
+        RESUME_STORAGE_DIR=str(tmp_path / "uploads"),
+        ENABLE_EMAIL="0",
+        NOTIFICATION_WORKERS="0",
+        RESUME_PROCESS_WORKERS="0",
+        LEAD_SUBMIT_IP_LIMIT="3",
+        BCRYPT_ROUNDS="4",
+        GRACEFUL_TIMEOUT_SECONDS="5",
+    )
+    launcher = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--workers", "2", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        def serving():
+            try:
+                return httpx.get(f"{base}/metrics", timeout=1).status_code == 200 and len(_worker_pids(launcher)) == 2
+            except httpx.HTTPError:
+                return False
+        _wait_for(serving, timeout=60)
+
+        # Each request opens a new connection, so they spread over the workers,
+        # which still allow only LEAD_SUBMIT_IP_LIMIT between them
+        statuses = [
+            httpx.post(
+                f"{base}/api/leads/",
+                data={"first_name": "A", "last_name": "B", "email": f"{i}@example.com"},
+                files={"resume": ("cv.pdf", b"resume %d" % i, "application/pdf")},
+            ).status_code
+            for i in range(5)
+        ]
+        assert sorted(statuses) == [200, 200, 200, 429, 429]
+        assert 'rate_limited_total{scope="ip"} 2' in httpx.get(f"{base}/metrics").text
+
+        old = _worker_pids(launcher)
+        launcher.send_signal(signal.SIGHUP)
+        failures = []
+        deadline = time.monotonic() + 60
+        while set(_worker_pids(launcher)) & set(old) or len(_worker_pids(launcher)) != 2:
+            assert time.monotonic() < deadline, "workers were not replaced"
+            try:
+                response = httpx.get(f"{base}/metrics", timeout=5)
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+            except httpx.HTTPError as e:
+                failures.append(repr(e))
+        assert failures == []
+        # Counts from the replaced workers are kept
+        assert 'rate_limited_total{scope="ip"} 2' in httpx.get(f"{base}/metrics").text
+
+        launcher.send_signal(signal.SIGTERM)
+        assert launcher.wait(timeout=30) == 0
+    finally:
+        if launcher.poll() is None:
+            launcher.kill()
+            launcher.wait()
@@ -0,0 +1,133 @@
+from datetime import date, datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.crud import leads as leads_crud
+from app.crud import stats as stats_crud
+from app.db import models
+from app.db.models import Lead, LeadDailyCount, LeadReachOutLatency, LeadState
+
+DAY = date(2024, 3, 18)  # A Monday
+
+def _lead(i: int, created_at: datetime, state: LeadState = LeadState.PENDING, reached_out_at=None):
+    return {
+        "id": i,
+        "first_name": f"F{i}",
+        "last_name": "L",
+        "email": f"{i}@example.com",
+        "state": state,
+        "created_at": created_at,
+        "updated_at": reached_out_at or created_at,
+        "reached_out_at": reached_out_at,
+    }
+
+def _seed(db: Session):
+    start = datetime(2024, 3, 18, 9)
+    rows = [_lead(i, start + timedelta(days=i % 10)) for i in range(1, 21)]
+    # Reached out 10 minutes, 1 hour and 3 days after creation
+    for i, delay in enumerate((timedelta(minutes=10), timedelta(hours=1), timedelta(days=3))):
+        rows.append(_lead(100 + i, start, LeadState.REACHED_OUT, start + delay))
+    db.execute(insert(Lead), rows)
+    db.commit()
+
+def _brute_force(db: Session):
+    counts = {}
+    for lead in db.query(Lead):
+        key = (lead.created_at.date(), lead.state)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def _rollup(db: Session):
+    return {(row.day, row.state): row.count for row in db.query(LeadDailyCount) if row.count}
+
+def test_rollups_follow_every_write_path(db: Session):
+    _seed(db)
+    assert _rollup(db) == _brute_force(db)
+
+    leads_crud.update_lead(db, 1, {"state": LeadState.REACHED_OUT})
+    leads_crud.update_lead(db, 100, {"state": LeadState.PENDING})
+    leads_crud.bulk_update_leads(db, {"state": LeadState.REACHED_OUT}, leads=[(2, None), (3, None), (101, None)])
+    assert _rollup(db) == _brute_force(db)
+
+    lead = leads_crud.get_lead(db, 1)
+    assert lead.reached_out_at is not None
+    assert leads_crud.get_lead(db, 100).reached_out_at is None
+    # Already reached out: its time is kept by the bulk update
+    assert leads_crud.get_lead(db, 101).reached_out_at == datetime(2024, 3, 18, 10)
+    latency = sum(row.count for row in db.query(LeadReachOutLatency))
+    assert latency == db.query(Lead).filter(Lead.reached_out_at.isnot(None)).count()
+
+def test_stats_by_day_and_week(db: Session):
+    _seed(db)
+    stats = stats_crud.get_lead_stats(db, DAY, DAY + timedelta(days=13))
+    assert len(stats.periods) == 14
+    assert stats.periods[0].counts == {LeadState.PENDING: 2, LeadState.REACHED_OUT: 3}
+    assert stats.periods[-1].total == 0
+    assert stats.totals == {LeadState.PENDING: 20, LeadState.REACHED_OUT: 3}
+
+    weekly = stats_crud.get_lead_stats(db, DAY + timedelta(days=2), DAY + timedelta(days=9), "week")
+    assert [period.period for period in weekly.periods] == [DAY, DAY + timedelta(days=7)]
+    assert [period.total for period in weekly.periods] == [10, 6]
+
+def test_reach_out_percentiles(db: Session):
+    _seed(db)
+    times = stats_crud.get_lead_stats(db, DAY, DAY).time_to_reach_out
+    assert times.count == 3
+    # The median lead took an hour, which falls in the (30 min, 1 h] bucket
+    assert 1800 < times.p50 <= 3600
+    assert 2 * 86400 < times.p99 <= 3 * 86400
+    assert stats_crud.get_lead_stats(db, DAY + timedelta(days=1), DAY + timedelta(days=1)).time_to_reach_out.p50 is None
+
+def test_rebuild_matches_incremental_rollups(db: Session):
+    _seed(db)
+    leads_crud.update_lead(db, 5, {"state": LeadState.REACHED_OUT})
+    before = stats_crud.get_lead_stats(db, DAY, DAY + timedelta(days=30))
+
+    db.query(LeadDailyCount).delete()
+    db.query(LeadReachOutLatency).delete()
+    db.commit()
+    assert stats_crud.rebuild_lead_stats(db) == 23
+    assert stats_crud.get_lead_stats(db, DAY, DAY + timedelta(days=30)) == before
+
+def test_rebuild_estimates_missing_reach_out_times(db: Session):
+    created = datetime(2024, 3, 18, 9)
+    row = _lead(1, created, LeadState.REACHED_OUT)
+    row["updated_at"] = created + timedelta(hours=2)
+    db.execute(insert(Lead), [row])
+    db.commit()
+
+    stats_crud.rebuild_lead_stats(db)
+    lead = leads_crud.get_lead(db, 1)
+    assert lead.reached_out_at == lead.updated_at == created + timedelta(hours=2)
+    assert db.query(LeadReachOutLatency.bucket).scalar() == models.REACH_OUT_BUCKETS.index(2 * 3600)
+
+def test_stats_endpoint(authorized_client: TestClient):
+    for i in range(3):
+        authorized_client.post(
+            "/api/leads",
+            data={"first_name": "A", "last_name": "B", "email": f"{i}@example.com"},
+            files={"resume": ("cv.pdf", b"resume %d" % i, "application/pdf")}
+        )
+    authorized_client.patch("/api/leads/1", json={"state": "REACHED_OUT"})
+
+    response = authorized_client.get("/api/leads/stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["periods"]) == 30
+    assert data["periods"][-1]["counts"] == {"PENDING": 2, "REACHED_OUT": 1}
+    assert data["totals"] == {"PENDING": 2, "REACHED_OUT": 1}
+    assert data["time_to_reach_out"]["count"] == 1
+
+    response = authorized_client.get("/api/leads/stats", params={"interval": "week"})
+    assert response.json()["periods"][-1]["total"] == 3
+
+@pytest.mark.parametrize("params", [
+    {"start": "2024-03-20", "end": "2024-03-19"},
+    {"start": "2000-01-01", "end": "2024-01-01"},
+])
+def test_stats_rejects_bad_ranges(authorized_client: TestClient, params):
+    assert authorized_client.get("/api/leads/stats", params=params).status_code == 400
+
+def test_stats_unauthorized(client: TestClient):
+    assert client.get("/api/leads/stats").status_code == 401
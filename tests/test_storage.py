@@ -0,0 +1,185 @@
+import hashlib
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app.api.endpoints import leads as leads_endpoints
+from app.crud import leads as leads_crud
+from app.crud import resume_jobs as resume_jobs_crud
+from app.db.models import ResumeBlob
+from app.services.storage import LocalContentStore, S3Storage
+
+CONTENT = b"%PDF-1.4 resume"
+KEY = hashlib.sha256(CONTENT).hexdigest()
+
+def _stage(store, content: bytes = CONTENT) -> str:
+    path = store.staging_path()
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+def test_local_store_shards_by_hash(tmp_path):
+    store = LocalContentStore(str(tmp_path))
+    assert store.put(_stage(store), KEY) is True
+
+    path = store.local_path(KEY)
+    assert path == os.path.join(str(tmp_path), KEY[:2], KEY[2:4], KEY)
+    assert store.read(KEY) == CONTENT
+    assert b"".join(store.iter_chunks(KEY, chunk_size=4)) == CONTENT
+
+def test_local_store_deduplicates(tmp_path):
+    store = LocalContentStore(str(tmp_path))
+    assert store.put(_stage(store), KEY) is True
+    assert store.put(_stage(store), KEY) is False
+    assert os.listdir(store.staging_dir) == []
+
+    store.delete(KEY)
+    assert not store.exists(KEY)
+
+def test_local_store_rejects_bad_keys(tmp_path):
+    store = LocalContentStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.local_path("../../etc/passwd")
+    with pytest.raises(ValueError):
+        store.local_path("/etc/passwd")
+    # Only files in the old upload directory are readable through a legacy key
+    for key in ("leads.db", ".env", "app/core/security.py", "uploads", "uploads/../leads.db"):
+        with pytest.raises(ValueError):
+            store.local_path(key)
+    # Leads saved before content addressing hold a path relative to the working directory
+    assert store.local_path("uploads/a@example.com_cv.pdf") == "uploads/a@example.com_cv.pdf"
+
+def test_legacy_key_cannot_follow_symlink_out_of_uploads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("uploads")
+    (tmp_path / "leads.db").write_bytes(b"secret")
+    os.symlink(tmp_path / "leads.db", "uploads/a@example.com_cv.pdf")
+    with pytest.raises(ValueError):
+        LocalContentStore(str(tmp_path / "store")).local_path("uploads/a@example.com_cv.pdf")
+
+def test_identical_resumes_share_one_blob(client: TestClient, db: Session):
+    ids = []
+    for email in ("a@example.com", "b@example.com"):
+        response = client.post(
+            "/api/leads",
+            data={"first_name": "A", "last_name": "B", "email": email},
+            files={"resume": ("resume.pdf", CONTENT, "application/pdf")}
+        )
+        assert response.status_code == 200
+        assert response.json()["resume_path"] == KEY
+        ids.append(response.json()["id"])
+
+    blob = db.query(ResumeBlob).filter(ResumeBlob.key == KEY).one()
+    assert blob.ref_count == 2
+    assert blob.size == len(CONTENT)
+
+    assert leads_crud.release_resume(db, KEY) is False
+    assert leads_crud.release_resume(db, KEY) is True
+    assert db.query(ResumeBlob).count() == 0
+
+def test_deleting_leads_frees_their_shared_resume(authorized_client: TestClient, db: Session):
+    content = b"%PDF-1.4 shared then deleted"
+    key = hashlib.sha256(content).hexdigest()
+    ids = [
+        authorized_client.post(
+            "/api/leads",
+            data={"first_name": "A", "last_name": "B", "email": email},
+            files={"resume": ("resume.pdf", content, "application/pdf")}
+        ).json()["id"]
+        for email in ("a@example.com", "b@example.com")
+    ]
+
+    assert authorized_client.delete(f"/api/leads/{ids[0]}").status_code == 204
+    assert db.query(ResumeBlob.ref_count).filter(ResumeBlob.key == key).scalar() == 1
+    assert leads_endpoints.storage.exists(key)
+
+    assert authorized_client.delete(f"/api/leads/{ids[1]}").status_code == 204
+    assert db.query(ResumeBlob).count() == 0
+    assert resume_jobs_crud.get_resume_job(db, key) is None
+    assert not leads_endpoints.storage.exists(key)
+    assert leads_crud.get_lead_count(db) == 0
+    assert authorized_client.delete(f"/api/leads/{ids[1]}").status_code == 404
+
+def test_resume_referenced_again_during_delete_is_kept(authorized_client: TestClient, db: Session, monkeypatch):
+    content = b"%PDF-1.4 deleted then submitted again"
+    key = hashlib.sha256(content).hexdigest()
+    lead_id = authorized_client.post(
+        "/api/leads",
+        data={"first_name": "A", "last_name": "B", "email": "a@example.com"},
+        files={"resume": ("resume.pdf", content, "application/pdf")}
+    ).json()["id"]
+
+    def resubmit(assigned_to_id):
+        # Runs after the delete has committed, before the blob is removed
+        leads_crud.create_lead(db, {
+            "first_name": "C", "last_name": "D", "email": "c@example.com",
+            "resume_path": key, "resume_size": len(content),
+        })
+    monkeypatch.setattr(leads_endpoints.lead_assignment, "release", resubmit)
+
+    assert authorized_client.delete(f"/api/leads/{lead_id}").status_code == 204
+    assert db.query(ResumeBlob.ref_count).filter(ResumeBlob.key == key).scalar() == 1
+    assert leads_endpoints.storage.exists(key)
+
+def test_resume_of_unsaved_lead_is_discarded(client: TestClient, monkeypatch):
+    content = b"%PDF-1.4 never saved"
+    def fail(db, lead_data):
+        raise RuntimeError("insert failed")
+    monkeypatch.setattr(leads_endpoints, "_create_lead_and_notify", fail)
+
+    with pytest.raises(RuntimeError):
+        client.post(
+            "/api/leads",
+            data={"first_name": "A", "last_name": "B", "email": "a@example.com"},
+            files={"resume": ("resume.pdf", content, "application/pdf")}
+        )
+    assert not leads_endpoints.storage.exists(hashlib.sha256(content).hexdigest())
+
+def test_download_keeps_original_filename(authorized_client: TestClient):
+    response = authorized_client.post(
+        "/api/leads",
+        data={"first_name": "A", "last_name": "B", "email": "a@example.com"},
+        files={"resume": ("my_cv.pdf", CONTENT, "application/pdf")}
+    )
+    lead_id = response.json()["id"]
+
+    response = authorized_client.get(f"/api/leads/{lead_id}/resume")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["content-type"] == "application/pdf"
+    assert 'filename="my_cv.pdf"' in response.headers["content-disposition"]
+
+@pytest.fixture
+def s3_store(tmp_path):
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="resumes")
+        yield S3Storage(bucket="resumes", prefix="r/", staging_dir=str(tmp_path), client=client)
+
+def test_s3_store_round_trip(s3_store):
+    assert not s3_store.exists(KEY)
+    assert s3_store.put(_stage(s3_store), KEY) is True
+    assert s3_store.put(_stage(s3_store), KEY) is False
+    assert os.listdir(s3_store.staging_dir) == []
+
+    assert s3_store.local_path(KEY) is None
+    assert s3_store.read(KEY) == CONTENT
+    assert b"".join(s3_store.iter_chunks(KEY, chunk_size=4)) == CONTENT
+
+    s3_store.delete(KEY)
+    assert not s3_store.exists(KEY)
+
+def test_download_streams_from_s3(authorized_client: TestClient, s3_store, monkeypatch):
+    monkeypatch.setattr(leads_endpoints, "storage", s3_store)
+    response = authorized_client.post(
+        "/api/leads",
+        data={"first_name": "A", "last_name": "B", "email": "a@example.com"},
+        files={"resume": ("resume.pdf", CONTENT, "application/pdf")}
+    )
+    lead_id = response.json()["id"]
+
+    response = authorized_client.get(f"/api/leads/{lead_id}/resume")
+    assert response.status_code == 200
+    assert response.content == CONTENT